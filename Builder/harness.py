@@ -0,0 +1,488 @@
+"""Runs the whole installer against stubbed system commands inside a temporary root and HOME.
+
+Usage (from the root of meowrch):
+    python Builder/harness.py [--answers FILE] [--runs N] [--latency pacman=0.2] [--fail pacman=firefox] [--keep]
+
+sudo, pacman, yay/paru, makepkg, git, systemctl, update-grub, firefox, code, fisher, lspci, lscpu and
+a few helpers are replaced with one stub script that records every call, waits for the configured latency
+and fails when its arguments match a configured pattern. Absolute system paths (/etc, /usr, /var, /boot, /opt)
+are redirected into the temporary root, so nothing outside of it is changed.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tarfile
+import argparse
+import tempfile
+import builtins
+import statistics
+import subprocess
+import threading
+import concurrent.futures
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+BUILDER_DIR = Path(__file__).resolve().parent
+MEOWRCH_DIR = BUILDER_DIR.parent
+sys.path.insert(0, str(BUILDER_DIR))
+
+from loguru import logger
+
+SYSTEM_DIRS = ("/etc/", "/usr/", "/var/", "/boot/", "/opt/")
+STUBS = [
+    "sudo", "pacman", "yay", "paru", "makepkg", "git", "systemctl", "update-grub", "firefox", "code",
+    "fisher", "lspci", "lscpu", "chsh", "gsettings", "mewline",
+]
+# Каталоги, которые на настоящей системе уже есть
+SYSTEM_TREE = [
+    "var/lib/pacman/local", "var/lib/pacman/sync", "var/lib/AccountsService/icons", "etc/default",
+    "etc/systemd/system", "usr/local/bin", "usr/share/sddm/themes", "boot/grub/themes",
+]
+# Пакеты, которые ставит сам установщик, помимо манифеста
+EXTRA_PACKAGES = ["git", "base-devel", "ccache"]
+DEFAULT_ANSWERS = {
+    "make_backup": False,
+    "install_wm": ["hyprland", "bspwm"],
+    "aur_helper": "yay",
+    "install_drivers": [],
+    "auto_update_packages": True,
+    "reboot": False,
+}
+
+STUB_SCRIPT = r'''#!{python}
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+
+DIR = os.environ["HARNESS_DIR"]
+ROOT = os.environ["HARNESS_ROOT"]
+NAME = os.path.basename(sys.argv[0])
+ARGS = sys.argv[1:]
+SYSTEM_DIRS = {system_dirs}
+FILE_COMMANDS = {{"mv", "cp", "rm", "chmod", "mkdir", "ln", "tee", "install", "touch"}}
+
+with open(os.path.join(DIR, "config.json")) as file:
+    CONFIG = json.load(file)
+
+
+def remap(arg):
+    return ROOT + arg if arg.startswith(SYSTEM_DIRS) else arg
+
+
+def register(names):
+    local = os.path.join(ROOT, "var/lib/pacman/local")
+    for name in names:
+        os.makedirs(os.path.join(local, name + "-1.0-1"), exist_ok=True)
+        with open(os.path.join(local, name + "-1.0-1", "desc"), "w") as file:
+            file.write("%NAME%\n" + name + "\n\n%VERSION%\n1.0-1\n")
+
+
+def targets(args, with_values=("--config", "--dbpath", "--mflags", "--cachedir")):
+    result, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in with_values:
+            skip = True
+        elif not arg.startswith("-"):
+            result.append(arg)
+    return result
+
+
+def pacman():
+    operation = next((a for a in ARGS if a.startswith("-") and not a.startswith("--")), "")
+    names = targets(ARGS)
+
+    if operation.startswith("-U"):
+        register([os.path.basename(f).rsplit("-", 3)[0] for f in names])
+    elif operation.startswith("-S") and "w" not in operation and len(names) > 0:
+        size = CONFIG["download_mib"]
+        print(f"Package ({{len(names)}})   New Version  Net Change  Download Size\n")
+        for name in names:
+            print(f"extra/{{name}}   1.0-1   {{size * 2:.2f}} MiB   {{size:.2f}} MiB")
+        print(f"\nTotal Download Size:   {{size * len(names):.2f}} MiB")
+        register(names)
+    return 0
+
+
+def sudo():
+    args = list(ARGS)
+    while len(args) > 0 and args[0].startswith("-"):
+        args.pop(0)
+    if len(args) < 1:
+        return 0
+
+    if args[0] in FILE_COMMANDS:
+        command = [args[0]] + [remap(a) for a in args[1:]]
+        destination = command[-1]
+        os.makedirs(destination if destination.endswith("/") else os.path.dirname(destination) or ".", exist_ok=True)
+        return subprocess.call(command)
+    if shutil.which(args[0]) and os.path.dirname(shutil.which(args[0])) == os.path.join(DIR, "bin"):
+        return subprocess.call(args)
+    # mount, usermod, locale-gen, reboot... - ничего не делаем
+    return 0
+
+
+def makepkg():
+    name = os.path.basename(os.getcwd())
+    if "PKGDEST" in os.environ:
+        os.makedirs(os.environ["PKGDEST"], exist_ok=True)
+        open(os.path.join(os.environ["PKGDEST"], f"{{name}}-1.0-1-x86_64.pkg.tar.zst"), "w").close()
+    if any(a.startswith("-") and not a.startswith("--") and "i" in a for a in ARGS):
+        register([name])
+    return 0
+
+
+def git():
+    if len(ARGS) > 0 and ARGS[0] == "clone":
+        path = ARGS[-1]
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "PKGBUILD"), "w") as file:
+            file.write(f"pkgname={{os.path.basename(path)}}\n")
+        return 0
+    return 1
+
+
+def firefox():
+    os.makedirs(os.path.expanduser("~/.mozilla/firefox/harness.default-release/extensions"), exist_ok=True)
+    return 0
+
+
+def main():
+    start = time.time()
+    pattern = next((p for p in CONFIG["fail"].get(NAME, []) if p in " ".join(ARGS)), None)
+    time.sleep(CONFIG["latency"].get(NAME, 0))
+
+    if pattern is not None:
+        if NAME == "pacman":
+            print(f"error: target not found: {{pattern}}", file=sys.stderr)
+        else:
+            print(f"{{NAME}}: injected failure ({{pattern}})", file=sys.stderr)
+        returncode = 1
+    elif NAME == "pacman":
+        returncode = pacman()
+    elif NAME in ("yay", "paru"):
+        register(targets(ARGS))
+        returncode = 0
+    elif NAME == "sudo":
+        returncode = sudo()
+    elif NAME == "makepkg":
+        returncode = makepkg()
+    elif NAME == "git":
+        returncode = git()
+    elif NAME == "firefox":
+        returncode = firefox()
+    elif NAME == "lspci":
+        print(CONFIG["lspci"])
+        returncode = 0
+    elif NAME == "lscpu":
+        print(CONFIG["lscpu"])
+        returncode = 0
+    else:
+        returncode = 0
+
+    record = {{
+        "command": NAME,
+        "args": ARGS,
+        "stage": os.environ.get("HARNESS_STAGE", "main"),
+        "start": start,
+        "end": time.time(),
+        "returncode": returncode,
+    }}
+    with open(os.path.join(DIR, "calls.jsonl"), "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+    return returncode
+
+
+sys.exit(main())
+'''
+
+
+def remap(path: Any) -> Any:
+    """Redirects system paths into the temporary root. /usr, /var and /opt are only redirected
+    when the file exists there, so that Python and the libraries keep reading the real ones"""
+    root = os.environ["HARNESS_ROOT"]
+    if not isinstance(path, str) or not path.startswith(SYSTEM_DIRS):
+        return path
+    if path.startswith(("/etc/", "/boot/")) or os.path.lexists(root + path):
+        return root + path
+    return path
+
+
+def manifest_packages() -> List[str]:
+    from packages import BASE, CUSTOM, DRIVERS
+
+    packages = list(EXTRA_PACKAGES)
+    for group in (BASE.pacman, *(driver.pacman for driver in DRIVERS.values())):
+        packages.extend(group.common + group.bspwm_packages + group.hyprland_packages)
+    for category in CUSTOM.values():
+        packages.extend(name for name, info in category.items() if not info.aur)
+
+    return list(dict.fromkeys(packages))
+
+
+def write_sync_database(path: Path, packages: List[str]) -> None:
+    with tarfile.open(path, "w:gz") as archive:
+        for name in packages:
+            desc = f"%NAME%\n{name}\n\n%VERSION%\n1.0-1\n".encode()
+            info = tarfile.TarInfo(f"{name}-1.0-1/desc")
+            info.size = len(desc)
+            archive.addfile(info, io.BytesIO(desc))
+
+
+def prepare(directory: Path, config: Dict[str, Any]) -> None:
+    """Creates the temporary root, HOME, the stubs and their config"""
+    root = directory / "root"
+    for path in SYSTEM_TREE:
+        (root / path).mkdir(parents=True)
+    (directory / "home").mkdir()
+    (directory / "bin").mkdir()
+
+    # Установщик перемещает файлы из ./misc, поэтому он работает с копией meowrch (жёсткие ссылки, если можно)
+    def link(src: str, dst: str) -> None:
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    shutil.copytree(
+        MEOWRCH_DIR, directory / "meowrch", copy_function=link,
+        ignore=shutil.ignore_patterns(".git", "backup", "__pycache__", "*.log", "install-report.json"),
+    )
+
+    (root / "etc/pacman.conf").write_text(
+        "[options]\nArchitecture = auto\n#ParallelDownloads = 5\n\n[core]\nInclude = /etc/pacman.d/mirrorlist\n\n"
+        "[extra]\nInclude = /etc/pacman.d/mirrorlist\n"
+    )
+    (root / "etc/default/grub").write_text('GRUB_TIMEOUT=5\nGRUB_CMDLINE_LINUX_DEFAULT="quiet"\n')
+    (root / "etc/locale.gen").write_text("#en_US.UTF-8 UTF-8\n")
+    write_sync_database(root / "var/lib/pacman/sync/core.db", [])
+    write_sync_database(root / "var/lib/pacman/sync/extra.db", manifest_packages())
+
+    (directory / "config.json").write_text(json.dumps(config))
+    stub = directory / "bin" / "stub"
+    stub.write_text(STUB_SCRIPT.format(python=sys.executable, system_dirs=repr(SYSTEM_DIRS)))
+    stub.chmod(0o755)
+    for name in STUBS:
+        (directory / "bin" / name).symlink_to(stub)
+
+
+def child(directory: Path, answers_path: Path) -> None:
+    """Runs the installer in this process with the system paths, the network and the stages patched"""
+    import install
+    from install import Builder
+    from question import Question
+    from managers.aur_builder import AurBuilder
+    from managers.package_manager import PackageManager
+    from utils.pacman_db import PacmanDatabase
+    from utils.scheduler import StageScheduler
+    from utils.schemes import AurPackage
+
+    root = os.environ["HARNESS_ROOT"]
+
+    ##==> Системные пути ведут во временный корень
+    ###########################################
+    original_open = builtins.open
+    builtins.open = lambda file, *args, **kwargs: original_open(remap(file), *args, **kwargs)
+    for name in ("exists", "isfile", "isdir"):
+        check = getattr(os.path, name)
+        setattr(os.path, name, lambda path, check=check: check(remap(path)))
+
+    PackageManager.database = PacmanDatabase(f"{root}/var/lib/pacman", f"{root}/etc/pacman.conf")
+    AurBuilder.query = lambda self, names: {n: AurPackage(name=n, base=n, version="1.0-1") for n in names}
+
+    ##==> Каждый процесс помечается стадией, которая его запустила
+    ###########################################
+    current = threading.local()
+    run_stage = StageScheduler._run_stage
+
+    def tagged_run_stage(self, stage):
+        current.stage = stage.name
+        try:
+            run_stage(self, stage)
+        finally:
+            current.stage = "main"
+
+    class TaggedPopen(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            env = dict(kwargs.get("env") or os.environ)
+            env["HARNESS_STAGE"] = getattr(current, "stage", "main")
+            kwargs["env"] = env
+            super().__init__(*args, **kwargs)
+
+    submit = concurrent.futures.ThreadPoolExecutor.submit
+
+    def tagged_submit(self, fn, *args, **kwargs):
+        # Сборки AUR идут в своих потоках, но принадлежат стадии, которая их запустила
+        stage = getattr(current, "stage", "main")
+
+        def run(*args, **kwargs):
+            current.stage = stage
+            return fn(*args, **kwargs)
+
+        return submit(self, run, *args, **kwargs)
+
+    StageScheduler._run_stage = tagged_run_stage
+    concurrent.futures.ThreadPoolExecutor.submit = tagged_submit
+    subprocess.Popen = TaggedPopen
+
+    logger.remove()
+    logger.configure(extra={"stage": "main"})
+    logger.add(
+        sink=str(directory / "build_debug.log"),
+        format="{time} | {level} | {extra[stage]} | {message}",
+        level="DEBUG",
+        encoding="utf-8",
+    )
+
+    answers = Question.validate_answers(Question.read_answers_file(str(answers_path)))
+    Builder.report_path = str(directory / "install-report.json")
+    install.Builder(answers=answers).run()
+
+
+def run_once(config: Dict[str, Any], answers: Dict[str, Any], keep: bool) -> Dict[str, Any]:
+    directory = Path(tempfile.mkdtemp(prefix="meowrch-harness-"))
+    prepare(directory, config)
+    answers_path = directory / "answers.json"
+    answers_path.write_text(json.dumps(answers))
+
+    env = {
+        **os.environ,
+        "PATH": f"{directory / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+        "HOME": str(directory / "home"),
+        # install_nvm пишет в /home/$USER, а такого пользователя нет
+        "USER": "meowrch-harness",
+        "HARNESS_DIR": str(directory),
+        "HARNESS_ROOT": str(directory / "root"),
+    }
+
+    start = time.time()
+    with open(directory / "installer.log", "w") as log:
+        returncode = subprocess.call(
+            [sys.executable, str(directory / "meowrch" / "Builder" / "harness.py"), "--child", str(directory), str(answers_path)],
+            cwd=directory / "meowrch", env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+        )
+    wall = time.time() - start
+
+    calls = []
+    if (directory / "calls.jsonl").exists():
+        calls = [json.loads(line) for line in (directory / "calls.jsonl").read_text().splitlines()]
+
+    report = {}
+    if (directory / "install-report.json").exists():
+        report = json.loads((directory / "install-report.json").read_text())
+
+    result = {
+        "directory": str(directory),
+        "returncode": returncode,
+        "wall_seconds": round(wall, 3),
+        "subprocesses": len(calls),
+        "subprocesses_per_stage": dict(Counter(call["stage"] for call in calls)),
+        "commands": dict(Counter(call["command"] for call in calls)),
+        "stages": report.get("stages", {}),
+        "failed_packages": [n for n, info in report.get("packages", {}).items() if info["outcome"] != "installed"],
+    }
+
+    if not keep:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return result
+
+
+def parse_pairs(values: Optional[List[str]]) -> Dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        name, _, argument = value.partition("=")
+        pairs[name] = argument
+    return pairs
+
+
+def summary(results: List[Dict[str, Any]]) -> None:
+    last = results[-1]
+    walls = [r["wall_seconds"] for r in results]
+
+    logger.info(f"{'Stage':<24} {'Result':<8} {'Time':>9} {'Processes':>10}")
+    for name, info in sorted(last["stages"].items(), key=lambda item: item[1]["seconds"] or 0, reverse=True):
+        seconds = f"{info['seconds']:.2f}s" if info["seconds"] is not None else "-"
+        processes = last["subprocesses_per_stage"].get(name, 0)
+        logger.info(f"{name:<24} {info['result']:<8} {seconds:>9} {processes:>10}")
+
+    logger.info(f"Commands: {', '.join(f'{n} x{c}' for n, c in sorted(last['commands'].items()))}")
+    logger.info(f"Subprocesses: {last['subprocesses']}, outside of stages: {last['subprocesses_per_stage'].get('main', 0)}")
+    if len(last["failed_packages"]) > 0:
+        logger.warning(f"Failed packages: {', '.join(last['failed_packages'])}")
+
+    if len(results) > 1:
+        logger.info(
+            f"Wall time over {len(results)} runs: median {statistics.median(walls):.2f}s, "
+            f"min {min(walls):.2f}s, max {max(walls):.2f}s"
+        )
+    else:
+        logger.info(f"Wall time: {walls[0]:.2f}s (exit code {last['returncode']})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(Path(sys.argv[2]), Path(sys.argv[3]))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Runs the meowrch installer against stubbed system commands")
+    parser.add_argument("--answers", metavar="FILE", help="Answers file (see install.py --answers). Defaults to a scripted set")
+    parser.add_argument("--runs", type=int, default=1, help="How many times to run the installer for the benchmark")
+    parser.add_argument("--latency", nargs="*", metavar="COMMAND=SECONDS", help="Delay of the stubbed commands")
+    parser.add_argument("--fail", nargs="*", metavar="COMMAND=PATTERN", help="Fail a stubbed command if its arguments contain the pattern")
+    parser.add_argument("--download-mib", type=float, default=1.0, help="Download size that the pacman stub reports per package")
+    parser.add_argument("--gpu", default="01:00.0 VGA compatible controller: NVIDIA Corporation GA104", help="What the lspci stub prints")
+    parser.add_argument("--cpu", default="Vendor ID: GenuineIntel", help="What the lscpu stub prints")
+    parser.add_argument("--json", metavar="FILE", help="Write the results of all runs to a JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directories for inspection")
+    args = parser.parse_args()
+
+    if os.geteuid() == 0:
+        logger.error("The harness must not run as root: the stubs rely on the real system being unwritable")
+        sys.exit(1)
+
+    fail: Dict[str, List[str]] = {}
+    for value in args.fail or []:
+        name, _, pattern = value.partition("=")
+        fail.setdefault(name, []).append(pattern)
+
+    config = {
+        "latency": {name: float(seconds) for name, seconds in parse_pairs(args.latency).items()},
+        "fail": fail,
+        "download_mib": args.download_mib,
+        "lspci": args.gpu,
+        "lscpu": args.cpu,
+    }
+
+    from question import Question
+
+    answers = DEFAULT_ANSWERS
+    if args.answers is not None:
+        answers = Question.read_answers_file(args.answers)
+    try:
+        Question.validate_answers(answers)
+    except ValueError as e:
+        logger.error(f"Invalid answers: {e}")
+        sys.exit(1)
+
+    results = []
+    for number in range(args.runs):
+        result = run_once(config, answers, keep=args.keep)
+        results.append(result)
+        logger.info(f"Run {number + 1}/{args.runs}: {result['wall_seconds']:.2f}s ({result['directory']})")
+
+    summary(results)
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
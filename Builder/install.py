@@ -1,29 +1,56 @@
+import os
+import argparse
+from dataclasses import asdict
 import subprocess
 import traceback
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import inquirer
 from loguru import logger
 from managers.apps_manager import AppsManager
+from managers.aur_builder import AurBuilder
 from managers.drivers_manager import DriversManager
 from managers.filesystem_manager import FileSystemManager
 from managers.package_manager import PackageManager
 from managers.post_install_manager import PostInstallation
-from packages import BASE, CUSTOM
+from packages import BASE, CUSTOM, DRIVERS
 from question import Question
-from utils.schemes import AurHelper, BuildOptions, NotInstalledPackages
+from utils.build_profile import BuildProfile
+from utils.journal import InstallJournal
+from utils.local_repo import LocalRepository
+from utils.pacman_db import PacmanDatabase
+from utils.scheduler import StageScheduler
+from utils.sudo import SudoKeepAlive
+from utils.schemes import AurHelper, BuildOptions, NotInstalledPackages, Stage
 
 
 class Builder:
     not_installed_packages = NotInstalledPackages()
+    report_path = "install-report.json"
+
+    def __init__(
+        self,
+        from_stage: Optional[str] = None,
+        repo: Optional[str] = None,
+        export_repo: Optional[str] = None,
+        answers: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.from_stage = from_stage
+        # Проверенные ответы установки без вопросов (None - обычный опрос)
+        self.answers = answers
+        self.journal = InstallJournal()
+        self.local_repo = LocalRepository(repo) if repo is not None else None
+        self.export_repo = export_repo
 
     def run(self) -> None:
         logger.success(
             "The program has been launched successfully. We are starting the survey."
         )
-        self.build_options: BuildOptions = Question.get_answers()
+        self.build_options: BuildOptions = self.survey()
         logger.info(f"User Responses to Questions: {self.build_options}")
+        self.journal.start(self.build_options, self.selected_custom())
 
-        if self.build_options.make_backup:
+        if self.build_options.make_backup and "backup" not in self.journal.completed():
             logger.info(
                 "The process of creating a backup of configurations is started!"
             )
@@ -32,65 +59,258 @@ class Builder:
                 "A backup of all your configuration files is located "
                 'in the root of the meowrch at the path "./backup/"'
             )
-            logger.warning("Check the backup before you start the installation")
-            input("Press Enter to continue with the installation: ")
+            if self.answers is None:
+                logger.warning("Check the backup before you start the installation")
+                input("Press Enter to continue with the installation: ")
+            self.journal.record_stage("backup", StageScheduler.DONE)
 
-        FileSystemManager.create_default_folders()
-        FileSystemManager.copy_dotfiles(
-            exclude_bspwm=not self.build_options.install_bspwm,
-            exclude_hyprland=not self.build_options.install_hyprland,
-        )
+        if self.local_repo is not None:
+            if not self.local_repo.prepare():
+                exit(1)
 
-        PackageManager.update_pacman_conf(
-            enable_multilib=self.build_options.enable_multilib
+            # Все транзакции и проверки манифеста идут только через локальный репозиторий
+            PackageManager.pacman_args = ["--config", self.local_repo.config_path]
+            PackageManager.database = PacmanDatabase(config_path=self.local_repo.config_path)
+
+        PackageManager.build_profile = BuildProfile(enabled=self.build_options.fast_builds)
+        stages = self.stages()
+
+        scheduler = StageScheduler(
+            stages,
+            completed=self.completed_stages(stages),
+            on_finish=self.journal.record_stage,
         )
 
-        if self.build_options.update_arch_database:
-            PackageManager.update_database()
-            
-        if self.build_options.aur_helper == AurHelper.PARU:
-            PackageManager.install_paru_manager()
-        elif self.build_options.aur_helper == AurHelper.YAY:
-            PackageManager.install_aur_manager()
-        else:
-            logger.error("Unsupported AUR helper!")
+        # Пароль спрашивается один раз до параллельных стадий и не истекает во время долгих сборок
+        sudo = SudoKeepAlive()
+        if not sudo.start():
             exit(1)
 
-        self.packages_installation()
-        self.drivers_installation()
-
-        AppsManager.configure_grub()
-        AppsManager.configure_sddm()
-        AppsManager.configure_firefox(
-            darkreader=self.build_options.ff_darkreader,
-            ublock=self.build_options.ff_ublock,
-            twp=self.build_options.ff_twp,
-            unpaywall=self.build_options.ff_unpaywall,
-            tampermonkey=self.build_options.ff_tampermonkey,
-        )
-        AppsManager.configure_code()
-        
-        # Install nvm (Node Version Manager)
-        PackageManager.install_nvm()
+        try:
+            results = scheduler.run()
+        finally:
+            sudo.stop()
+            PackageManager.finish_prefetch()
+            PackageManager.build_profile.revert()
+            self.write_report(scheduler)
 
-        self.daemons_setting()
-        PostInstallation.apply(auto_update_packages=self.build_options.auto_update_packages)
+        # Итог по пакетам берётся из журнала, чтобы учесть и предыдущие запуски
         logger.warning(
             "The script was unable to automatically install these packages."
             "Try installing them manually."
         )
-        logger.warning("Pacman: " + ", ".join(self.not_installed_packages.pacman))
-        logger.warning("Aur: " + ", ".join(self.not_installed_packages.aur))
+        logger.warning("Pacman: " + ", ".join(self.journal.packages("pacman", "failed")))
+        logger.warning("Aur: " + ", ".join(self.journal.packages("aur", "failed")))
+
+        unfinished = [name for name, result in results.items() if result != StageScheduler.DONE]
+        if len(unfinished) > 0:
+            logger.warning(
+                f"These stages did not complete: {', '.join(unfinished)}. "
+                "Run the installer again to continue from them."
+            )
+        else:
+            self.journal.finish()
+
+            if self.export_repo is not None:
+                LocalRepository(self.export_repo).export(PackageManager.database.local)
+
         logger.success(
             "Meowch has been successfully installed! Restart your PC to apply the changes."
         )
 
-        is_reboot = inquirer.confirm("Do you want to reboot?")
+        if self.answers is not None:
+            is_reboot = self.answers["reboot"]
+        else:
+            is_reboot = inquirer.confirm("Do you want to reboot?")
         if is_reboot:
             subprocess.run("sudo reboot", shell=True)
 
-    def packages_installation(self) -> None:
-        logger.info("Starting the package installation process")
+    def write_report(self, scheduler: StageScheduler) -> None:
+        """Writes the timings of the stages and packages, also if the installation was interrupted"""
+        path = self.report_path
+
+        for name, result in scheduler.results.items():
+            PackageManager.report.stage(name, result, *scheduler.timings.get(name, (None, None)))
+
+        try:
+            options = {**asdict(self.build_options), "aur_helper": self.build_options.aur_helper.value}
+            report = PackageManager.report.write(path, options=options)
+        except Exception:
+            logger.error(f"Error while writing the installation report: {traceback.format_exc()}")
+            return
+
+        PackageManager.report.summary(report)
+        logger.info(f'The installation report is saved to "{path}"')
+
+    def survey(self) -> BuildOptions:
+        """Asks the questions or takes the answers of the unfinished installation"""
+        if self.answers is not None:
+            # Незавершённая установка с теми же ответами продолжится по журналу
+            return Question.get_unattended_answers(self.answers)
+
+        saved = self.journal.saved_options()
+
+        if saved is not None and inquirer.confirm(
+            "The previous installation was not finished. Continue it with the same answers?", default=True
+        ):
+            custom = self.journal.saved_custom()
+            for category in CUSTOM.values():
+                for package, info in category.items():
+                    info.selected = package in custom
+            return saved
+
+        return Question.get_answers()
+
+    @staticmethod
+    def selected_custom() -> List[str]:
+        return [
+            package
+            for category in CUSTOM.values()
+            for package, info in category.items()
+            if info.selected
+        ]
+
+    def completed_stages(self, stages: List[Stage]) -> Set[str]:
+        """Stages that were completed by a previous run.
+        With --from-stage, the stage and everything that depends on it is run again,
+        and the stages it requires are considered completed.
+        """
+        completed = set(self.journal.completed())
+        if self.from_stage is None:
+            return completed
+
+        requires = {stage.name: stage.requires for stage in stages}
+        if self.from_stage not in requires:
+            logger.error(f'Unknown stage "{self.from_stage}". Available stages: {", ".join(requires)}')
+            exit(1)
+
+        rerun, changed = {self.from_stage}, True
+        while changed:
+            changed = False
+            for name, required in requires.items():
+                if name not in rerun and any(r in rerun for r in required):
+                    rerun.add(name)
+                    changed = True
+
+        ancestors, pending = set(), list(requires[self.from_stage])
+        while len(pending) > 0:
+            name = pending.pop()
+            if name not in ancestors:
+                ancestors.add(name)
+                pending.extend(requires[name])
+
+        self.journal.forget_stages(list(rerun))
+        logger.info(f"Running again from the stage \"{self.from_stage}\": {', '.join(sorted(rerun))}")
+        return (completed | ancestors) - rerun
+
+    def stages(self) -> List[Stage]:
+        """The installation as a graph of stages.
+        Everything that runs pacman or the AUR helper takes the "pacman" lock,
+        and the steps that can ask the user something in the terminal take the "tty" lock.
+        """
+        options = self.build_options
+        packages = ["packages"]
+        offline = self.local_repo is not None
+
+        stages = [
+            Stage(
+                "pacman_conf", lambda: PackageManager.update_pacman_conf(enable_multilib=options.enable_multilib),
+                locks=["pacman"], verify=self.pacman_conf_applied,
+            ),
+            # База локального репозитория синхронизируется всегда, она нужна для установки
+            Stage(
+                "update_database", PackageManager.update_database, ["pacman_conf"], ["pacman"],
+                enabled=options.update_arch_database or offline,
+            ),
+            # Пакеты скачиваются в фоне, пока копируются дотфайлы и собирается AUR helper
+            Stage(
+                "prefetch", lambda: PackageManager.prefetch_packages(self.check_manifest()), ["update_database"],
+                enabled=not offline, resumable=False,
+            ),
+            Stage("dotfiles", self.dotfiles_installation, verify=lambda: os.path.isdir(os.path.expanduser("~/.config/meowrch"))),
+            # Профиль сборки живёт только внутри процесса, поэтому применяется при каждом запуске
+            Stage("build_profile", self.build_profile_setup, ["update_database"], ["pacman"], resumable=False),
+            Stage(
+                "aur_helper", self.aur_helper_installation, ["build_profile"], ["pacman"],
+                verify=lambda: PackageManager.check_package_installed(options.aur_helper.value),
+            ),
+            Stage("packages", self.packages_installation, ["aur_helper", "prefetch"], ["pacman"], verify=self.packages_present),
+            Stage("drivers", self.drivers_installation, ["prefetch"], ["pacman"], enabled=options.install_drivers),
+            Stage("grub", AppsManager.configure_grub, packages),
+            Stage("sddm", AppsManager.configure_sddm, packages),
+            Stage("firefox", lambda: AppsManager.configure_firefox(
+                darkreader=options.ff_darkreader,
+                ublock=options.ff_ublock,
+                twp=options.ff_twp,
+                unpaywall=options.ff_unpaywall,
+                tampermonkey=options.ff_tampermonkey,
+            ), packages),
+            Stage("code", AppsManager.configure_code, packages, ["pacman"]),
+            Stage("nvm", PackageManager.install_nvm, packages, ["pacman"]),
+            Stage("daemons", self.daemons_setting, ["packages", "drivers"]),
+        ]
+
+        # Локаль и таймер обновлений не зависят от пакетов и идут параллельно с их установкой
+        independent = {"locale", "auto_update"}
+        # chsh спрашивает пароль пользователя, а не sudo
+        interactive = {"fish_shell"}
+        for name, step in PostInstallation.steps(auto_update_packages=options.auto_update_packages):
+            stages.append(Stage(
+                name, step,
+                [] if name in independent else ["packages", "dotfiles"],
+                ["tty"] if name in interactive else [],
+            ))
+
+        return stages
+
+    @staticmethod
+    def pacman_conf_applied() -> bool:
+        try:
+            with open("/etc/pacman.conf", "r") as file:
+                return any(line.startswith("ParallelDownloads") for line in file)
+        except OSError:
+            return False
+
+    def packages_present(self) -> bool:
+        """Checks that the packages installed by a previous run are still installed"""
+        installed = self.journal.packages("pacman", "installed") + self.journal.packages("aur", "installed")
+        return all(PackageManager.database.is_installed(package) for package in installed)
+
+    def dotfiles_installation(self) -> None:
+        FileSystemManager.create_default_folders()
+        FileSystemManager.copy_dotfiles(
+            exclude_bspwm=not self.build_options.install_bspwm,
+            exclude_hyprland=not self.build_options.install_hyprland,
+        )
+
+    def build_profile_setup(self) -> None:
+        if self.build_options.fast_builds:
+            PackageManager.install_packages(["ccache"])
+
+        # Профиль сборки действует на все сборки AUR и снимается после установки пакетов
+        PackageManager.build_profile.apply()
+
+    def aur_helper_installation(self) -> None:
+        if self.local_repo is not None:
+            # AUR пакеты уже собраны в репозитории, helper берётся оттуда же, если он там есть
+            if len(PackageManager.install_packages([self.build_options.aur_helper.value])) > 0:
+                logger.warning("The AUR helper is not in the local repository, it will not be installed")
+            return
+
+        if self.build_options.aur_helper == AurHelper.PARU:
+            PackageManager.install_paru_manager()
+        elif self.build_options.aur_helper == AurHelper.YAY:
+            PackageManager.install_aur_manager()
+        else:
+            logger.error("Unsupported AUR helper!")
+            exit(1)
+
+    def collect_packages(self) -> Tuple[List[str], List[str]]:
+        """Collects the pacman and AUR packages selected for installation
+
+        Returns:
+            Tuple[List[str], List[str]]: Pacman packages and AUR packages
+        """
         pacman, aur = [], []
 
         pacman.extend(BASE.pacman.common)
@@ -110,16 +330,67 @@ class Builder:
                 pacman.extend(getattr(BASE.pacman, f"{wm}_packages"))
                 aur.extend(getattr(BASE.aur, f"{wm}_packages"))
 
-        # Устанавливаем pacman пакеты
-        self.not_installed_packages.pacman.extend(
-            PackageManager.install_packages(pacman)
-        )
+        return pacman, aur
+
+    def check_manifest(self) -> List[str]:
+        """Checks the whole pacman manifest against the package databases before anything is installed
 
-        # Устанавливаем aur пакеты
-        self.not_installed_packages.aur.extend(
-            PackageManager.install_packages(aur, aur=self.build_options.aur_helper)
+        Returns:
+            List[str]: All pacman packages that will be installed, including the drivers
+        """
+        pacman, _ = self.collect_packages()
+
+        for vendor in DRIVERS.keys():
+            if getattr(self.build_options, f"{vendor}_driver"):
+                pacman.extend(DRIVERS[vendor].pacman.common)
+
+        status = PackageManager.database.check(pacman)
+        logger.info(
+            f"Packages: {len(status.installed)} already installed, "
+            f"{len(status.available)} to install, {len(status.unknown)} unknown"
         )
 
+        if len(status.unknown) > 0:
+            logger.warning(
+                "These packages were not found in any repository and will be skipped: "
+                + ", ".join(status.unknown)
+            )
+
+        return pacman
+
+    def packages_installation(self) -> None:
+        logger.info("Starting the package installation process")
+        pacman, aur = self.collect_packages()
+
+        # Устанавливаем pacman пакеты.
+        # Пакеты, которые не установились при прошлом запуске, пробуем ещё раз, но без повторов
+        failed_before = set(self.journal.packages("pacman", "failed"))
+        not_installed = PackageManager.install_packages([p for p in pacman if p not in failed_before])
+        if len(failed_before) > 0:
+            not_installed += PackageManager.install_packages(
+                [p for p in pacman if p in failed_before], error_retries=1
+            )
+
+        self.not_installed_packages.pacman.extend(not_installed)
+        self.journal.record_packages("pacman", [p for p in pacman if p not in not_installed], not_installed)
+        PackageManager.report.outcome([p for p in not_installed if p not in PackageManager.report.outcomes], "failed")
+
+        if self.local_repo is not None:
+            # Собранные AUR пакеты лежат в локальном репозитории вместе с остальными
+            not_installed = PackageManager.install_packages(aur)
+        else:
+            # Собираем aur пакеты параллельно и устанавливаем одной транзакцией
+            aur_builder = AurBuilder(
+                aur_helper=self.build_options.aur_helper,
+                jobs=self.build_options.aur_jobs,
+            )
+            not_installed = aur_builder.install(aur)
+
+        self.not_installed_packages.aur.extend(not_installed)
+        self.journal.record_packages("aur", [p for p in aur if p not in not_installed], not_installed)
+        PackageManager.report.outcome([p for p in not_installed if p not in PackageManager.report.outcomes], "failed")
+        PackageManager.build_profile.revert()
+
         logger.success("The installation process of all packages is complete!")
 
     def drivers_installation(self) -> None:
@@ -162,12 +433,64 @@ class Builder:
 
 
 if __name__ == "__main__":
+    logger.configure(extra={"stage": "main"})
     logger.add(
         sink="build_debug.log",
-        format="{time} | {level} | {message}",
+        format="{time} | {level} | {extra[stage]} | {message}",
         level="DEBUG",
         encoding="utf-8",
     )
 
-    builder = Builder()
+    parser = argparse.ArgumentParser(description="Meowrch installer")
+    parser.add_argument(
+        "--from-stage",
+        metavar="STAGE",
+        help="Run the stage and everything that depends on it again, even if a previous run completed them",
+    )
+    parser.add_argument(
+        "--repo",
+        metavar="PATH",
+        help="Install packages only from a local repository (a directory with package files or a repo-add database)",
+    )
+    parser.add_argument(
+        "--export-repo",
+        metavar="PATH",
+        help="After a successful installation, export the installed packages into a local repository for other machines",
+    )
+    parser.add_argument(
+        "--answers",
+        metavar="FILE",
+        help="Install without any prompts using the answers from a YAML or JSON file",
+    )
+
+    # Каждому ответу соответствует флаг, он переопределяет значение из файла
+    answer_flags = parser.add_argument_group("answers", "Any of these flags also turns off the prompts")
+    for key, (kind, choices, _) in Question.UNATTENDED_ANSWERS.items():
+        flag = "--" + key.replace("_", "-")
+        if kind is bool:
+            answer_flags.add_argument(flag, dest=key, action=argparse.BooleanOptionalAction, default=None)
+        elif kind is list:
+            answer_flags.add_argument(flag, dest=key, nargs="*", metavar="VALUE", default=None)
+        else:
+            answer_flags.add_argument(flag, dest=key, type=kind, metavar="VALUE", default=None)
+
+    args = parser.parse_args()
+
+    answers = None
+    flags = {key: getattr(args, key) for key in Question.UNATTENDED_ANSWERS if getattr(args, key) is not None}
+
+    if args.answers is not None or len(flags) > 0:
+        try:
+            file_answers = Question.read_answers_file(args.answers) if args.answers is not None else {}
+            answers = Question.validate_answers({**file_answers, **flags})
+        except ValueError as e:
+            logger.error(f"Invalid answers: {e}")
+            exit(1)
+
+    builder = Builder(
+        from_stage=args.from_stage,
+        repo=args.repo,
+        export_repo=args.export_repo,
+        answers=answers,
+    )
     builder.run()
@@ -0,0 +1,240 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+import traceback
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from utils.schemes import AurHelper, AurPackage
+
+from .package_manager import PackageManager
+
+
+class AurBuilder:
+    """Builds AUR packages in parallel and installs them with a single "pacman -U".
+
+    The packages are built in layers by their AUR dependencies: all package bases of a layer
+    are built at the same time in their own directories. Packages that the next layers depend on
+    are installed right after their layer, all the others in one transaction at the end.
+    Whatever could not be built falls back to the AUR helper.
+    """
+
+    AUR_URL = "https://aur.archlinux.org"
+    RPC_CHUNK = 100
+
+    def __init__(self, aur_helper: AurHelper, jobs: int = 0, build_dir: str = "/tmp/meowrch-aur") -> None:
+        self.aur_helper = aur_helper
+        self.jobs = jobs if jobs > 0 else max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.build_dir = build_dir
+
+    @staticmethod
+    def dependency_name(dependency: str) -> str:
+        return re.split(r"[<>=]", dependency)[0]
+
+    def query(self, names: List[str]) -> Dict[str, AurPackage]:
+        """Requests the information about the packages from the AUR RPC
+
+        Returns:
+            Dict[str, AurPackage]: Found packages by name
+        """
+        packages = {}
+
+        for start in range(0, len(names), self.RPC_CHUNK):
+            query = urllib.parse.urlencode([("arg[]", name) for name in names[start:start + self.RPC_CHUNK]])
+
+            with urllib.request.urlopen(f"{self.AUR_URL}/rpc/v5/info?{query}", timeout=30) as response:
+                results = json.load(response).get("results", [])
+
+            for result in results:
+                packages[result["Name"]] = AurPackage(
+                    name=result["Name"],
+                    base=result["PackageBase"],
+                    version=result["Version"],
+                    # Проверки при сборке отключены (--nocheck), поэтому CheckDepends не нужны
+                    depends=[
+                        self.dependency_name(d)
+                        for d in result.get("Depends", []) + result.get("MakeDepends", [])
+                    ],
+                )
+
+        return packages
+
+    def resolve(self, packages: List[str]) -> Tuple[Dict[str, AurPackage], List[str]]:
+        """Finds all AUR packages that have to be built, including the AUR dependencies
+
+        Returns:
+            Tuple[Dict[str, AurPackage], List[str]]: AUR packages by name and the dependencies from the repositories
+        """
+        database = PackageManager.database
+        aur: Dict[str, AurPackage] = {}
+        repo_deps: List[str] = []
+        queried: Set[str] = set()
+        pending = list(packages)
+
+        while len(pending) > 0:
+            queried.update(pending)
+            found = self.query(pending)
+            aur.update(found)
+            pending = []
+
+            for package in found.values():
+                for dep in package.depends:
+                    if dep in aur or dep in queried or database.is_installed(dep):
+                        continue
+                    if database.exists(dep):
+                        repo_deps.append(dep)
+                    else:
+                        pending.append(dep)
+
+            pending = list(dict.fromkeys(pending))
+
+        return aur, list(dict.fromkeys(repo_deps))
+
+    @staticmethod
+    def requirements(aur: Dict[str, AurPackage]) -> Dict[str, Set[str]]:
+        """Package bases that every package base needs to be built and installed first"""
+        requires: Dict[str, Set[str]] = {}
+
+        for package in aur.values():
+            deps = requires.setdefault(package.base, set())
+            deps.update(aur[d].base for d in package.depends if d in aur and aur[d].base != package.base)
+
+        return requires
+
+    @staticmethod
+    def layers(requires: Dict[str, Set[str]]) -> List[List[str]]:
+        """Splits the package bases into layers: every base depends only on the bases of the previous layers"""
+        layers, done = [], set()
+
+        while len(done) < len(requires):
+            layer = [base for base, deps in requires.items() if base not in done and deps <= done]
+            if len(layer) < 1:
+                # Циклические зависимости - собираем оставшееся вместе, makepkg сам разберётся
+                layer = [base for base in requires if base not in done]
+
+            layers.append(layer)
+            done.update(layer)
+
+        return layers
+
+    def build(self, base: str) -> Optional[List[str]]:
+        """Clones and builds one package base
+
+        Returns:
+            Optional[List[str]]: Paths of the built package files or None if the build failed
+        """
+        path = os.path.join(self.build_dir, base)
+        output = os.path.join(path, "packages")
+        log_path = os.path.join(self.build_dir, f"{base}.log")
+
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(self.build_dir, exist_ok=True)
+
+            with open(log_path, "w") as log:
+                subprocess.run(
+                    ["git", "clone", "--depth", "1", f"{self.AUR_URL}/{base}.git", path],
+                    stdout=log, stderr=subprocess.STDOUT, check=True,
+                )
+                os.makedirs(output, exist_ok=True)
+
+                # Сборки идут параллельно, поэтому их вывод пишется в отдельные логи
+                with PackageManager.build_profile.measure(base), PackageManager.report.attempt([base], "makepkg") as attempt:
+                    subprocess.run(
+                        [
+                            "makepkg", "--syncdeps", "--noconfirm", "--nocheck", "--cleanbuild", "--force",
+                            *PackageManager.build_profile.makepkg_args(),
+                        ],
+                        cwd=path,
+                        env={**os.environ, "PKGDEST": output},
+                        stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, check=True,
+                    )
+                    attempt.success = True
+        except Exception:
+            logger.error(f'Error while building "{base}" (log: {log_path}): {traceback.format_exc()}')
+            return None
+
+        logger.success(f'Package base "{base}" has been successfully built!')
+        return [os.path.join(output, f) for f in sorted(os.listdir(output)) if ".pkg.tar" in f and not f.endswith(".sig")]
+
+    @staticmethod
+    def package_name(file: str) -> str:
+        # <name>-<pkgver>-<pkgrel>-<arch>.pkg.tar.<ext>
+        return os.path.basename(file).rsplit("-", 3)[0]
+
+    def install(self, packages: List[str]) -> List[str]:
+        """Builds and installs the AUR packages
+
+        Args:
+            packages (List[str]): List of package names
+
+        Returns:
+            List[str]: List of packages that could not be installed
+        """
+        packages = [p for p in dict.fromkeys(packages) if not PackageManager.check_package_installed(p)]
+        if len(packages) < 1:
+            return []
+
+        try:
+            aur, repo_deps = self.resolve(packages)
+        except Exception:
+            logger.error(f"Error while resolving the AUR dependencies: {traceback.format_exc()}")
+            return PackageManager.install_packages(packages, aur=self.aur_helper)
+
+        # Зависимости из репозиториев ставим заранее одной транзакцией, чтобы параллельные makepkg не ждали блокировку pacman.
+        # "--asdeps", как это сделал бы makepkg --syncdeps: иначе "pacman -Qdtq" не найдёт их, когда они станут не нужны
+        PackageManager.install_packages(repo_deps, as_deps=True)
+
+        needed = {d for package in aur.values() for d in package.depends if d in aur}
+        # Явно запрошенный пакет не должен оказаться "--asdeps", даже если он нужен другому
+        dependencies = needed - set(packages)
+        wanted = set(packages) | dependencies
+        requires = self.requirements(aur)
+        failed: Set[str] = set()
+        final_files: List[str] = []
+
+        for layer in self.layers(requires):
+            # Если не собралась зависимость, зависящий от неё пакет тоже не собрать
+            bases = [base for base in layer if len(requires[base] & failed) < 1]
+            failed.update(base for base in layer if base not in bases)
+
+            logger.info(f"Building {len(bases)} AUR packages in {self.jobs} jobs: {', '.join(bases)}")
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                results = dict(zip(bases, pool.map(self.build, bases)))
+
+            layer_deps, layer_explicit = [], []
+            for base, files in results.items():
+                if files is None:
+                    failed.add(base)
+                    continue
+
+                for file in files:
+                    name = self.package_name(file)
+                    if name in dependencies:
+                        layer_deps.append(file)
+                    elif name in needed:
+                        layer_explicit.append(file)
+                    elif name in wanted:
+                        final_files.append(file)
+
+            ##==> Следующим слоям нужны собранные зависимости
+            ###########################################
+            if not PackageManager.install_package_files(layer_deps, as_deps=True):
+                failed.update(aur[self.package_name(f)].base for f in layer_deps)
+            if not PackageManager.install_package_files(layer_explicit):
+                failed.update(aur[self.package_name(f)].base for f in layer_explicit)
+
+        if not PackageManager.install_package_files(final_files):
+            logger.warning("The single transaction of the built AUR packages failed, falling back to the AUR helper")
+
+        remaining = [p for p in packages if not PackageManager.check_package_installed(p)]
+        if len(remaining) > 0:
+            logger.warning(f"Installing {', '.join(remaining)} with {self.aur_helper.value}")
+            return PackageManager.install_packages(remaining, aur=self.aur_helper)
+
+        return []
@@ -1,37 +1,169 @@
 import os
+import re
+import sys
+import threading
 import subprocess
 import traceback
-from typing import List
+from typing import List, Optional, Tuple
 
 from loguru import logger
+from utils.build_profile import BuildProfile
+from utils.install_report import InstallReport
+from utils.pacman_db import PacmanDatabase
 from utils.schemes import AurHelper
 
 
 class PackageManager:
+    PACMAN_MISSING_TARGET = re.compile(r"error: target not found: (\S+)")
+    # pacman называет конфликтующие пакеты вместе с версией: "name-[epoch:]pkgver-pkgrel"
+    PACMAN_CONFLICT = re.compile(r"^:: (\S+)-[^-\s]+-[^-\s]+ and (\S+)-[^-\s]+-[^-\s]+ are in conflict", re.MULTILINE)
+    PACMAN_BROKEN_DEPENDENCY = re.compile(r"^:: installing (\S+) \(.*?\) breaks dependency", re.MULTILINE)
+    PACMAN_UNSATISFIED_DEPENDENCY = re.compile(r"^:: unable to satisfy dependency '.*?' required by (\S+)", re.MULTILINE)
+    PACMAN_DOWNLOAD_FAILED = "failed to retrieve some files"
+    database = PacmanDatabase()
+    build_profile = BuildProfile()
+    report = InstallReport()
+    prefetch_process: Optional[subprocess.Popen] = None
+    prefetch_packages_list: List[str] = []
+    prefetch_cache_dir: Optional[str] = None
+    # Маленькие транзакции (git, base-devel, ccache) не ждут фоновую загрузку, а качают свои пакеты сами
+    PREFETCH_WAIT_THRESHOLD = 10
+    # Дополнительные аргументы всех вызовов pacman (например, --config локального репозитория)
+    pacman_args: List[str] = []
+
     @staticmethod
     def update_database() -> None:
         logger.info("Starting to update the package database.")
 
         try:
-            subprocess.run(["sudo", "pacman", "-Sy"], check=True)
+            subprocess.run(["sudo", "pacman", *PackageManager.pacman_args, "-Sy"], check=True)
             logger.success("The package database update was successful!")
         except Exception:
             logger.error(f"Error updating package database: {traceback.format_exc()}")
 
     @staticmethod
-    def check_package_installed(package: str) -> bool:
+    def prefetch_packages(
+        packages_list: List[str],
+        db_dir: str = "/tmp/meowrch-prefetch-db",
+        cache_dir: str = "/var/cache/pacman/meowrch-prefetch",
+        log_path: str = "/tmp/meowrch-prefetch.log",
+    ) -> None:
+        """Starts downloading the packages in the background ("pacman -Sw").
+        The download uses its own database directory with links to the real databases,
+        so its lock doesn't block the installation of other packages in the meantime,
+        and its own cache directory, so it never writes the same files as those installations.
+        The transactions look for the packages in that directory too (see cache_args).
+
+        Args:
+            packages_list (List[str]): List of package names
+            db_dir (str, optional): Database directory of the download. Defaults to "/tmp/meowrch-prefetch-db".
+            cache_dir (str, optional): Cache directory of the download. Defaults to "/var/cache/pacman/meowrch-prefetch".
+            log_path (str, optional): Where the pacman output goes. Defaults to "/tmp/meowrch-prefetch.log".
+        """
+        status = PackageManager.database.check(packages_list)
+        if len(status.available) < 1:
+            return
+
         try:
-            subprocess.run(
-                ["pacman", "-Q", package],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            return True
-        except subprocess.CalledProcessError:
-            return False
-        except FileNotFoundError:
-            return False
+            os.makedirs(db_dir, exist_ok=True)
+            for name in ("local", "sync"):
+                link = os.path.join(db_dir, name)
+                if not os.path.islink(link):
+                    os.symlink(os.path.join(PackageManager.database.db_path, name), link)
+
+            with open(log_path, "w") as log:
+                # sudo -n: в фоне пароль не спросить, без сохранённых прав просто скачаем во время установки
+                PackageManager.prefetch_process = subprocess.Popen(
+                    [
+                        "sudo", "-n", "pacman", *PackageManager.pacman_args, "-Sw", "--noconfirm", "--needed",
+                        "--dbpath", db_dir, "--cachedir", cache_dir, *status.available,
+                    ],
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            PackageManager.prefetch_packages_list = status.available
+            PackageManager.prefetch_cache_dir = cache_dir
+        except Exception:
+            logger.error(f"Error while starting the package download: {traceback.format_exc()}")
+            return
+
+        logger.info(f"Downloading {len(status.available)} packages in the background (log: {log_path})")
+
+    @staticmethod
+    def wait_prefetch(packages_list: List[str]) -> None:
+        """Waits for the background download if it contains enough of the packages,
+        so that the installation takes them from the cache instead of downloading them again
+
+        Args:
+            packages_list (List[str]): Packages that are about to be installed
+        """
+        process = PackageManager.prefetch_process
+        if process is None:
+            return
+
+        prefetched = set(PackageManager.prefetch_packages_list)
+        if sum(1 for p in packages_list if p in prefetched) <= PackageManager.PREFETCH_WAIT_THRESHOLD:
+            return
+
+        if process.poll() is None:
+            logger.info("Waiting for the background package download to finish...")
+            process.wait()
+
+        if process.returncode != 0:
+            logger.warning("The background package download failed, the packages will be downloaded during installation")
+
+        PackageManager.prefetch_process = None
+
+    @staticmethod
+    def cache_args() -> List[str]:
+        """Arguments that let a transaction take the packages from the background download.
+        The first cache directory is where pacman downloads, so the configured ones stay first.
+
+        Returns:
+            List[str]: "--cachedir" arguments or nothing if there is no background download
+        """
+        if PackageManager.prefetch_cache_dir is None:
+            return []
+
+        cache_dirs = [*PackageManager.database.cache_dirs(), PackageManager.prefetch_cache_dir]
+        return [arg for cache_dir in cache_dirs for arg in ("--cachedir", cache_dir)]
+
+    @staticmethod
+    def finish_prefetch() -> None:
+        """Stops the background download and moves the downloaded packages into the pacman cache,
+        so that paccache and the local repository export find them there"""
+        cache_dir = PackageManager.prefetch_cache_dir
+        if cache_dir is None:
+            return
+
+        process = PackageManager.prefetch_process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            process.wait()
+
+        PackageManager.prefetch_process = None
+        PackageManager.prefetch_cache_dir = None
+
+        try:
+            files = [
+                os.path.join(cache_dir, f) for f in sorted(os.listdir(cache_dir))
+                if ".pkg.tar" in f and not f.endswith(".part")
+            ]
+        except OSError:
+            return
+
+        try:
+            if len(files) > 0:
+                destination = PackageManager.database.cache_dirs()[0]
+                subprocess.run(["sudo", "mv", "-n", "-t", destination, *files], check=True)
+            subprocess.run(["sudo", "rm", "-rf", cache_dir], check=True)
+        except Exception:
+            logger.error(f"Error while moving the downloaded packages into the pacman cache: {traceback.format_exc()}")
+
+    @staticmethod
+    def check_package_installed(package: str) -> bool:
+        return PackageManager.database.is_installed(package)
 
     @staticmethod
     def clone_repository(repo_url: str, target_path: str) -> bool:
@@ -65,7 +197,12 @@ class PackageManager:
                     if not cloned:
                         return
 
-                subprocess.run(["makepkg", "-si"], cwd=target_path, check=True)
+                with PackageManager.build_profile.measure("yay"):
+                    subprocess.run(
+                        ["makepkg", "-si", *PackageManager.build_profile.makepkg_args()],
+                        cwd=target_path,
+                        check=True,
+                    )
         except Exception:
             logger.error(f"Error while installing \"yay\": {traceback.format_exc()}")
             exit(1)
@@ -90,7 +227,12 @@ class PackageManager:
                     if not cloned:
                         return
 
-                subprocess.run(["makepkg", "-si"], cwd=target_path, check=True)
+                with PackageManager.build_profile.measure("paru"):
+                    subprocess.run(
+                        ["makepkg", "-si", *PackageManager.build_profile.makepkg_args()],
+                        cwd=target_path,
+                        check=True,
+                    )
         except Exception:
             logger.error(f"Error while installing \"paru\": {traceback.format_exc()}")
             exit(1)
@@ -115,21 +257,26 @@ class PackageManager:
             if not cloned:
                 return False
 
-            subprocess.run(
-                ["sh", "./install-i3lock-color.sh"], cwd=target_path, check=True
-            )
+            with PackageManager.build_profile.measure(dir_name):
+                subprocess.run(
+                    ["sh", "./install-i3lock-color.sh"],
+                    cwd=target_path,
+                    env=PackageManager.build_profile.env(),
+                    check=True,
+                )
             return True
         except Exception:
             return False
 
     @staticmethod
-    def install_package(package: str, aur: AurHelper = None, error_retries: int = 3) -> bool:
+    def install_package(package: str, aur: AurHelper = None, error_retries: int = 3, as_deps: bool = False) -> bool:
         """Installs the package with pacman or some aur helper
 
         Args:
             package (str): Name of the package to be installed
             aur (AurHelper, optional): If you need to install via the AUR helper, you need to specify it here. Defaults to None.
             error_retries (int, optional): How many times will the function attempt to install the package. Defaults to 3.
+            as_deps (bool, optional): Mark the package as installed as a dependency. Defaults to False.
 
         Returns:
             bool: Status, whether the package is installed or not
@@ -137,15 +284,27 @@ class PackageManager:
 
         for _ in range(error_retries):
             try:
-                if aur is not None:
-                    subprocess.run(
-                        [aur.value, "-S", "--noconfirm", "--needed", package], check=True
-                    )
-                else:
-                    subprocess.run(
-                        ["sudo", "pacman", "-S", "--noconfirm", "--needed", package],
-                        check=True,
-                    )
+                with PackageManager.report.attempt([package], aur.value if aur is not None else "pacman") as attempt:
+                    if aur is not None:
+                        with PackageManager.build_profile.measure(package):
+                            subprocess.run(
+                                [
+                                    aur.value, "-S", "--noconfirm", "--needed", *(["--asdeps"] if as_deps else []),
+                                    *PackageManager.build_profile.helper_args(), package,
+                                ],
+                                check=True,
+                            )
+                    else:
+                        command = [
+                            "sudo", "pacman", *PackageManager.pacman_args, *PackageManager.cache_args(),
+                            "-S", "--noconfirm", "--needed", *(["--asdeps"] if as_deps else []), package,
+                        ]
+                        returncode, attempt.output, _ = PackageManager._run_tee(command)
+                        if returncode != 0:
+                            raise subprocess.CalledProcessError(returncode, command)
+
+                    attempt.success = True
+
                 logger.success(f'Package "{package}" has been successfully installed!')
                 return True
             except Exception:
@@ -163,22 +322,197 @@ class PackageManager:
         return False
     
     @staticmethod
-    def install_packages(packages_list: List[str], aur: AurHelper = None) -> List[str]:
-        """Installs a lot of packages via pacman or some aur helper
+    def _run_tee(command: List[str]) -> Tuple[int, str, str]:
+        """Runs the command and shows its output as usual, keeping a copy of it
+
+        Returns:
+            Tuple[int, str, str]: Exit code, stdout and stderr
+        """
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout, stderr = [], []
+
+        def read(stream, target, lines):
+            for line in stream:
+                target.write(line)
+                lines.append(line)
+
+        # stderr читается отдельно, чтобы ни один из потоков не переполнил буфер
+        reader = threading.Thread(target=read, args=(process.stderr, sys.stderr, stderr), daemon=True)
+        reader.start()
+        read(process.stdout, sys.stdout, stdout)
+        reader.join()
+
+        return process.wait(), "".join(stdout), "".join(stderr)
+
+    @staticmethod
+    def _pacman_transaction(packages: List[str], as_deps: bool = False) -> Tuple[bool, str]:
+        """Runs a single "pacman -S" transaction for all the packages
+
+        Args:
+            packages (List[str]): List of package names
+            as_deps (bool, optional): Mark the packages as installed as dependencies. Defaults to False.
+
+        Returns:
+            Tuple[bool, str]: Whether the transaction succeeded and what pacman wrote to stdout and stderr
+        """
+        with PackageManager.report.attempt(packages, "pacman") as attempt:
+            try:
+                # Вывод pacman нужен для разбора ошибок и подсчёта скачанного, но пользователь тоже должен его видеть
+                returncode, output, errors = PackageManager._run_tee(
+                    [
+                        "sudo", "pacman", *PackageManager.pacman_args, *PackageManager.cache_args(),
+                        "-S", "--noconfirm", "--needed", *(["--asdeps"] if as_deps else []), *packages,
+                    ]
+                )
+            except Exception:
+                return False, traceback.format_exc()
+
+            attempt.output = output
+            attempt.success = returncode == 0
+
+        # Причины ошибок ("... are in conflict", "... breaks dependency") pacman пишет в stdout, а сами ошибки - в stderr
+        return returncode == 0, output + errors
+
+    @staticmethod
+    def _find_offending_packages(output: str, packages: List[str]) -> List[str]:
+        """Finds the packages that broke the transaction by the pacman error messages
+
+        Args:
+            output (str): What pacman wrote to stdout and stderr
+            packages (List[str]): Packages of the transaction
+
+        Returns:
+            List[str]: Packages to exclude from the transaction, empty if the reason is unknown
+        """
+        offending = set(PackageManager.PACMAN_MISSING_TARGET.findall(output))
+        offending.update(PackageManager.PACMAN_BROKEN_DEPENDENCY.findall(output))
+        offending.update(PackageManager.PACMAN_UNSATISFIED_DEPENDENCY.findall(output))
+
+        for first, second in PackageManager.PACMAN_CONFLICT.findall(output):
+            # Из двух конфликтующих пакетов оставляем тот, что раньше в списке
+            candidates = [p for p in (first, second) if p in packages]
+            if len(candidates) > 0:
+                offending.add(max(candidates, key=packages.index))
+
+        return [p for p in packages if p in offending]
+
+    @staticmethod
+    def install_packages_batch(packages_list: List[str], error_retries: int = 3, as_deps: bool = False) -> List[str]:
+        """Installs pacman packages in as few transactions as possible.
+        If the transaction fails, the offending packages are excluded by the pacman errors,
+        and if they can't be recognized, the list is bisected until the broken packages are found.
+
+        Args:
+            packages_list (List[str]): List of package names
+            error_retries (int, optional): How many times a transaction is repeated when downloading fails. Defaults to 3.
+            as_deps (bool, optional): Mark the packages as installed as dependencies. Defaults to False.
+
+        Returns:
+            List[str]: List of packages that could not be installed
+        """
+        packages = list(dict.fromkeys(packages_list))
+
+        if len(packages) < 1:
+            return []
+        elif len(packages) == 1:
+            return [] if PackageManager.install_package(packages[0], error_retries=error_retries, as_deps=as_deps) else packages
+
+        for _ in range(error_retries):
+            success, output = PackageManager._pacman_transaction(packages, as_deps=as_deps)
+
+            if success:
+                logger.success(f"{len(packages)} packages have been successfully installed in one transaction!")
+                return []
+
+            offending = PackageManager._find_offending_packages(output, packages)
+
+            if len(offending) > 0:
+                logger.error(f"Packages {', '.join(offending)} can't be installed, installing the rest without them")
+                return offending + PackageManager.install_packages_batch(
+                    [p for p in packages if p not in offending], error_retries=error_retries, as_deps=as_deps
+                )
+
+            if PackageManager.PACMAN_DOWNLOAD_FAILED not in output:
+                break
+
+        ##==> Причина неизвестна - делим список пополам
+        ###########################################
+        middle = len(packages) // 2
+        logger.warning(f"The transaction of {len(packages)} packages failed, splitting it in two")
+
+        return (
+            PackageManager.install_packages_batch(packages[:middle], error_retries=error_retries, as_deps=as_deps)
+            + PackageManager.install_packages_batch(packages[middle:], error_retries=error_retries, as_deps=as_deps)
+        )
+
+    @staticmethod
+    def install_package_files(files: List[str], as_deps: bool = False) -> bool:
+        """Installs already built package files in a single "pacman -U" transaction
+
+        Args:
+            files (List[str]): Paths to the *.pkg.tar.* files
+            as_deps (bool, optional): Mark the packages as installed as dependencies. Defaults to False.
+
+        Returns:
+            bool: Whether the transaction succeeded
+        """
+        if len(files) < 1:
+            return True
+
+        command = ["sudo", "pacman", *PackageManager.pacman_args, "-U", "--noconfirm", "--needed"]
+        if as_deps:
+            command.append("--asdeps")
+
+        names = [os.path.basename(f).rsplit("-", 3)[0] for f in files]
+
+        with PackageManager.report.attempt(names, "pacman -U") as attempt:
+            try:
+                subprocess.run([*command, *files], check=True)
+                attempt.success = True
+                return True
+            except Exception:
+                logger.error(f"Error while installing the package files: {traceback.format_exc()}")
+                return False
+
+    @staticmethod
+    def install_packages(
+        packages_list: List[str], aur: AurHelper = None, error_retries: int = 3, as_deps: bool = False
+    ) -> List[str]:
+        """Installs a lot of packages via pacman or some aur helper.
+        Pacman packages are installed in a single transaction (see install_packages_batch).
 
         Args:
             packages_list (List[str]): List of package names
             aur (AurHelper, optional): If you need to install via the AUR helper, you need to specify it here. Defaults to None.
+            error_retries (int, optional): How many times a package is attempted. Defaults to 3.
+            as_deps (bool, optional): Mark the packages as installed as dependencies. Defaults to False.
 
         Returns:
             List[str]: List of packages that could not be installed
         """
+        if aur is None:
+            PackageManager.wait_prefetch(packages_list)
+            status = PackageManager.database.check(packages_list)
+
+            if len(status.unknown) > 0:
+                logger.error(f"Packages not found in any repository: {', '.join(status.unknown)}")
+                PackageManager.report.outcome(status.unknown, "not found")
+
+            return status.unknown + PackageManager.install_packages_batch(
+                status.available, error_retries=error_retries, as_deps=as_deps
+            )
+
         not_installed_packages = []
 
         for package in packages_list:
+            if PackageManager.check_package_installed(package):
+                continue
+
             installed = PackageManager.install_package(
                 package=package, 
-                aur=aur
+                aur=aur,
+                error_retries=error_retries,
+                as_deps=as_deps,
             )
 
             if not installed:
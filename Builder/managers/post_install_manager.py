@@ -4,24 +4,40 @@ import tempfile
 import traceback
 import json
 from pathlib import Path
+from typing import Callable, List, Tuple
 
 from loguru import logger
 from packages import CUSTOM
 
 
 class PostInstallation:
+    @staticmethod
+    def steps(auto_update_packages: bool = False) -> List[Tuple[str, Callable[[], None]]]:
+        """Independent post-installation steps, so that they can run as separate stages
+
+        Returns:
+            List[Tuple[str, Callable[[], None]]]: Name and function of every step
+        """
+        steps = [
+            ("fish_shell", PostInstallation._set_fish_shell),
+            ("gamemode_group", PostInstallation._add_to_gamemode_group),
+            ("default_term", PostInstallation._set_default_term),
+            ("locale", PostInstallation._ensure_en_us_locale),
+            ("mewline", PostInstallation._configure_mewline),
+        ]
+
+        if auto_update_packages:
+            steps.append(("auto_update", PostInstallation._configure_auto_update))
+
+        return steps
+
     @staticmethod
     def apply(auto_update_packages: bool = False):
         logger.info("The post-installation configuration is starting...")
-        PostInstallation._set_fish_shell()
-        PostInstallation._add_to_gamemode_group()
-        PostInstallation._set_default_term()
-        PostInstallation._ensure_en_us_locale()
-        PostInstallation._configure_mewline()
-        
-        if auto_update_packages:
-            PostInstallation._configure_auto_update()
-            
+
+        for _, step in PostInstallation.steps(auto_update_packages=auto_update_packages):
+            step()
+
         logger.info("The post-installation configuration is complete!")
 
     @staticmethod
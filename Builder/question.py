@@ -1,5 +1,6 @@
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Union
 
+import yaml
 import inquirer
 from colorama import Fore
 from inquirer import Checkbox as QuestionCheckbox
@@ -12,6 +13,24 @@ from utils.schemes import BuildOptions, AurHelper
 
 class Question:
     answers_type = Dict[str, Union[str, List[str]]]
+    FIREFOX_PLUGINS = ["Dark Reader", "uBlock Origin", "TWP", "Unpaywall", "Tamper Monkey"]
+
+    # Ответы для установки без вопросов: тип, допустимые значения и значение по умолчанию (как в опросе).
+    # None по умолчанию у драйверов - автоопределение, у custom_packages - выбор из packages.py
+    UNATTENDED_ANSWERS = {
+        "make_backup": (bool, None, False),
+        "install_wm": (list, ["hyprland", "bspwm"], ["hyprland"]),
+        "aur_helper": (str, ["yay", "paru"], "yay"),
+        "enable_multilib": (bool, None, True),
+        "update_arch_database": (bool, None, True),
+        "auto_update_packages": (bool, None, True),
+        "install_drivers": (list, ["Nvidia", "Intel", "AMD"], None),
+        "fast_builds": (bool, None, False),
+        "aur_jobs": (int, None, 0),
+        "ff_plugins": (list, FIREFOX_PLUGINS, []),
+        "custom_packages": (list, [name for category in CUSTOM.values() for name in category], None),
+        "reboot": (bool, None, False),
+    }
 
     @staticmethod
     def _choose_custom_packages() -> None:
@@ -30,7 +49,7 @@ class Question:
 
             category_question = inquirer.List(
                 "category",
-                message="9) Select a category of packages and choose the ones you want",
+                message="10) Select a category of packages and choose the ones you want",
                 choices=list(
                     category
                     + f" | {Fore.YELLOW}Selected: {selected_counts[category]}"
@@ -81,6 +100,133 @@ class Question:
                 else:
                     info.selected = False
 
+    @staticmethod
+    def read_answers_file(path: str) -> Dict[str, Any]:
+        """Reads the answers file. JSON is a subset of YAML, so both are read the same way
+
+        Raises:
+            ValueError: The file can't be read or is not a mapping
+        """
+        try:
+            with open(path, "r") as file:
+                answers = yaml.safe_load(file)
+        except (OSError, yaml.YAMLError) as e:
+            raise ValueError(f'Failed to read the answers file "{path}": {e}')
+
+        if answers is None:
+            return {}
+        if not isinstance(answers, dict):
+            raise ValueError(f'The answers file "{path}" must contain a mapping of answers')
+
+        return answers
+
+    @staticmethod
+    def validate_answers(answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Checks the answers and fills in the missing ones with the defaults of the survey
+
+        Raises:
+            ValueError: All the problems with the answers
+
+        Returns:
+            Dict[str, Any]: All the answers
+        """
+        errors = []
+        result = {}
+
+        for key in answers:
+            if key not in Question.UNATTENDED_ANSWERS:
+                errors.append(f'unknown answer "{key}"')
+
+        for key, (kind, choices, default) in Question.UNATTENDED_ANSWERS.items():
+            value = answers.get(key, default)
+
+            if value is None:
+                result[key] = None
+            elif kind is list:
+                if isinstance(value, str):
+                    value = [value]
+                if not isinstance(value, list):
+                    errors.append(f'"{key}" must be a list')
+                    continue
+
+                # Регистр не важен: "nvidia" и "Nvidia" - один ответ
+                canonical = {str(c).lower(): c for c in choices}
+                unknown = [v for v in value if str(v).lower() not in canonical]
+                if len(unknown) > 0:
+                    errors.append(f'"{key}" has unknown values: {", ".join(map(str, unknown))}')
+                    continue
+
+                result[key] = list(dict.fromkeys(canonical[str(v).lower()] for v in value))
+            elif kind is bool:
+                if not isinstance(value, bool):
+                    errors.append(f'"{key}" must be true or false')
+                    continue
+                result[key] = value
+            elif kind is int:
+                if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                    errors.append(f'"{key}" must be a non-negative number')
+                    continue
+                result[key] = value
+            else:
+                if str(value).lower() not in choices:
+                    errors.append(f'"{key}" must be one of: {", ".join(choices)}')
+                    continue
+                result[key] = str(value).lower()
+
+        if "install_wm" in result and len(result["install_wm"]) < 1:
+            errors.append('"install_wm" must contain at least one window manager')
+
+        if len(errors) > 0:
+            raise ValueError("; ".join(errors))
+
+        return result
+
+    @staticmethod
+    def get_unattended_answers(answers: Dict[str, Any]) -> BuildOptions:
+        """Takes the answers without any prompts
+
+        Args:
+            answers (Dict[str, Any]): Answers checked by validate_answers
+        """
+        if answers["install_drivers"] is None:
+            answers = {**answers, "install_drivers": DriversManager.auto_detection()}
+
+        if answers["custom_packages"] is not None:
+            for category in CUSTOM.values():
+                for name, info in category.items():
+                    info.selected = name in answers["custom_packages"]
+
+        return Question.build_options(answers)
+
+    @staticmethod
+    def build_options(answers: Dict[str, Any]) -> BuildOptions:
+        """Turns the answers into BuildOptions. Yes/No answers are already booleans here"""
+        if answers["aur_helper"] == "paru":
+            aur_helper = AurHelper.PARU
+        else:
+            aur_helper = AurHelper.YAY
+
+        return BuildOptions(
+            make_backup=answers["make_backup"],
+            install_bspwm="bspwm" in answers["install_wm"],
+            install_hyprland="hyprland" in answers["install_wm"],
+            aur_helper=aur_helper,
+            enable_multilib=answers["enable_multilib"],
+            update_arch_database=answers["update_arch_database"],
+            auto_update_packages=answers["auto_update_packages"],
+            install_drivers=len(answers["install_drivers"]) > 0,
+            intel_driver="Intel" in answers["install_drivers"],
+            nvidia_driver="Nvidia" in answers["install_drivers"],
+            amd_driver="AMD" in answers["install_drivers"],
+            ff_darkreader="Dark Reader" in answers["ff_plugins"],
+            ff_ublock="uBlock Origin" in answers["ff_plugins"],
+            ff_twp="TWP" in answers["ff_plugins"],
+            ff_unpaywall="Unpaywall" in answers["ff_plugins"],
+            ff_tampermonkey="Tamper Monkey" in answers["ff_plugins"],
+            aur_jobs=answers.get("aur_jobs", 0),
+            fast_builds=answers["fast_builds"],
+        )
+
     @staticmethod
     def get_answers():
         drivers = DriversManager.auto_detection()
@@ -144,9 +290,16 @@ class Question:
                 default=drivers,
                 carousel=True,
             ),
+            QuestionList(
+                name="fast_builds",
+                message="8) Speed up AUR builds (parallel make, ccache, tmpfs, no package compression)?",
+                choices=["Yes", "No"],
+                default="No",
+                carousel=True,
+            ),
             QuestionCheckbox(
                 name="ff_plugins",
-                message="8) Would you like to add useful plugins for firefox?",
+                message="9) Would you like to add useful plugins for firefox?",
                 choices=firefox_choices,
                 default={},
                 carousel=True,
@@ -163,26 +316,7 @@ class Question:
             i.split(" | ")[0] for i in answers["ff_plugins"]
         ]
 
-        if answers["aur_helper"] == "paru":
-            aur_helper = AurHelper.PARU
-        else:
-            aur_helper = AurHelper.YAY
+        for key in ["make_backup", "enable_multilib", "update_arch_database", "auto_update_packages", "fast_builds"]:
+            answers[key] = answers[key] == "Yes"
 
-        return BuildOptions(
-            make_backup=answers["make_backup"] == "Yes",
-            install_bspwm="bspwm" in answers["install_wm"],
-            install_hyprland="hyprland" in answers["install_wm"],
-            aur_helper=aur_helper,
-            enable_multilib=answers["enable_multilib"] == "Yes",
-            update_arch_database=answers["update_arch_database"] == "Yes",
-            auto_update_packages=answers["auto_update_packages"] == "Yes",
-            install_drivers=len(answers["install_drivers"]) > 0,
-            intel_driver="Intel" in answers["install_drivers"],
-            nvidia_driver="Nvidia" in answers["install_drivers"],
-            amd_driver="AMD" in answers["install_drivers"],
-            ff_darkreader="Dark Reader" in answers["ff_plugins"],
-            ff_ublock="uBlock Origin" in answers["ff_plugins"],
-            ff_twp="TWP" in answers["ff_plugins"],
-            ff_unpaywall="Unpaywall" in answers["ff_plugins"],
-            ff_tampermonkey="Tamper Monkey" in answers["ff_plugins"]
-        )
+        return Question.build_options(answers)
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import shutil
+import threading
+import subprocess
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from loguru import logger
+
+
+class BuildProfile:
+    """Makepkg settings for faster local builds: parallel make, ccache, a tmpfs build directory
+    and uncompressed packages (they are installed right away and never distributed).
+
+    /etc/makepkg.conf is not modified: the profile is a separate config that sources it and overrides
+    the settings, and it is passed to makepkg with --config. Reverting removes the config and unmounts the tmpfs.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        config_path: str = "/tmp/meowrch-makepkg.conf",
+        build_dir: str = "/tmp/meowrch-build",
+        times_path: str = os.path.expanduser("~/.cache/meowrch/build-times.json"),
+        min_tmpfs_ram: int = 8 * 1024 ** 3,
+    ) -> None:
+        self.enabled = enabled
+        self.config_path = config_path
+        self.build_dir = build_dir
+        self.times_path = times_path
+        self.min_tmpfs_ram = min_tmpfs_ram
+        self.jobs = os.cpu_count() or 1
+        self.mounted = False
+        self.applied = False
+        # Пакеты собираются параллельно, а время всех сборок хранится в одном файле
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def available_memory() -> int:
+        try:
+            with open("/proc/meminfo", "r") as file:
+                for line in file:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+
+        return 0
+
+    @staticmethod
+    def is_tmpfs(path: str) -> bool:
+        """Whether the path is on a tmpfs (the longest mount point that contains it)"""
+        path = os.path.realpath(path)
+        best, fstype = "", None
+
+        try:
+            with open("/proc/mounts", "r") as file:
+                for line in file:
+                    _, mount_point, kind = line.split()[:3]
+                    if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+                        best, fstype = mount_point, kind
+        except (OSError, ValueError):
+            return False
+
+        return fstype == "tmpfs"
+
+    def _prepare_build_dir(self) -> bool:
+        """Puts the build directory on a tmpfs if there is enough free RAM
+
+        Returns:
+            bool: Whether builds can go to the build directory
+        """
+        memory = self.available_memory()
+        if memory < self.min_tmpfs_ram:
+            logger.info(f"Not enough free RAM for a tmpfs build directory ({memory // 1024 ** 3} GB), building on disk")
+            return False
+
+        os.makedirs(self.build_dir, exist_ok=True)
+        if self.is_tmpfs(self.build_dir):
+            return True
+
+        try:
+            subprocess.run(
+                ["sudo", "mount", "-t", "tmpfs", "-o", f"size={memory // 2 // 1024 ** 3}G,mode=1777", "tmpfs", self.build_dir],
+                check=True,
+            )
+            self.mounted = True
+            return True
+        except Exception:
+            logger.error(f"Error while mounting the tmpfs build directory: {traceback.format_exc()}")
+            return False
+
+    def apply(self) -> None:
+        if not self.enabled or self.applied:
+            return
+
+        lines = [
+            "source /etc/makepkg.conf",
+            # -l не даёт параллельным сборкам AUR перегрузить систему
+            f'MAKEFLAGS="-j{self.jobs} -l{self.jobs}"',
+            "PKGEXT='.pkg.tar'",
+        ]
+
+        if shutil.which("ccache") is not None:
+            lines.append('BUILDENV=("${BUILDENV[@]/\\!ccache/ccache}")')
+        else:
+            logger.warning("ccache is not installed, building without the compiler cache")
+
+        if self._prepare_build_dir():
+            lines.append(f'BUILDDIR="{self.build_dir}"')
+
+        with open(self.config_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+
+        self.applied = True
+        logger.info(f"The AUR build profile is applied: {self.jobs} make jobs, config {self.config_path}")
+
+    def revert(self) -> None:
+        if not self.applied:
+            return
+
+        if os.path.exists(self.config_path):
+            os.remove(self.config_path)
+
+        if self.mounted:
+            try:
+                subprocess.run(["sudo", "umount", self.build_dir], check=True)
+                self.mounted = False
+            except Exception:
+                logger.error(f"Error while unmounting the tmpfs build directory: {traceback.format_exc()}")
+
+        self.applied = False
+        logger.info("The AUR build profile is reverted")
+
+    def __enter__(self) -> "BuildProfile":
+        self.apply()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.revert()
+
+    def makepkg_args(self) -> List[str]:
+        return ["--config", self.config_path] if self.applied else []
+
+    def helper_args(self) -> List[str]:
+        """Arguments for yay/paru that pass the profile to their makepkg"""
+        return ["--mflags", f"--config {self.config_path}"] if self.applied else []
+
+    def env(self) -> Dict[str, str]:
+        """Environment for builds that don't go through makepkg (make-based install scripts)"""
+        if not self.applied:
+            return dict(os.environ)
+
+        return {**os.environ, "MAKEFLAGS": f"-j{self.jobs} -l{self.jobs}"}
+
+    def _load_times(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.times_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def measure(self, package: str) -> Iterator[None]:
+        """Measures the build of the package and reports how much time the profile saved.
+        The time saved is compared with the last build of the same package without the profile.
+        """
+        start = time.monotonic()
+        yield
+        duration = time.monotonic() - start
+
+        mode = "profile" if self.applied else "default"
+
+        with self.lock:
+            times = self._load_times()
+            times.setdefault(package, {})[mode] = round(duration, 1)
+            baseline = times[package].get("default")
+
+            try:
+                os.makedirs(os.path.dirname(self.times_path), exist_ok=True)
+                with open(self.times_path + ".tmp", "w") as file:
+                    json.dump(times, file, indent=2)
+                os.replace(self.times_path + ".tmp", self.times_path)
+            except OSError:
+                logger.warning(f"Failed to save the build times: {traceback.format_exc()}")
+
+        if self.applied and baseline is not None:
+            logger.info(f'"{package}" was built in {duration:.1f}s, {baseline - duration:.1f}s saved by the build profile')
+        else:
+            logger.info(f'"{package}" was built in {duration:.1f}s')
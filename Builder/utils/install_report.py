@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import time
+import socket
+import platform
+import threading
+import subprocess
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from utils.schemes import PackageAttempt
+
+
+class InstallReport:
+    """Machine-readable record of an installation: every stage and every attempt to install packages.
+
+    At the end it is written as JSON, so installations can be compared between machines and releases,
+    and a summary of the slowest stages and packages, the retries and the failures is logged.
+    """
+
+    SIZE_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+    SIZE = r"(-?\d+(?:\.\d+)?) (B|KiB|MiB|GiB)"
+    TOTAL_DOWNLOAD = re.compile(rf"^Total Download Size:\s+{SIZE}", re.MULTILINE)
+    # Строка таблицы VerbosePkgLists: "extra/firefox  120.0-1  230.15 MiB  70.23 MiB"
+    PACKAGE_ROW = re.compile(r"^[\w.+-]+/([\w@.+-]+)\s")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.attempts: List[PackageAttempt] = []
+        self.outcomes: Dict[str, str] = {}
+
+    @classmethod
+    def parse_size(cls, value: str, unit: str) -> int:
+        return int(float(value) * cls.SIZE_UNITS[unit])
+
+    @classmethod
+    def parse_downloads(cls, output: str) -> Tuple[int, Dict[str, int]]:
+        """Download sizes from the pacman output
+
+        Returns:
+            Tuple[int, Dict[str, int]]: Total bytes and bytes of every package (only with VerbosePkgLists)
+        """
+        total = cls.TOTAL_DOWNLOAD.search(output)
+        packages = {}
+
+        for line in output.splitlines():
+            row = cls.PACKAGE_ROW.match(line)
+            sizes = re.findall(cls.SIZE, line)
+            # Без скачивания в строке остаётся только Net Change
+            if row is not None and len(sizes) >= 2:
+                packages[row.group(1)] = cls.parse_size(*sizes[-1])
+
+        return (cls.parse_size(*total.groups()) if total else sum(packages.values())), packages
+
+    @contextmanager
+    def attempt(self, packages: List[str], method: str) -> Iterator[PackageAttempt]:
+        """Measures one attempt to install packages. The caller sets success and output of the yielded record
+
+        Args:
+            packages (List[str]): Packages of the attempt
+            method (str): How they are installed: "pacman", "pacman -U", "makepkg", "yay" or "paru"
+        """
+        record = PackageAttempt(packages=list(packages), method=method, start=time.time())
+
+        try:
+            yield record
+        finally:
+            record.end = time.time()
+            if record.output:
+                record.download_bytes, record.package_bytes = self.parse_downloads(record.output)
+                record.output = ""
+
+            with self.lock:
+                self.attempts.append(record)
+
+    def stage(self, name: str, result: str, start: Optional[float], end: Optional[float]) -> None:
+        with self.lock:
+            self.stages[name] = {
+                "result": result,
+                "start": start,
+                "end": end,
+                "seconds": round(end - start, 3) if start is not None and end is not None else None,
+            }
+
+    def outcome(self, packages: List[str], outcome: str) -> None:
+        with self.lock:
+            self.outcomes.update({package: outcome for package in packages})
+
+    def packages(self) -> Dict[str, Dict[str, Any]]:
+        """Statistics of every package. The time of a transaction is shared equally between its packages"""
+        result: Dict[str, Dict[str, Any]] = {}
+
+        for attempt in self.attempts:
+            share = (attempt.end - attempt.start) / max(len(attempt.packages), 1)
+            for package in attempt.packages:
+                info = result.setdefault(
+                    package, {"attempts": 0, "seconds": 0.0, "download_bytes": 0, "methods": [], "outcome": "failed"}
+                )
+                info["attempts"] += 1
+                info["seconds"] += share
+                info["download_bytes"] = max(info["download_bytes"], attempt.package_bytes.get(package, 0))
+                if attempt.method not in info["methods"]:
+                    info["methods"].append(attempt.method)
+                if attempt.success:
+                    info["outcome"] = "installed"
+
+        for package, outcome in self.outcomes.items():
+            result.setdefault(
+                package, {"attempts": 0, "seconds": 0.0, "download_bytes": 0, "methods": [], "outcome": outcome}
+            )["outcome"] = outcome
+
+        for info in result.values():
+            info["seconds"] = round(info["seconds"], 3)
+
+        return result
+
+    @staticmethod
+    def release() -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except Exception:
+            return None
+
+    def write(self, path: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self.lock:
+            packages = self.packages()
+            report = {
+                "start": self.start,
+                "end": time.time(),
+                "seconds": round(time.time() - self.start, 3),
+                "machine": {
+                    "hostname": socket.gethostname(),
+                    "kernel": platform.release(),
+                    "cpus": os.cpu_count(),
+                },
+                "release": self.release(),
+                "options": options,
+                "stages": self.stages,
+                "packages": packages,
+                "transactions": [
+                    {**asdict(a), "seconds": round(a.end - a.start, 3)}
+                    for a in self.attempts
+                ],
+                "download_bytes": sum(a.download_bytes for a in self.attempts),
+            }
+
+        for attempt in report["transactions"]:
+            attempt.pop("output")
+
+        with open(path + ".tmp", "w") as file:
+            json.dump(report, file, indent=2)
+        os.replace(path + ".tmp", path)
+
+        return report
+
+    @staticmethod
+    def summary(report: Dict[str, Any], top: int = 10) -> None:
+        """Logs the slowest stages and packages, the retries and the failures"""
+        stages = sorted(
+            ((name, info) for name, info in report["stages"].items() if info["seconds"] is not None),
+            key=lambda item: item[1]["seconds"], reverse=True,
+        )
+        packages = sorted(report["packages"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+
+        logger.info(f"Installation took {report['seconds']:.0f}s, downloaded {report['download_bytes'] / 1024 ** 2:.1f} MiB")
+
+        logger.info(f"{'Stage':<24} {'Result':<8} {'Time':>9}")
+        for name, info in stages[:top]:
+            logger.info(f"{name:<24} {info['result']:<8} {info['seconds']:>8.1f}s")
+
+        logger.info(f"{'Package':<32} {'Tries':>5} {'Time':>9} {'Download':>10}")
+        for name, info in packages[:top]:
+            logger.info(
+                f"{name:<32} {info['attempts']:>5} {info['seconds']:>8.1f}s "
+                f"{info['download_bytes'] / 1024 ** 2:>6.1f} MiB"
+            )
+
+        retried = [name for name, info in report["packages"].items() if info["attempts"] > 1]
+        failed = [name for name, info in report["packages"].items() if info["outcome"] != "installed"]
+
+        if len(retried) > 0:
+            logger.warning(f"Retried packages: {', '.join(retried)}")
+        if len(failed) > 0:
+            logger.warning(f"Failed packages: {', '.join(failed)}")
@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import threading
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from loguru import logger
+from utils.schemes import AurHelper, BuildOptions
+
+
+class InstallJournal:
+    """Journal of the completed stages and package outcomes of an installation.
+
+    The journal belongs to one set of answers: if the answers (or the selected custom packages) change,
+    the previous journal is discarded and the installation starts from scratch.
+    Stages finish in parallel, so every record is written under a lock and saved atomically.
+    """
+
+    def __init__(self, path: str = os.path.expanduser("~/.cache/meowrch/install-journal.json")) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.data: Dict = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            if isinstance(data, dict):
+                return data
+        except (OSError, ValueError):
+            pass
+
+        return {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(self.data, file, indent=2)
+
+        os.replace(self.path + ".tmp", self.path)
+
+    @staticmethod
+    def options_key(options: BuildOptions, custom: List[str]) -> str:
+        answers = {**asdict(options), "aur_helper": options.aur_helper.value, "custom": sorted(custom)}
+        return hashlib.sha256(json.dumps(answers, sort_keys=True).encode()).hexdigest()
+
+    def unfinished(self) -> bool:
+        return "options" in self.data and not self.data.get("finished", False)
+
+    def saved_options(self) -> Optional[BuildOptions]:
+        """The answers of the unfinished installation"""
+        if not self.unfinished():
+            return None
+
+        options = dict(self.data["options"])
+        options["aur_helper"] = AurHelper(options["aur_helper"])
+        return BuildOptions(**options)
+
+    def saved_custom(self) -> List[str]:
+        return list(self.data.get("custom", []))
+
+    def start(self, options: BuildOptions, custom: List[str]) -> None:
+        """Continues the journal of the same answers or starts a new one"""
+        key = self.options_key(options, custom)
+
+        with self.lock:
+            if self.data.get("key") == key and not self.data.get("finished", False):
+                logger.info(f"Continuing the previous installation, completed stages: {', '.join(self.completed()) or 'none'}")
+            else:
+                self.data = {"key": key, "stages": {}, "packages": {"pacman": {}, "aur": {}}}
+
+            self.data["options"] = {**asdict(options), "aur_helper": options.aur_helper.value}
+            self.data["custom"] = sorted(custom)
+            self.data["finished"] = False
+            self._save()
+
+    def completed(self) -> List[str]:
+        return [name for name, result in self.data.get("stages", {}).items() if result == "done"]
+
+    def record_stage(self, name: str, result: str) -> None:
+        with self.lock:
+            self.data.setdefault("stages", {})[name] = result
+            self._save()
+
+    def forget_stages(self, names: List[str]) -> None:
+        with self.lock:
+            for name in names:
+                self.data.get("stages", {}).pop(name, None)
+            self._save()
+
+    def record_packages(self, kind: str, installed: List[str], failed: List[str]) -> None:
+        """Records the outcome of every package
+
+        Args:
+            kind (str): "pacman" or "aur"
+            installed (List[str]): Packages that were installed
+            failed (List[str]): Packages that could not be installed
+        """
+        with self.lock:
+            packages = self.data.setdefault("packages", {}).setdefault(kind, {})
+            packages.update({name: "installed" for name in installed})
+            packages.update({name: "failed" for name in failed})
+            self._save()
+
+    def packages(self, kind: str, outcome: str) -> List[str]:
+        packages = self.data.get("packages", {}).get(kind, {})
+        return [name for name, result in packages.items() if result == outcome]
+
+    def finish(self) -> None:
+        with self.lock:
+            self.data["finished"] = True
+            self._save()
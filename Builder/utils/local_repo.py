@@ -0,0 +1,176 @@
+import os
+import glob
+import shutil
+import traceback
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+class LocalRepository:
+    """A pacman repository in a local directory ("file://") with official and prebuilt AUR packages.
+
+    When the repository is used, pacman gets its own config where it is the only repository,
+    so packages are installed from the directory and nothing is downloaded or built.
+    After an installation, the packages of the system can be exported into a new repository for the next machines.
+    """
+
+    PACKAGE_SUFFIXES = (".pkg.tar", ".pkg.tar.zst", ".pkg.tar.xz", ".pkg.tar.gz")
+    CACHE_DIRS = ["/var/cache/pacman/pkg", "/tmp/meowrch-aur/*/packages"]
+
+    def __init__(
+        self,
+        path: str,
+        name: str = "meowrch-local",
+        config_path: str = "/tmp/meowrch-offline-pacman.conf",
+        system_config_path: str = "/etc/pacman.conf",
+    ) -> None:
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.name = name
+        self.config_path = config_path
+        self.system_config_path = system_config_path
+
+    @property
+    def database_path(self) -> str:
+        return os.path.join(self.path, f"{self.name}.db")
+
+    @classmethod
+    def package_files(cls, directory: str) -> List[str]:
+        try:
+            return sorted(
+                os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(cls.PACKAGE_SUFFIXES)
+            )
+        except OSError:
+            return []
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.database_path) or len(self.package_files(self.path)) > 0
+
+    @classmethod
+    def parse_file_name(cls, file: str) -> Optional[Tuple[str, str]]:
+        """Name and version of a package file ("<name>-<pkgver>-<pkgrel>-<arch>.pkg.tar.zst")"""
+        stem = os.path.basename(file)
+        for suffix in cls.PACKAGE_SUFFIXES:
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+                break
+        else:
+            return None
+
+        parts = stem.rsplit("-", 3)
+        if len(parts) != 4:
+            return None
+
+        return parts[0], f"{parts[1]}-{parts[2]}"
+
+    @staticmethod
+    def repo_add(database: str, files: List[str]) -> bool:
+        try:
+            subprocess.run(["repo-add", "--quiet", database, *files], check=True)
+            return True
+        except Exception:
+            logger.error(f"Error while creating the repository database: {traceback.format_exc()}")
+            return False
+
+    def _system_options(self) -> List[str]:
+        """The [options] section of the system pacman.conf, so the architecture and the hooks stay the same"""
+        options = []
+
+        try:
+            with open(self.system_config_path, "r") as file:
+                section = None
+                for line in file:
+                    stripped = line.strip()
+                    if stripped.startswith("[") and stripped.endswith("]"):
+                        section = stripped
+                    elif section == "[options]":
+                        options.append(line.rstrip("\n"))
+        except OSError:
+            options.append("Architecture = auto")
+
+        return options
+
+    def prepare(self) -> bool:
+        """Creates the repository database if the directory only has package files
+        and writes the pacman config that uses only this repository
+
+        Returns:
+            bool: True if the repository can be used
+        """
+        if not os.path.exists(self.database_path):
+            files = self.package_files(self.path)
+            if len(files) < 1:
+                logger.error(f'There are no packages in the local repository "{self.path}"')
+                return False
+
+            logger.info(f"Creating the database of the local repository ({len(files)} packages)")
+            if not self.repo_add(f"{self.database_path}.tar.gz", files):
+                return False
+
+        config = [
+            "[options]",
+            *self._system_options(),
+            "",
+            f"[{self.name}]",
+            "SigLevel = Optional TrustAll",
+            f"Server = file://{self.path}",
+            "",
+        ]
+
+        with open(self.config_path, "w") as file:
+            file.write("\n".join(config))
+
+        logger.info(f'Packages will be installed only from the local repository "{self.path}"')
+        return True
+
+    def export(self, installed: Dict[str, str], cache_dirs: Optional[List[str]] = None) -> bool:
+        """Collects the package files of the installed packages into the directory and creates a repository of them.
+        Files are hard-linked when possible, so the export is almost free on the same filesystem.
+
+        Args:
+            installed (Dict[str, str]): Installed packages and their versions
+            cache_dirs (List[str], optional): Where to look for the package files (glob patterns). Defaults to CACHE_DIRS.
+
+        Returns:
+            bool: True if the repository was created
+        """
+        files: Dict[Tuple[str, str], str] = {}
+        for pattern in cache_dirs or self.CACHE_DIRS:
+            for directory in glob.glob(pattern):
+                for file in self.package_files(directory):
+                    package = self.parse_file_name(file)
+                    if package is not None:
+                        files[package] = file
+
+        found = [files[package] for package in installed.items() if package in files]
+        missing = [name for name, version in installed.items() if (name, version) not in files]
+
+        if len(found) < 1:
+            logger.error("No package files of the installed packages were found, nothing to export")
+            return False
+
+        os.makedirs(self.path, exist_ok=True)
+        exported = []
+
+        for file in found:
+            target = os.path.join(self.path, os.path.basename(file))
+            if not os.path.exists(target):
+                try:
+                    os.link(file, target)
+                except OSError:
+                    shutil.copy2(file, target)
+            exported.append(target)
+
+        if not self.repo_add(f"{self.database_path}.tar.gz", exported):
+            return False
+
+        logger.success(f'{len(exported)} packages were exported to the local repository "{self.path}"')
+        if len(missing) > 0:
+            logger.warning(
+                "These installed packages have no package files in the cache and were not exported: "
+                + ", ".join(missing)
+            )
+
+        return True
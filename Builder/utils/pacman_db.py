@@ -0,0 +1,252 @@
+import io
+import os
+import re
+import glob
+import tarfile
+import traceback
+import subprocess
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from utils.schemes import ManifestStatus, PackageRecord
+
+
+class PacmanDatabase:
+    """Reads the pacman local and sync databases directly instead of forking pacman for every package.
+
+    The local database is re-read when its directory changes and the sync databases when their files change,
+    so the answers stay correct while packages are being installed.
+    """
+
+    ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+    DEFAULT_CACHE_DIR = "/var/cache/pacman/pkg/"
+
+    def __init__(self, db_path: str = "/var/lib/pacman", config_path: str = "/etc/pacman.conf") -> None:
+        self.db_path = db_path
+        self.config_path = config_path
+        self._local: Dict[str, str] = {}
+        self._local_mtime: Optional[int] = None
+        self._sync: Dict[str, PackageRecord] = {}
+        self._groups: Dict[str, str] = {}
+        self._provides: Dict[str, str] = {}
+        self._sync_mtimes: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def parse_desc(text: str) -> Dict[str, List[str]]:
+        """Parses a "desc" file of the database: "%KEY%" lines followed by the values
+
+        Returns:
+            Dict[str, List[str]]: Values of every key
+        """
+        fields = {}
+        key = None
+
+        for line in text.splitlines():
+            if line.startswith("%") and line.endswith("%"):
+                key = line[1:-1]
+                fields[key] = []
+            elif line and key is not None:
+                fields[key].append(line)
+
+        return fields
+
+    @property
+    def local(self) -> Dict[str, str]:
+        """Installed packages and their versions"""
+        path = os.path.join(self.db_path, "local")
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}
+
+        if mtime != self._local_mtime:
+            local = {}
+
+            # Каталог каждого пакета называется "<name>-<pkgver>-<pkgrel>", desc читать не нужно
+            for entry in os.scandir(path):
+                parts = entry.name.rsplit("-", 2)
+                if entry.is_dir() and len(parts) == 3:
+                    local[parts[0]] = f"{parts[1]}-{parts[2]}"
+
+            self._local, self._local_mtime = local, mtime
+
+        return self._local
+
+    @classmethod
+    def _config_sections(cls, path: str, seen: Optional[Set[str]] = None) -> List[str]:
+        """Section names of a pacman config, following its "Include =" files
+
+        Raises:
+            OSError: The config can't be read
+        """
+        seen = set() if seen is None else seen
+        seen.add(os.path.realpath(path))
+        sections = []
+
+        with open(path, "r") as file:
+            for line in file:
+                line = line.split("#", 1)[0].strip()
+
+                if line.startswith("[") and line.endswith("]"):
+                    sections.append(line[1:-1])
+                    continue
+
+                key, _, value = line.partition("=")
+                if key.strip() != "Include":
+                    continue
+
+                # Как и pacman, раскрываем шаблоны в путях и пропускаем недоступные файлы
+                for included in sorted(glob.glob(value.strip())):
+                    if os.path.realpath(included) in seen:
+                        continue
+
+                    try:
+                        sections.extend(cls._config_sections(included, seen))
+                    except OSError:
+                        logger.warning(f'Error reading "{included}" (included from "{path}")')
+
+        return sections
+
+    def repositories(self) -> List[str]:
+        """Names of the sync databases in the order of pacman.conf (the order of priority).
+        Repositories defined in "Include =" files are taken into account too.
+        """
+        sync_dir = os.path.join(self.db_path, "sync")
+
+        try:
+            available = sorted(f[:-3] for f in os.listdir(sync_dir) if f.endswith(".db"))
+        except OSError:
+            return []
+
+        try:
+            sections = self._config_sections(self.config_path)
+        except OSError:
+            return available
+
+        # pacman не смотрит в базы репозиториев, которых нет в конфиге
+        configured = dict.fromkeys(s for s in sections if s != "options")
+        return [r for r in configured if r in available]
+
+    def cache_dirs(self) -> List[str]:
+        """Package cache directories of pacman.conf ("CacheDir" of the [options] section)"""
+        cache_dirs = []
+        section = None
+
+        try:
+            with open(self.config_path, "r") as file:
+                for line in file:
+                    line = line.split("#", 1)[0].strip()
+
+                    if line.startswith("[") and line.endswith("]"):
+                        section = line[1:-1]
+                        continue
+
+                    key, _, value = line.partition("=")
+                    if section == "options" and key.strip() == "CacheDir":
+                        cache_dirs.extend(value.split())
+        except OSError:
+            pass
+
+        return cache_dirs if len(cache_dirs) > 0 else [self.DEFAULT_CACHE_DIR]
+
+    def _open_archive(self, path: str) -> tarfile.TarFile:
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if data[:4] == self.ZSTD_MAGIC:
+            # tarfile не умеет zstd, а некоторые репозитории сжимают им базы
+            data = subprocess.run(["zstd", "-dcq"], input=data, capture_output=True, check=True).stdout
+
+        return tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+
+    def _load_sync(self) -> None:
+        repositories = self.repositories()
+        paths = {repo: os.path.join(self.db_path, "sync", f"{repo}.db") for repo in repositories}
+
+        try:
+            mtimes = {repo: os.stat(path).st_mtime_ns for repo, path in paths.items()}
+        except OSError:
+            mtimes = {}
+
+        if mtimes == self._sync_mtimes:
+            return
+
+        sync, groups, provides = {}, {}, {}
+
+        for repo in repositories:
+            try:
+                with self._open_archive(paths[repo]) as archive:
+                    for member in archive:
+                        if not member.isfile() or not member.name.endswith("/desc"):
+                            continue
+
+                        desc = self.parse_desc(archive.extractfile(member).read().decode(errors="replace"))
+                        name = desc.get("NAME", [None])[0]
+
+                        # Пакет из репозитория выше в pacman.conf важнее
+                        if name is None or name in sync:
+                            continue
+
+                        sync[name] = PackageRecord(name=name, version=desc.get("VERSION", [""])[0], repository=repo)
+
+                        for group in desc.get("GROUPS", []):
+                            groups.setdefault(group, repo)
+                        for provided in desc.get("PROVIDES", []):
+                            provides.setdefault(re.split(r"[<>=]", provided)[0], name)
+            except Exception:
+                logger.error(f'Error reading the "{repo}" sync database: {traceback.format_exc()}')
+
+        self._sync, self._groups, self._provides = sync, groups, provides
+        self._sync_mtimes = mtimes
+
+    @property
+    def sync(self) -> Dict[str, PackageRecord]:
+        """Packages of all sync databases"""
+        self._load_sync()
+        return self._sync
+
+    def is_installed(self, package: str) -> bool:
+        return package in self.local
+
+    def installed_version(self, package: str) -> Optional[str]:
+        return self.local.get(package)
+
+    def repository(self, package: str) -> Optional[str]:
+        """Repository that pacman would install the package (or the group, or the provider) from"""
+        record = self.sync.get(package)
+        if record is not None:
+            return record.repository
+
+        if package in self._groups:
+            return self._groups[package]
+
+        provider = self._provides.get(package)
+        return None if provider is None else self._sync[provider].repository
+
+    def exists(self, package: str) -> bool:
+        return self.repository(package) is not None
+
+    def check(self, packages: Iterable[str]) -> ManifestStatus:
+        """Sorts the packages into installed, available in the sync databases and unknown in one pass.
+        Without the sync databases (pacman -Sy was never run) nothing is considered unknown.
+
+        Args:
+            packages (Iterable[str]): Package or group names
+
+        Returns:
+            ManifestStatus: The packages sorted by their status in the original order
+        """
+        status = ManifestStatus()
+        local = self.local
+        has_sync = len(self.sync) > 0
+
+        for package in dict.fromkeys(packages):
+            if package in local:
+                status.installed.append(package)
+            elif not has_sync or self.exists(package):
+                status.available.append(package)
+            else:
+                status.unknown.append(package)
+
+        return status
@@ -0,0 +1,152 @@
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from utils.schemes import Stage
+
+
+class StageScheduler:
+    """Runs the installation stages as a dependency graph.
+
+    A stage starts when all the stages it requires are done and none of its locks are held
+    by a running stage (for example, everything that runs pacman or the AUR helper takes the "pacman" lock).
+    Independent stages run at the same time. If a stage fails, the stages that depend on it are skipped.
+    Stages completed by a previous run are not repeated if they pass their verification.
+    """
+
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        jobs: int = 4,
+        completed: Iterable[str] = (),
+        on_finish: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        names = {stage.name for stage in stages}
+        for stage in stages:
+            unknown = [r for r in stage.requires if r not in names]
+            if len(unknown) > 0:
+                raise ValueError(f'Stage "{stage.name}" requires unknown stages: {", ".join(unknown)}')
+
+        self.stages = {stage.name: stage for stage in stages}
+        self.jobs = jobs
+        self.completed = set(completed)
+        self.on_finish = on_finish
+        self.results: Dict[str, str] = {}
+        # Время начала и конца каждой выполненной стадии
+        self.timings: Dict[str, Tuple[float, float]] = {}
+
+    def _restore_completed(self) -> None:
+        """Marks the stages completed by a previous run as done if they still pass their verification"""
+        for name in self.completed:
+            stage = self.stages.get(name)
+            if stage is None or not stage.resumable:
+                continue
+
+            try:
+                verified = stage.verify is None or stage.verify()
+            except Exception:
+                logger.warning(f'Failed to verify the stage "{name}": {traceback.format_exc()}')
+                verified = False
+
+            if verified:
+                logger.info(f'==> Stage "{name}" was completed by a previous run, skipping it')
+                self.results[name] = self.DONE
+            else:
+                logger.warning(f'Stage "{name}" was completed by a previous run, but its result is gone. Running it again')
+
+    def _run_stage(self, stage: Stage) -> None:
+        # Каждая строка лога стадии помечается её именем, даже если стадии идут параллельно
+        with logger.contextualize(stage=stage.name):
+            logger.info(f"==> Stage \"{stage.name}\" started")
+            start = time.time()
+
+            try:
+                stage.action()
+            finally:
+                self.timings[stage.name] = (start, time.time())
+
+            logger.info(f"==> Stage \"{stage.name}\" finished in {time.time() - start:.1f}s")
+
+    def _ready(self, running: Dict[Future, Stage]) -> List[Stage]:
+        held: Set[str] = {lock for stage in running.values() for lock in stage.locks}
+        running_names = {stage.name for stage in running.values()}
+        ready = []
+
+        for stage in self.stages.values():
+            if stage.name in self.results or stage.name in running_names:
+                continue
+            if not all(self.results.get(r) == self.DONE for r in stage.requires):
+                continue
+            if any(lock in held for lock in stage.locks):
+                continue
+
+            ready.append(stage)
+            held.update(stage.locks)
+
+        return ready
+
+    def _skip_blocked(self) -> None:
+        """Skips the disabled stages and the stages whose requirements failed or were skipped"""
+        changed = True
+
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name in self.results:
+                    continue
+
+                if any(self.results.get(r) in (self.FAILED, self.SKIPPED) for r in stage.requires):
+                    logger.warning(f'Stage "{stage.name}" is skipped because its requirements failed')
+                    self.results[stage.name] = self.SKIPPED
+                    changed = True
+                elif not stage.enabled and all(self.results.get(r) == self.DONE for r in stage.requires):
+                    # Выключенная стадия не мешает зависящим от неё, но порядок сохраняется
+                    self.results[stage.name] = self.DONE
+                    changed = True
+
+    def run(self) -> Dict[str, str]:
+        """Runs all the stages
+
+        Returns:
+            Dict[str, str]: Result of every stage: "done", "failed" or "skipped"
+        """
+        running: Dict[Future, Stage] = {}
+        self._restore_completed()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while True:
+                self._skip_blocked()
+
+                for stage in self._ready(running):
+                    running[pool.submit(self._run_stage, stage)] = stage
+
+                if len(running) < 1:
+                    break
+
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+
+                    try:
+                        future.result()
+                        self.results[stage.name] = self.DONE
+                    except BaseException:
+                        logger.error(f'Stage "{stage.name}" failed: {traceback.format_exc()}')
+                        self.results[stage.name] = self.FAILED
+
+                    if self.on_finish is not None:
+                        self.on_finish(stage.name, self.results[stage.name])
+
+        # Оставшиеся стадии ждут друг друга по кругу
+        for name in self.stages:
+            if name not in self.results:
+                logger.error(f'Stage "{name}" was never started: its requirements form a cycle')
+                self.results[name] = self.SKIPPED
+
+        return self.results
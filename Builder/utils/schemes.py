@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import Callable, Dict, List, Optional
 from enum import Enum
 
 
@@ -53,3 +53,52 @@ class BuildOptions:
     ff_twp: bool
     ff_unpaywall: bool
     ff_tampermonkey: bool
+    aur_jobs: int = 0
+    fast_builds: bool = False
+
+
+@dataclass
+class AurPackage:
+    name: str
+    base: str
+    version: str
+    depends: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PackageRecord:
+    name: str
+    version: str
+    repository: str
+
+
+@dataclass
+class ManifestStatus:
+    installed: List[str] = field(default_factory=list)
+    available: List[str] = field(default_factory=list)
+    unknown: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Stage:
+    name: str
+    action: Callable[[], None]
+    requires: List[str] = field(default_factory=list)
+    locks: List[str] = field(default_factory=list)
+    enabled: bool = True
+    # Можно ли пропустить стадию, завершённую при прошлом запуске, и как это дёшево проверить
+    resumable: bool = True
+    verify: Optional[Callable[[], bool]] = None
+
+
+@dataclass
+class PackageAttempt:
+    packages: List[str]
+    method: str
+    start: float
+    end: float = 0.0
+    success: bool = False
+    download_bytes: int = 0
+    package_bytes: Dict[str, int] = field(default_factory=dict)
+    # Вывод pacman для подсчёта скачанного, в отчёт не попадает
+    output: str = ""
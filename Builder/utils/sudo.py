@@ -0,0 +1,49 @@
+import threading
+import subprocess
+import traceback
+from typing import Optional
+
+from loguru import logger
+
+
+class SudoKeepAlive:
+    """Asks for the sudo password once and keeps the credentials cached while the stages run.
+
+    Parallel stages would otherwise ask for the password at the same time,
+    and long AUR builds outlast the sudo timeout (5 minutes by default).
+    The credentials are refreshed with "sudo -n -v", which never asks for the password.
+    """
+
+    def __init__(self, interval: float = 60) -> None:
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Asks for the password and starts refreshing the credentials in the background
+
+        Returns:
+            bool: Whether sudo accepted the password
+        """
+        try:
+            subprocess.run(["sudo", "-v"], check=True)
+        except Exception:
+            logger.error(f"Error while getting the sudo rights: {traceback.format_exc()}")
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh, name="sudo-keepalive", daemon=True)
+        self._thread.start()
+        return True
+
+    def _refresh(self) -> None:
+        while not self._stop.wait(self.interval):
+            result = subprocess.run(["sudo", "-n", "-v"], stdin=subprocess.DEVNULL, capture_output=True)
+            if result.returncode != 0:
+                logger.warning("Failed to refresh the sudo rights, the password may be asked again")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
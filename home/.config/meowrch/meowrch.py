@@ -4,6 +4,7 @@ from argparse import ArgumentParser, RawTextHelpFormatter
 from utils.other import notify
 from utils.config import Config
 from utils.theming import ThemeManager
+from utils.rotation import WallpaperRotator
 
 
 def setting_args(parser: ArgumentParser):
@@ -18,11 +19,15 @@ def setting_args(parser: ArgumentParser):
 
 			"\"set-theme\": When specifying this type, you need to specify an additional argument \"--name\" with the name of the topic\n" \
 			"\"set-wallpaper\": When specifying this type, you need to specify an additional argument \"--path\" with the path to the wallpaper.\n" \
-			"If the path has not been passed, the current wallpaper will be set\n" \
+			"If the path has not been passed, the current wallpaper will be set. " \
+			"The \"--output\" argument sets the wallpaper only on the specified monitor\n" \
 
 			"\"set-random-wallpaper\": Random wallpapers are set, which are allowed in the theme.\n" \
 			"\"select-wallpaper\": A Rofi menu with a selection of wallpapers and their subsequent installation.\n" \
-			"\"select-theme\": Rofi menu with theme selection and its subsequent installation."
+			"\"select-theme\": Rofi menu with theme selection and its subsequent installation.\n" \
+			"\"analyze-wallpapers\": Extracts the palettes of the wallpapers of all themes to match them with themes. " \
+			"The \"--path\" argument limits it to a folder or a mask\n" \
+			"\"rotate-wallpapers\": Changes wallpapers according to \"wallpaper-rotation\" from the config. Runs until it is stopped."
 	)
 
 	auxiliary_group = parser.add_argument_group('Auxiliary arguments')
@@ -38,6 +43,10 @@ def setting_args(parser: ArgumentParser):
 		'--path', 
 		help='The path for the wallpaper for the action \"set-wallpaper\"'
 	)
+	auxiliary_group.add_argument(
+		'--output', 
+		help='The monitor for the action \"set-wallpaper\". By default, the \"wallpaper-mode\" from the config is used'
+	)
 
 
 if __name__ == '__main__':
@@ -76,7 +85,7 @@ if __name__ == '__main__':
 
 	elif args.action == "set-wallpaper":
 		if args.path:
-			theme_manager.set_wallpaper(args.path)
+			theme_manager.set_wallpaper(args.path, output=args.output)
 		else:
 			theme_manager.set_current_wallpaper()
 
@@ -89,6 +98,18 @@ if __name__ == '__main__':
 	elif args.action == "select-theme":
 		theme_manager.select_theme()
 
+	elif args.action == "analyze-wallpapers":
+		theme_manager.analyze_wallpapers(args.path)
+
+	elif args.action == "rotate-wallpapers":
+		lock = WallpaperRotator.acquire_lock()
+		if lock is None:
+			logging.info("The wallpaper rotation is already running")
+		else:
+			with lock:
+				interval, times = Config.get_wallpaper_rotation()
+				WallpaperRotator(theme_manager, interval=interval, times=times).run()
+
 	else:
 		logging.debug(f"Unknown action: {args.action}")
 		notify("Unknown action!", "Check the available actions with --help")
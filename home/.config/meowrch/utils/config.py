@@ -1,17 +1,18 @@
+import re
 import yaml
 import logging
 import traceback
 import subprocess
 from pathlib import Path
 from os.path import expandvars
-from typing import List, Union, Optional
+from typing import Dict, List, Tuple, Union, Optional
 
 from .other import parse_wallpapers
 from .schemes import Theme
 from .exceptions import InvalidSession, NoConfigFile
 from vars import (
 	SESSION_TYPE, MEOWRCH_DIR, MEOWRCH_CONFIG,
-	WALLPAPER_SYMLINC, MEOWRCH_ASSETS
+	WALLPAPER_SYMLINC, MEOWRCH_ASSETS, WALLPAPER_MODES
 )
 
 
@@ -66,6 +67,100 @@ class Config:
 
 		return wallpaper
 
+	@classmethod
+	def get_output_wallpapers(cls) -> Dict[str, str]:
+		"""
+		Returns the wallpapers set on individual outputs. Empty if one wallpaper is used for all outputs.
+		"""
+		data = Config.__load_yaml()
+
+		if SESSION_TYPE == "x11":
+			wallpapers = data.get('current-xwallpapers', None)
+		elif SESSION_TYPE == "wayland":
+			wallpapers = data.get('current-wwallpapers', None)
+		else:
+			raise InvalidSession(session=SESSION_TYPE)
+
+		if not isinstance(wallpapers, dict):
+			return {}
+
+		return {
+			str(output): str(Path(expandvars(wallpaper.strip())).expanduser())
+			for output, wallpaper in wallpapers.items() if isinstance(wallpaper, str)
+		}
+
+	@classmethod
+	def get_wallpaper_mode(cls) -> str:
+		"""
+		Returns how wallpapers are applied to multiple outputs: "clone", "per-output" or "span".
+		"""
+		data = Config.__load_yaml()
+		mode = data.get('wallpaper-mode', "clone")
+
+		if mode not in WALLPAPER_MODES:
+			logging.warning(f"Unknown wallpaper mode \"{mode}\". Using \"clone\"")
+			return "clone"
+
+		return mode
+
+	@classmethod
+	def get_wallpaper_rotation(cls) -> Tuple[int, List[str]]:
+		"""
+		Returns the settings of the wallpaper rotation: the interval in seconds (0 - disabled)
+		and the times of day in the "HH:MM" format.
+		"""
+		data = Config.__load_yaml()
+		rotation = data.get('wallpaper-rotation', None)
+
+		if not isinstance(rotation, dict):
+			return 0, []
+
+		try:
+			interval = max(int(rotation.get('interval', 0) or 0), 0)
+		except (TypeError, ValueError):
+			logging.warning(f"Invalid wallpaper rotation interval: {rotation.get('interval')}")
+			interval = 0
+
+		times = []
+		for t in rotation.get('times', []) or []:
+			# YAML reads unquoted 20:00 as a sexagesimal number (1200)
+			if isinstance(t, int):
+				t = f"{t // 60:02d}:{t % 60:02d}"
+
+			if re.fullmatch(r"\d{1,2}:\d{2}", str(t)):
+				times.append(str(t))
+			else:
+				logging.warning(f"Invalid wallpaper rotation time: {t}")
+
+		return interval, times
+
+	@classmethod
+	def get_wallpaper_matching(cls) -> Tuple[bool, float, float]:
+		"""
+		Returns the settings of matching wallpapers to the theme palette:
+		whether it is enabled, how strongly random wallpapers are biased to the matching ones
+		and the minimum score for custom wallpapers to be offered in the theme.
+		"""
+		data = Config.__load_yaml()
+		matching = data.get('wallpaper-matching', None)
+
+		if not isinstance(matching, dict):
+			return False, 0.0, 0.0
+
+		try:
+			bias = max(float(matching.get('bias', 4) or 0), 0.0)
+			min_score = min(max(float(matching.get('min-score', 0) or 0), 0.0), 1.0)
+		except (TypeError, ValueError):
+			logging.warning(f"Invalid wallpaper matching settings: {matching}")
+			return False, 0.0, 0.0
+
+		return bool(matching.get('enabled', False)), bias, min_score
+
+	@classmethod
+	def get_custom_wallpapers(cls) -> List[Path]:
+		data = Config.__load_yaml()
+		return parse_wallpapers(data.get('custom-wallpapers', None) or [])
+
 	@classmethod
 	def get_current_xtheme(cls) -> Optional[str]:
 		data = Config.__load_yaml()
@@ -163,16 +258,23 @@ class Config:
 		Config.__dump_yaml(data)
 
 	@classmethod
-	def _set_wallpaper(cls, wallpaper_path: Union[str, Path]) -> None:
+	def _set_wallpaper(cls, wallpaper_path: Union[str, Path], outputs: Optional[Dict[str, Union[str, Path]]] = None) -> None:
 		"""
 		We strongly recommend installing the wallpaper using theming.ThemeManager.set_wallpaper
+
+		Args:
+			wallpaper_path: The main wallpaper. It is also linked to current_wallpaper.
+			outputs: Wallpapers of individual outputs. If None, the main wallpaper is used on all outputs.
 		"""
 		data = Config.__load_yaml()
+		outputs = {} if outputs is None else {output: str(wp) for output, wp in outputs.items()}
 
 		if SESSION_TYPE == "x11":
 			data['current-xwallpaper'] = str(wallpaper_path)
+			data['current-xwallpapers'] = outputs
 		elif SESSION_TYPE == "wayland":
 			data['current-wwallpaper'] = str(wallpaper_path)
+			data['current-wwallpapers'] = outputs
 		else:
 			raise InvalidSession(session=SESSION_TYPE)
 
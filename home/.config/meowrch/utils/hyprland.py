@@ -0,0 +1,214 @@
+import os
+import json
+import socket
+import logging
+import traceback
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .schemes import Monitor
+
+
+class HyprlandIPC:
+	"""
+	A small client for the Hyprland command socket (.socket.sock).
+	Monitor data is cached until a monitor event arrives on the event socket (.socket2.sock).
+	The event socket is subscribed to once per instance and kept open, so the cache only
+	helps long-running processes such as the wallpaper rotator; one-shot commands pay for a single request.
+	Outside of Hyprland, the requests fall back to wlr-randr and hyprctl.
+	"""
+	__slots__ = ('socket_dir', 'timeout', '_monitors', '_events', '_events_buffer')
+	MONITOR_EVENTS = ("monitoradded", "monitorremoved", "configreloaded")
+
+	def __init__(self, socket_dir: Optional[Path] = None, timeout: float = 1.0) -> None:
+		self.socket_dir: Optional[Path] = socket_dir if socket_dir is not None else self._find_socket_dir()
+		self.timeout = timeout
+		self._monitors: Optional[List[Monitor]] = None
+		self._events: Optional[socket.socket] = None
+		self._events_buffer = b""
+
+	@staticmethod
+	def _find_socket_dir() -> Optional[Path]:
+		signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE")
+		if not signature:
+			return None
+
+		candidates = [Path("/tmp") / "hypr" / signature]
+		runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+		if runtime_dir:
+			candidates.insert(0, Path(runtime_dir) / "hypr" / signature)
+
+		for candidate in candidates:
+			if (candidate / ".socket.sock").exists():
+				return candidate
+
+		return None
+
+	@property
+	def available(self) -> bool:
+		return self.socket_dir is not None and (self.socket_dir / ".socket.sock").exists()
+
+	def request(self, command: str) -> str:
+		"""
+		Sends a command to the Hyprland command socket and returns the raw response.
+
+		Args:
+			command: str - Command in hyprctl socket syntax, for example "j/monitors".
+		"""
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+			sock.settimeout(self.timeout)
+			sock.connect(str(self.socket_dir / ".socket.sock"))
+			sock.sendall(command.encode())
+
+			chunks = []
+			while True:
+				chunk = sock.recv(8192)
+				if not chunk:
+					break
+				chunks.append(chunk)
+
+		return b"".join(chunks).decode()
+
+	def _subscribe(self) -> None:
+		if self._events is not None:
+			return
+
+		self._events_buffer = b""
+
+		try:
+			sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			sock.connect(str(self.socket_dir / ".socket2.sock"))
+			sock.setblocking(False)
+			self._events = sock
+		except OSError:
+			logging.warning(f"Couldn't subscribe to Hyprland events, monitors will not be cached: {traceback.format_exc()}")
+			self._events = None
+
+	def _monitors_changed(self) -> bool:
+		"""
+		Reads all pending events without blocking.
+		Returns True if the cached monitors are no longer valid.
+		"""
+		if self._events is None:
+			return True
+
+		while True:
+			try:
+				chunk = self._events.recv(8192)
+			except (BlockingIOError, InterruptedError):
+				break
+			except OSError:
+				self.close()
+				return True
+
+			if not chunk:
+				##==> Hyprland закрыл сокет событий, подписываемся заново при следующем запросе
+				self.close()
+				return True
+
+			self._events_buffer += chunk
+
+		*lines, self._events_buffer = self._events_buffer.split(b"\n")
+		return any(line.decode(errors="ignore").startswith(self.MONITOR_EVENTS) for line in lines)
+
+	def get_monitors(self) -> List[Monitor]:
+		if not self.available:
+			return self._get_monitors_wlr_randr()
+
+		if self._monitors is not None and not self._monitors_changed():
+			return self._monitors
+
+		try:
+			self._subscribe()
+			self._monitors = [
+				Monitor(
+					name=m["name"],
+					refresh_rate=float(m.get("refreshRate", 60)),
+					x=int(m.get("x", 0)),
+					y=int(m.get("y", 0)),
+					width=int(m.get("width", 0)),
+					height=int(m.get("height", 0)),
+					focused=bool(m.get("focused", False)),
+				)
+				for m in json.loads(self.request("j/monitors"))
+			]
+		except Exception:
+			logging.warning(f"Couldn't get the monitors from the Hyprland socket: {traceback.format_exc()}")
+			self.close()
+			self._monitors = None
+			return self._get_monitors_wlr_randr()
+
+		return self._monitors
+
+	def get_refresh_rate(self, default: int = 60) -> int:
+		monitors = self.get_monitors()
+		if len(monitors) < 1:
+			return default
+
+		monitor = next((m for m in monitors if m.focused), monitors[0])
+		return int(round(monitor.refresh_rate))
+
+	def get_cursor_pos(self) -> Optional[Tuple[int, int]]:
+		if not self.available:
+			return self._get_cursor_pos_hyprctl()
+
+		try:
+			pos = json.loads(self.request("j/cursorpos"))
+			return int(pos["x"]), int(pos["y"])
+		except Exception:
+			logging.warning(f"Couldn't get the cursor position from the Hyprland socket: {traceback.format_exc()}")
+			return self._get_cursor_pos_hyprctl()
+
+	def close(self) -> None:
+		if self._events is not None:
+			self._events.close()
+			self._events = None
+
+	@staticmethod
+	def _get_monitors_wlr_randr() -> List[Monitor]:
+		monitors = []
+
+		try:
+			output = subprocess.check_output(
+				['wlr-randr', '--json'],
+				stderr=subprocess.DEVNULL,
+				universal_newlines=True,
+			)
+		except Exception:
+			logging.warning(f"Couldn't get the monitors using wlr-randr: {traceback.format_exc()}")
+			return monitors
+
+		for output_info in json.loads(output):
+			if not output_info.get('enabled', True):
+				continue
+
+			mode = next((m for m in output_info.get('modes', []) if m.get('current')), None)
+			if mode is None:
+				continue
+
+			position = output_info.get('position') or {}
+			monitors.append(Monitor(
+				name=output_info['name'],
+				refresh_rate=float(mode['refresh']),
+				x=int(position.get('x', 0)),
+				y=int(position.get('y', 0)),
+				width=int(mode.get('width', 0)),
+				height=int(mode.get('height', 0)),
+			))
+
+		return monitors
+
+	@staticmethod
+	def _get_cursor_pos_hyprctl() -> Optional[Tuple[int, int]]:
+		try:
+			output = subprocess.check_output(
+				['hyprctl', 'cursorpos'],
+				stderr=subprocess.DEVNULL,
+				universal_newlines=True,
+			).strip()
+			x, y = output.split(",")
+			return int(x), int(y)
+		except Exception:
+			logging.warning(f"Couldn't get the cursor position: {traceback.format_exc()}")
+			return None
@@ -0,0 +1,227 @@
+import os
+import json
+import logging
+import tempfile
+import traceback
+import multiprocessing as mp
+from pathlib import Path
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from vars import OOMOX_COLORS, WALLPAPER_INDEX
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+	"""
+	Converts colors from sRGB (0-255) to CIE Lab (D65). Works on arrays of any shape ending with 3.
+	"""
+	rgb = rgb.astype(np.float32) / 255.0
+	linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+
+	xyz = linear @ np.array([
+		[0.4124564, 0.2126729, 0.0193339],
+		[0.3575761, 0.7151522, 0.1191920],
+		[0.1804375, 0.0721750, 0.9503041],
+	], dtype=np.float32)
+	xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+	f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+	return np.stack([
+		116 * f[..., 1] - 16,
+		500 * (f[..., 0] - f[..., 1]),
+		200 * (f[..., 1] - f[..., 2]),
+	], axis=-1)
+
+
+def hex_to_rgb(colors: List[str]) -> np.ndarray:
+	return np.array([[int(c[i:i + 2], 16) for i in (0, 2, 4)] for c in colors], dtype=np.uint8).reshape(-1, 3)
+
+
+def cluster_means(values: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Averages the values of every cluster for a whole batch of images.
+
+	Args:
+		values: np.ndarray - Array of shape (images, pixels, channels).
+		labels: np.ndarray - Cluster of every pixel, shape (images, pixels).
+
+	Returns:
+		Tuple[np.ndarray, np.ndarray]: Means (images, k, channels) and pixel counts (images, k).
+	"""
+	onehot = (labels[..., None] == np.arange(k)).astype(np.float32)
+	counts = onehot.sum(axis=1)
+	sums = np.einsum('bpk,bpc->bkc', onehot, values.astype(np.float32))
+	return sums / np.maximum(counts[..., None], 1), counts
+
+
+def batch_kmeans(pixels: np.ndarray, k: int, iterations: int = 12) -> np.ndarray:
+	"""
+	Runs k-means on a whole batch of images at once.
+
+	Args:
+		pixels: np.ndarray - Array of shape (images, pixels, 3).
+		k: int - Number of clusters (dominant colors) per image.
+		iterations: int - Number of Lloyd iterations.
+
+	Returns:
+		np.ndarray: Cluster of every pixel, shape (images, pixels).
+	"""
+	count = pixels.shape[1]
+
+	##==> Начальные центры - квантили по яркости
+	###########################################
+	order = np.argsort(pixels[..., 0], axis=1)
+	positions = ((np.arange(k) + 0.5) / k * count).astype(np.int64)
+	centers = np.take_along_axis(pixels, order[:, positions, None], axis=1)
+
+	for _ in range(iterations):
+		distances = ((pixels[:, :, None, :] - centers[:, None, :, :]) ** 2).sum(axis=-1)
+		labels = distances.argmin(axis=-1)
+
+		means, counts = cluster_means(pixels, labels, k)
+		centers = np.where(counts[..., None] > 0, means, centers)
+
+	return ((pixels[:, :, None, :] - centers[:, None, :, :]) ** 2).sum(axis=-1).argmin(axis=-1)
+
+
+class PaletteAnalyzer:
+	"""
+	Extracts dominant colors of wallpapers and scores them against the oomox-colors palettes of the themes.
+	The dominant colors are cached in the wallpaper index and only recomputed when a file changes.
+	"""
+	__slots__ = ('index_file', 'index', 'colors', 'size', 'batch_size')
+
+	def __init__(self, index_file: Path = WALLPAPER_INDEX, colors: int = 6, size: int = 64, batch_size: int = 128) -> None:
+		self.index_file = index_file
+		self.colors = colors
+		self.size = size
+		self.batch_size = batch_size
+		self.index: Dict[str, dict] = self._load_index()
+
+	def _load_index(self) -> Dict[str, dict]:
+		try:
+			with open(self.index_file, 'r') as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return {}
+
+		wallpapers = data.get('wallpapers', {})
+		return wallpapers if isinstance(wallpapers, dict) else {}
+
+	def _save_index(self) -> None:
+		self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+		with tempfile.NamedTemporaryFile('w', dir=self.index_file.parent, delete=False) as f:
+			json.dump({'wallpapers': self.index}, f)
+
+		os.replace(f.name, self.index_file)
+
+	def _is_actual(self, wallpaper: Path) -> bool:
+		entry = self.index.get(str(wallpaper))
+		try:
+			return entry is not None and entry.get('mtime') == wallpaper.stat().st_mtime
+		except OSError:
+			return False
+
+	@staticmethod
+	def _load_pixels(wallpaper: Path, size: int) -> Optional[np.ndarray]:
+		try:
+			with Image.open(wallpaper) as image:
+				image.draft('RGB', (size * 4, size * 4))
+				image = image.convert('RGB').resize((size, size), Image.BILINEAR)
+				return np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+		except Exception:
+			logging.warning(f"Failed to read the wallpaper \"{wallpaper}\": {traceback.format_exc()}")
+			return None
+
+	def analyze(self, wallpapers: List[Path]) -> int:
+		"""
+		Extracts the dominant colors of the wallpapers that are missing from the index or have changed.
+
+		Returns:
+			int: Number of analyzed wallpapers.
+		"""
+		pending = [Path(wp) for wp in dict.fromkeys(wallpapers) if not self._is_actual(Path(wp))]
+		analyzed = 0
+
+		for start in range(0, len(pending), self.batch_size):
+			batch = pending[start:start + self.batch_size]
+
+			##==> Декодирование изображений - самая долгая часть, поэтому параллельно
+			###########################################
+			if len(batch) > 4:
+				with mp.Pool(processes=min(os.cpu_count() or 1, 8)) as pool:
+					loaded = pool.starmap(self._load_pixels, zip(batch, repeat(self.size)))
+			else:
+				loaded = [self._load_pixels(wallpaper, self.size) for wallpaper in batch]
+
+			chunk = [wallpaper for wallpaper, pixels in zip(batch, loaded) if pixels is not None]
+			if len(chunk) < 1:
+				continue
+
+			analyzed += len(chunk)
+			rgb = np.stack([pixels for pixels in loaded if pixels is not None])
+			labels = batch_kmeans(srgb_to_lab(rgb), k=self.colors)
+			centers, counts = cluster_means(rgb, labels, k=self.colors)
+			centers = centers.round().astype(np.uint8)
+			weights = counts / rgb.shape[1]
+
+			for wallpaper, colors, shares in zip(chunk, centers, weights):
+				self.index[str(wallpaper)] = {
+					'mtime': wallpaper.stat().st_mtime,
+					'colors': [f"{r:02x}{g:02x}{b:02x}" for r, g, b in colors],
+					'weights': [round(float(w), 4) for w in shares],
+				}
+
+		if analyzed > 0:
+			self._save_index()
+			logging.debug(f"Analyzed the palettes of {analyzed} wallpapers")
+
+		return analyzed
+
+	@staticmethod
+	def get_theme_palette(theme_name: str) -> np.ndarray:
+		"""
+		Returns all unique colors of the oomox-colors file of the theme in Lab.
+		"""
+		colors = []
+		path = OOMOX_COLORS(theme_name)
+
+		if path.exists():
+			with open(path, 'r') as f:
+				for line in f:
+					_, _, value = line.strip().partition("=")
+					value = value.strip().strip('"')
+					if len(value) == 6 and all(c in "0123456789abcdefABCDEF" for c in value):
+						colors.append(value.lower())
+
+		return srgb_to_lab(hex_to_rgb(list(dict.fromkeys(colors))))
+
+	def scores(self, wallpapers: List[Path], theme_name: str) -> Dict[Path, float]:
+		"""
+		Scores how well the wallpapers fit the theme: 1 - the dominant colors are in the palette, closer to 0 - far from it.
+		"""
+		palette = self.get_theme_palette(theme_name)
+		wallpapers = [Path(wp) for wp in wallpapers]
+
+		if len(palette) < 1:
+			logging.warning(f"Theme \"{theme_name}\" has no oomox-colors palette to match wallpapers against")
+			return {wp: 1.0 for wp in wallpapers}
+
+		self.analyze(wallpapers)
+		known = [wp for wp in wallpapers if str(wp) in self.index]
+		if len(known) < 1:
+			return {wp: 0.0 for wp in wallpapers}
+
+		colors = srgb_to_lab(np.stack([hex_to_rgb(self.index[str(wp)]['colors']) for wp in known]))
+		weights = np.array([self.index[str(wp)]['weights'] for wp in known], dtype=np.float32)
+
+		distances = np.sqrt(((colors[:, :, None, :] - palette[None, None, :, :]) ** 2).sum(axis=-1)).min(axis=-1)
+		result = 1.0 / (1.0 + (distances * weights).sum(axis=1) / 20.0)
+
+		scores = {wp: 0.0 for wp in wallpapers}
+		scores.update({wp: float(score) for wp, score in zip(known, result)})
+		return scores
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import fcntl
+import random
+import logging
+import traceback
+from pathlib import Path
+from typing import List, Optional, TextIO
+from datetime import datetime, timedelta
+
+from .config import Config
+from .schemes import Theme
+from .theming import ThemeManager
+from vars import SESSION_TYPE, WALLPAPER_BAG, ROTATION_LOCK
+
+
+class WallpaperRotator:
+	"""
+	Changes wallpapers on an interval and/or at fixed times of day inside one resident process.
+	Wallpapers are drawn from the current theme without repeats (a shuffle bag saved between runs),
+	and the next ones are preloaded while the current wallpaper is showing.
+	"""
+	__slots__ = ('theme_manager', 'interval', 'times', 'bag_file')
+
+	def __init__(self, theme_manager: ThemeManager, interval: int, times: List[str], bag_file: Path = WALLPAPER_BAG) -> None:
+		self.theme_manager = theme_manager
+		self.interval = interval
+		self.times = times
+		self.bag_file = bag_file
+
+	@staticmethod
+	def acquire_lock(lock_file: Path = ROTATION_LOCK) -> Optional[TextIO]:
+		"""
+		Takes the lock of the only rotator of the session (bspwmrc runs again on every bspwm restart).
+		Returns the locked file, which has to stay open while the rotator runs, or None if another rotator holds it.
+		"""
+		try:
+			lock_file.parent.mkdir(parents=True, exist_ok=True)
+			lock = open(lock_file, "a+")
+		except OSError:
+			logging.error(f"Failed to open the wallpaper rotation lock: {traceback.format_exc()}")
+			return None
+
+		try:
+			fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except OSError:
+			lock.close()
+			return None
+
+		lock.seek(0)
+		lock.truncate()
+		lock.write(f"{os.getpid()}\n")
+		lock.flush()
+		return lock
+
+	def next_tick(self, now: datetime) -> Optional[datetime]:
+		ticks = []
+
+		if self.interval > 0:
+			ticks.append(now + timedelta(seconds=self.interval))
+
+		for t in self.times:
+			hour, minute = map(int, t.split(":"))
+			tick = now.replace(hour=hour % 24, minute=minute % 60, second=0, microsecond=0)
+			if tick <= now:
+				tick += timedelta(days=1)
+			ticks.append(tick)
+
+		return min(ticks) if len(ticks) > 0 else None
+
+	def _load_bag(self, theme: Theme) -> List[Path]:
+		try:
+			with open(self.bag_file, 'r') as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return []
+
+		if data.get('theme') != theme.name:
+			return []
+
+		available = set(theme.available_wallpapers)
+		return [Path(wp) for wp in data.get('bag', []) if Path(wp) in available]
+
+	def _save_bag(self, theme: Theme, bag: List[Path]) -> None:
+		try:
+			self.bag_file.parent.mkdir(parents=True, exist_ok=True)
+			with open(self.bag_file, 'w') as f:
+				json.dump({'theme': theme.name, 'bag': [str(wp) for wp in bag]}, f)
+		except OSError:
+			logging.warning(f"Failed to save the wallpaper shuffle bag: {traceback.format_exc()}")
+
+	def _fill_bag(self, theme: Theme, bag: List[Path], count: int) -> List[Path]:
+		"""
+		Refills the bag with a new shuffle of all the theme wallpapers until it contains at least count items.
+		The wallpapers already in the bag are not repeated in the new round.
+		Returns an empty bag if the theme has no wallpapers.
+		"""
+		if len(theme.available_wallpapers) < 1:
+			logging.warning(f"The theme \"{theme.name}\" has no wallpapers to rotate")
+			return []
+
+		while len(bag) < count:
+			new_round = [wp for wp in theme.available_wallpapers if wp not in bag]
+			if len(new_round) < 1:
+				new_round = list(theme.available_wallpapers)
+
+			random.shuffle(new_round)
+			bag.extend(new_round)
+
+		return bag
+
+	def draw(self, theme: Theme, count: int = 1) -> List[Path]:
+		"""
+		Takes count wallpapers out of the shuffle bag of the theme.
+		"""
+		bag = self._fill_bag(theme, self._load_bag(theme), count)
+		if len(bag) < 1:
+			return []
+
+		drawn, bag = bag[:count], bag[count:]
+		self._save_bag(theme, bag)
+		return drawn
+
+	def peek(self, theme: Theme, count: int = 1) -> List[Path]:
+		"""
+		Returns the next count wallpapers of the shuffle bag without taking them out.
+		"""
+		bag = self._fill_bag(theme, self._load_bag(theme), count)
+		self._save_bag(theme, bag)
+		return bag[:count]
+
+	def _refresh_theme(self) -> Theme:
+		"""
+		The theme can be changed by another meowrch process between the ticks, so it is re-read from the config.
+		"""
+		manager = self.theme_manager
+		theme_name = Config.get_current_xtheme() if SESSION_TYPE == "x11" else Config.get_current_wtheme()
+		themes = {theme.name: theme for theme in Config.get_all_themes()}
+
+		if theme_name in themes:
+			manager.themes = themes
+			manager.current_theme = themes[theme_name]
+
+		return manager.current_theme
+
+	def _wallpapers_per_tick(self) -> int:
+		mode = Config.get_wallpaper_mode()
+		if mode != "per-output":
+			return 1
+
+		return max(len(self.theme_manager.wallpaper_setter.get_monitors()), 1)
+
+	def _preload_next(self, theme: Theme, count: int) -> None:
+		wallpapers = self.peek(theme, count)
+		if len(wallpapers) < 1:
+			return
+
+		try:
+			self.theme_manager.wallpaper_setter.preload(
+				wallpapers,
+				span=Config.get_wallpaper_mode() == "span"
+			)
+		except Exception:
+			logging.warning(f"Failed to preload the next wallpapers: {traceback.format_exc()}")
+
+	def rotate(self) -> None:
+		theme = self._refresh_theme()
+		count = self._wallpapers_per_tick()
+		wallpapers = self.draw(theme, count)
+		if len(wallpapers) < 1:
+			return
+
+		if count > 1:
+			monitors = self.theme_manager.wallpaper_setter.get_monitors()
+			self.theme_manager.set_wallpapers({monitor.name: wp for monitor, wp in zip(monitors, wallpapers)})
+		else:
+			self.theme_manager.set_wallpaper(wallpapers[0])
+
+		self._preload_next(theme, count)
+
+	def run(self) -> None:
+		if self.next_tick(datetime.now()) is None:
+			logging.info("Wallpaper rotation is disabled. Set \"interval\" or \"times\" in \"wallpaper-rotation\" of the config")
+			return
+
+		logging.info(f"Wallpaper rotation started (interval: {self.interval}s, times: {self.times})")
+
+		self._preload_next(self._refresh_theme(), self._wallpapers_per_tick())
+
+		while True:
+			tick = self.next_tick(datetime.now())
+			time.sleep(max((tick - datetime.now()).total_seconds(), 0))
+
+			try:
+				self.rotate()
+			except Exception:
+				logging.error(f"Failed to rotate the wallpaper: {traceback.format_exc()}")
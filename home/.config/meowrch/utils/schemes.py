@@ -32,3 +32,14 @@ class Theme:
 	name: str
 	available_wallpapers: List[Path]
 	icon: Path
+
+
+@dataclass
+class Monitor:
+	name: str
+	refresh_rate: float = 60
+	x: int = 0
+	y: int = 0
+	width: int = 0
+	height: int = 0
+	focused: bool = False
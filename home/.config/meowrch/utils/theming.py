@@ -1,26 +1,30 @@
-import json
 import random
 import logging
 import traceback
-import subprocess
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from .config import Config
-from .other import notify
+from .other import notify, parse_wallpapers
 from .selecting import Selector
 from .exceptions import InvalidSession, NoThemesToInstall
 from .schemes import Theme
+from .hyprland import HyprlandIPC
+from .wallpaper import WallpaperSetter
 from vars import SESSION_TYPE
 from .loader import theme_options
 
 
 class ThemeManager:
-	__slots__ = ('themes', 'current_theme')
+	__slots__ = ('themes', 'current_theme', 'hyprland', 'wallpaper_setter')
 	themes: Dict[str, Theme]
 	current_theme: Theme
+	hyprland: HyprlandIPC
+	wallpaper_setter: WallpaperSetter
 
 	def __init__(self) -> None:
+		self.hyprland = HyprlandIPC()
+		self.wallpaper_setter = WallpaperSetter(self.hyprland)
 		self.themes: Dict[str, Theme] = {theme.name: theme for theme in Config.get_all_themes()}
 
 		if len(self.themes) < 1:
@@ -317,68 +321,69 @@ class ThemeManager:
 		else:
 			logging.error(f"Failed to add wallpaper to theme: {copied_wallpaper}")
 
-	def set_wallpaper(self, wallpaper: Path) -> None:
-		logging.debug(f"The process of setting a wallpaper \"{wallpaper}\" has begun")
-		
-		if SESSION_TYPE == "wayland":
-			transition_fps = 60
-			cursor_pos = "0,0"
-			
-			try:
-				output = subprocess.check_output(
-					['wlr-randr', '--json'],
-					stderr=subprocess.DEVNULL, 
-					universal_newlines=True,
-				)
-				for output_info in json.loads(output):
-					for mode in output_info['modes']:
-						if mode.get('current'):
-							transition_fps = int(round(mode['refresh']))
-							break
-					else:
-						continue
-					break
-			except Exception:
-				logging.warning(f"Couldn't get the screen frequency using wlr-randr: {traceback.format_exc()}")
+	def set_wallpaper(self, wallpaper: Path, output: Optional[str] = None) -> None:
+		"""
+		Sets the wallpaper according to the wallpaper mode from the config.
 
-			try:
-				output = subprocess.check_output(
-					['hyprctl', 'cursorpos'],
-					 universal_newlines=True,
-				).strip()
+		Args:
+			wallpaper: Path - Path to the wallpaper.
+			output: Optional[str] - Output to set the wallpaper on. In the "per-output" mode the focused output is used by default.
+		"""
+		logging.debug(f"The process of setting a wallpaper \"{wallpaper}\" has begun")
+		wallpaper = Path(wallpaper)
+		mode = Config.get_wallpaper_mode()
 
-				if output:
-					cursor_pos = output
-			except Exception:
-				logging.warning(f"Couldn't get the cursor position: {traceback.format_exc()}")
+		if output is None and mode == "per-output":
+			monitors = self.wallpaper_setter.get_monitors()
+			if len(monitors) > 1:
+				output = next((m for m in monitors if m.focused), monitors[0]).name
 
-			try:
-				subprocess.run([
-					'swww', 'img', str(wallpaper),
-					'--transition-bezier', '.43,1.19,1,.4',
-					'--transition-type', 'grow',
-					'--transition-duration', '0.4',
-					'--transition-fps', str(transition_fps),
-					'--invert-y',
-					'--transition-pos', cursor_pos
-				], check=True)
-			except Exception:
-				logging.error(f"Unknown error when installing wallpaper (swww): {traceback.format_exc()}")
+		if output is not None:
+			current_wallpaper = Config.get_current_wallpaper()
+			wallpapers = {
+				m.name: Path(current_wallpaper) for m in self.wallpaper_setter.get_monitors()
+				if current_wallpaper is not None and Path(current_wallpaper).exists()
+			}
+			wallpapers.update({out: Path(wp) for out, wp in Config.get_output_wallpapers().items() if Path(wp).exists()})
+			wallpapers[output] = wallpaper
+
+			if not self.wallpaper_setter.set_per_output({output: wallpaper}):
 				return
 
-		elif SESSION_TYPE == "x11":
-			try:
-				subprocess.run(['feh', '--no-fehbg', '--bg-fill', str(wallpaper)], check=True)
-			except Exception:
-				logging.error(f"Unknown error when installing wallpaper (feh): {traceback.format_exc()}")
-				return
+			Config._set_wallpaper(wallpaper, outputs=wallpapers)
+			logging.debug("The process of selecting a wallpaper has finished")
+			return
+
+		if mode == "span":
+			success = self.wallpaper_setter.set_span(wallpaper)
 		else:
-			logging.error(f"Unsupported XDG_SESSION_TYPE: {SESSION_TYPE}")
+			success = self.wallpaper_setter.set_all(wallpaper)
+
+		if not success:
 			return
 
 		Config._set_wallpaper(wallpaper)
 		logging.debug("The process of selecting a wallpaper has finished")
-	
+
+	def set_wallpapers(self, wallpapers: Dict[str, Path]) -> None:
+		"""
+		Sets an own wallpaper on each output at the same time.
+
+		Args:
+			wallpapers: Dict[str, Path] - Output name and the path to its wallpaper.
+		"""
+		logging.debug(f"The process of setting wallpapers {wallpapers} has begun")
+
+		if not self.wallpaper_setter.set_per_output(wallpapers):
+			return
+
+		monitors = self.wallpaper_setter.get_monitors()
+		focused = next((m.name for m in monitors if m.focused and m.name in wallpapers), None)
+		main_wallpaper = wallpapers[focused] if focused is not None else next(iter(wallpapers.values()))
+
+		Config._set_wallpaper(main_wallpaper, outputs=wallpapers)
+		logging.debug("The process of setting wallpapers has finished")
+
 	def _copy_wallpaper_to_folder(self, source_wallpaper: Path) -> Optional[Path]:
 		"""
 		Copy wallpaper to the meowrch wallpapers folder.
@@ -436,9 +441,20 @@ class ThemeManager:
 
 	def set_current_wallpaper(self) -> None:
 		logging.debug("The process of setting a current wallpaper has begun")
+		available_wallpapers = [str(wp) for wp in self.current_theme.available_wallpapers]
+
+		if Config.get_wallpaper_mode() == "per-output":
+			wallpapers = {
+				output: Path(wp) for output, wp in Config.get_output_wallpapers().items()
+				if wp in available_wallpapers and Path(wp).exists()
+			}
+			if len(wallpapers) > 0:
+				self.set_wallpapers(wallpapers)
+				return
+
 		wallpaper = Config.get_current_wallpaper()
 
-		if wallpaper is not None and wallpaper in [str(wp) for wp in self.current_theme.available_wallpapers]:
+		if wallpaper is not None and wallpaper in available_wallpapers:
 			wallpaper = Path(wallpaper)
 			if wallpaper.exists():
 				self.set_wallpaper(wallpaper)
@@ -447,21 +463,95 @@ class ThemeManager:
 		self.set_random_wallpaper()
 		logging.debug("The process of setting a current wallpaper has finished")
 
+	def _get_matching_wallpapers(self) -> Tuple[List[Path], Optional[Dict[Path, float]]]:
+		"""
+		Returns the wallpapers of the current theme sorted by how well they fit its palette, and their scores.
+		Custom wallpapers below the "min-score" are left out. Without matching, the list is returned as is.
+		"""
+		wallpapers = list(self.current_theme.available_wallpapers)
+		enabled, _, min_score = Config.get_wallpaper_matching()
+
+		if not enabled or len(wallpapers) < 1:
+			return wallpapers, None
+
+		try:
+			from .palette import PaletteAnalyzer
+			scores = PaletteAnalyzer().scores(wallpapers, self.current_theme.name)
+		except ImportError:
+			logging.warning(f"Wallpaper matching requires numpy: {traceback.format_exc()}")
+			return wallpapers, None
+		except Exception:
+			logging.error(f"Failed to match wallpapers to the theme: {traceback.format_exc()}")
+			return wallpapers, None
+
+		if min_score > 0:
+			custom_wallpapers = set(Config.get_custom_wallpapers())
+			matching = [wp for wp in wallpapers if wp not in custom_wallpapers or scores[wp] >= min_score]
+			wallpapers = matching if len(matching) > 0 else wallpapers
+
+		return sorted(wallpapers, key=lambda wp: scores[wp], reverse=True), scores
+
+	def analyze_wallpapers(self, path: Optional[str] = None) -> None:
+		"""
+		Extracts the palettes of all wallpapers of all themes (or of the passed path/mask) in one batch
+		and caches them in the wallpaper index.
+		"""
+		from .palette import PaletteAnalyzer
+
+		if path is not None:
+			wallpapers = parse_wallpapers([path if "*" in path or not Path(path).is_dir() else f"{path}/*"])
+		else:
+			wallpapers = [wp for theme in self.themes.values() for wp in theme.available_wallpapers]
+
+		analyzed = PaletteAnalyzer().analyze(wallpapers)
+		logging.info(f"Palettes of {analyzed} wallpapers were extracted, {len(wallpapers) - analyzed} were up to date")
+
+	def _get_random_wallpapers(self, count: int) -> List[Path]:
+		"""
+		Picks count different wallpapers (if there are enough) of the current theme.
+		With wallpaper matching enabled, the ones that fit the theme palette are more likely.
+		"""
+		wallpapers, scores = self._get_matching_wallpapers()
+		_, bias, _ = Config.get_wallpaper_matching()
+		picks = []
+
+		for _ in range(count):
+			candidates = [wp for wp in wallpapers if wp not in picks] or wallpapers
+			weights = None if scores is None else [max(scores[wp], 1e-6) ** bias for wp in candidates]
+			picks.append(random.choices(candidates, weights=weights, k=1)[0])
+
+		return picks
+
 	def set_random_wallpaper(self) -> None:
-		wallpaper = random.choice(self.current_theme.available_wallpapers)
+		available_wallpapers = self.current_theme.available_wallpapers
+
+		if len(available_wallpapers) > 0 and Config.get_wallpaper_mode() == "per-output":
+			monitors = self.wallpaper_setter.get_monitors()
+
+			if len(monitors) > 1:
+				picks = self._get_random_wallpapers(len(monitors))
+				self.set_wallpapers({monitor.name: wp for monitor, wp in zip(monitors, picks)})
+				return
+
+		wallpaper = self._get_random_wallpapers(1)[0] if len(available_wallpapers) > 0 else None
 
 		if wallpaper:
 			self.set_wallpaper(wallpaper)
 			return
 
 		logging.error("There are no wallpapers available...")
-		notify(f"There are no wallpapers available for \"{self.current_theme.name}\"...", critical=True)
+		notify("Critical error!", f"There are no wallpapers available for \"{self.current_theme.name}\"...", critical=True)
 
 	def select_wallpaper(self):
 		logging.debug("The process of selecting wallpapers using the rofi menu has begun")
 
 		try:
-			result = Selector.select_wallpaper(self.current_theme)
+			wallpapers, _ = self._get_matching_wallpapers()
+			result = Selector.select_wallpaper(Theme(
+				name=self.current_theme.name,
+				available_wallpapers=wallpapers,
+				icon=self.current_theme.icon
+			))
 		except:
 			logging.error(f"An error occurred while selecting wallpapers using rofi: {traceback.format_exc()}")
 			return
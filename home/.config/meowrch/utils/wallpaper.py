@@ -0,0 +1,301 @@
+import re
+import logging
+import hashlib
+import traceback
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .schemes import Monitor
+from .hyprland import HyprlandIPC
+from vars import SESSION_TYPE, WALLPAPERS_SPAN_CACHE_DIR, WALLPAPERS_PRELOAD_CACHE_DIR
+
+
+class WallpaperSetter:
+	"""
+	Applies wallpapers to the outputs using swww (wayland) or feh (x11).
+	Per-output setter commands are started together and awaited at the end.
+	"""
+	__slots__ = ('hyprland', 'prepared')
+	KEY_LENGTH = 12
+	SPAN_CACHE_KEYS = 4 # Текущие обои, заготовки следующих и запас на смену раскладки
+	XRANDR_MONITOR = re.compile(r"^\s*\d+:\s+\+?\*?(\S+)\s+(\d+)/\d+x(\d+)/\d+([+-]\d+)([+-]\d+)")
+
+	def __init__(self, hyprland: HyprlandIPC) -> None:
+		self.hyprland = hyprland
+		self.prepared: Dict[Path, Path] = {}
+
+	def get_monitors(self) -> List[Monitor]:
+		if SESSION_TYPE == "wayland":
+			return self.hyprland.get_monitors()
+		elif SESSION_TYPE == "x11":
+			return self._get_xrandr_monitors()
+
+		return []
+
+	@classmethod
+	def _get_xrandr_monitors(cls) -> List[Monitor]:
+		monitors = []
+
+		try:
+			output = subprocess.check_output(
+				['xrandr', '--listactivemonitors'],
+				stderr=subprocess.DEVNULL,
+				universal_newlines=True,
+			)
+		except Exception:
+			logging.warning(f"Couldn't get the monitors using xrandr: {traceback.format_exc()}")
+			return monitors
+
+		for line in output.splitlines():
+			match = cls.XRANDR_MONITOR.match(line)
+			if match is None:
+				continue
+
+			name, width, height, x, y = match.groups()
+			monitors.append(Monitor(
+				name=name, x=int(x), y=int(y), width=int(width), height=int(height), focused="*" in line
+			))
+
+		return monitors
+
+	def _swww_command(self, wallpaper: Path, output: Optional[str], transition_pos: str, transition_fps: int) -> List[str]:
+		command = [
+			'swww', 'img', str(self.prepared.get(wallpaper, wallpaper)),
+			'--transition-bezier', '.43,1.19,1,.4',
+			'--transition-type', 'grow',
+			'--transition-duration', '0.4',
+			'--transition-fps', str(transition_fps),
+			'--invert-y',
+			'--transition-pos', transition_pos
+		]
+
+		if output is not None:
+			command.extend(['-o', output])
+
+		return command
+
+	def set_all(self, wallpaper: Path) -> bool:
+		"""
+		Sets the same wallpaper on all outputs.
+		"""
+		if SESSION_TYPE == "wayland":
+			cursor_pos = self.hyprland.get_cursor_pos()
+			command = self._swww_command(
+				wallpaper=wallpaper,
+				output=None,
+				transition_pos="0,0" if cursor_pos is None else f"{cursor_pos[0]},{cursor_pos[1]}",
+				transition_fps=self.hyprland.get_refresh_rate(default=60),
+			)
+		elif SESSION_TYPE == "x11":
+			command = ['feh', '--no-fehbg', '--bg-fill', str(self.prepared.get(wallpaper, wallpaper))]
+		else:
+			logging.error(f"Unsupported XDG_SESSION_TYPE: {SESSION_TYPE}")
+			return False
+
+		return self._run_all([command])
+
+	def set_per_output(self, wallpapers: Dict[str, Path]) -> bool:
+		"""
+		Sets an own wallpaper on each output.
+
+		Args:
+			wallpapers: Dict[str, Path] - Output name and the path to its wallpaper.
+		"""
+		monitors = self.get_monitors()
+
+		if SESSION_TYPE == "wayland":
+			cursor_pos = self.hyprland.get_cursor_pos()
+			commands = []
+
+			for monitor in monitors:
+				if monitor.name not in wallpapers:
+					continue
+
+				transition_pos = "center"
+				if cursor_pos is not None:
+					x, y = cursor_pos[0] - monitor.x, cursor_pos[1] - monitor.y
+					if 0 <= x < monitor.width and 0 <= y < monitor.height:
+						transition_pos = f"{x},{y}"
+
+				commands.append(self._swww_command(
+					wallpaper=wallpapers[monitor.name],
+					output=monitor.name,
+					transition_pos=transition_pos,
+					transition_fps=int(round(monitor.refresh_rate)),
+				))
+
+			if len(commands) < 1:
+				logging.error(f"None of the outputs {list(wallpapers.keys())} are connected")
+				return False
+
+			return self._run_all(commands)
+
+		elif SESSION_TYPE == "x11":
+			# feh takes one image per Xinerama screen in a single call, in the order of the screens.
+			images = [wallpapers.get(m.name, next(iter(wallpapers.values()))) for m in monitors]
+			if len(images) < 1:
+				images = list(wallpapers.values())
+
+			images = [str(self.prepared.get(wp, wp)) for wp in images]
+
+			return self._run_all([['feh', '--no-fehbg', '--bg-fill', *images]])
+
+		logging.error(f"Unsupported XDG_SESSION_TYPE: {SESSION_TYPE}")
+		return False
+
+	def set_span(self, wallpaper: Path) -> bool:
+		"""
+		Stretches one wallpaper across all outputs according to their layout.
+		"""
+		if SESSION_TYPE == "x11":
+			return self._run_all([['feh', '--no-fehbg', '--no-xinerama', '--bg-fill', str(wallpaper)]])
+
+		monitors = self.get_monitors()
+		if len(monitors) < 2:
+			return self.set_all(wallpaper)
+
+		try:
+			pieces = self.split_wallpaper(wallpaper, monitors)
+		except Exception:
+			logging.error(f"Failed to split the wallpaper \"{wallpaper}\" across the outputs: {traceback.format_exc()}")
+			return self.set_all(wallpaper)
+
+		return self.set_per_output(pieces)
+
+	def preload(self, wallpapers: List[Path], span: bool = False, cache_dir: Path = WALLPAPERS_PRELOAD_CACHE_DIR) -> None:
+		"""
+		Scales the wallpapers down to the largest output in advance, so that setting them later is just a setter call.
+		With span=True, the wallpapers are cut into pieces for the outputs instead.
+		"""
+		from PIL import Image
+
+		monitors = self.get_monitors()
+		if len(monitors) < 1:
+			return
+
+		cache_dir.mkdir(parents=True, exist_ok=True)
+		width = max(m.width for m in monitors)
+		height = max(m.height for m in monitors)
+		prepared: Dict[Path, Path] = {}
+
+		for wallpaper in wallpapers:
+			wallpaper = Path(wallpaper)
+
+			try:
+				if span:
+					self.split_wallpaper(wallpaper, monitors)
+					continue
+
+				##==> Ключ по пути и времени изменения: одноимённые обои из разных папок не перезапишут друг друга
+				key = self.cache_key(wallpaper, f"{width}x{height}")
+				target = cache_dir / f"{key}-{wallpaper.stem}.png"
+				if target.exists():
+					prepared[wallpaper] = target
+					continue
+
+				with Image.open(wallpaper) as image:
+					scale = max(width / image.width, height / image.height)
+					if scale >= 1:
+						continue
+
+					image.resize((round(image.width * scale), round(image.height * scale))).save(target)
+					prepared[wallpaper] = target
+			except Exception:
+				logging.warning(f"Failed to preload the wallpaper \"{wallpaper}\": {traceback.format_exc()}")
+
+		##==> Удаляем устаревшие заготовки
+		###########################################
+		keep = set(prepared.values())
+		for file in cache_dir.glob("*.png"):
+			if file not in keep:
+				file.unlink(missing_ok=True)
+
+		self.prepared = prepared
+
+	@staticmethod
+	def split_wallpaper(wallpaper: Path, monitors: List[Monitor], cache_dir: Path = WALLPAPERS_SPAN_CACHE_DIR) -> Dict[str, Path]:
+		"""
+		Cuts the wallpaper into pieces for each output. The pieces are cached by the layout of the outputs.
+
+		Returns:
+			Dict[str, Path]: Output name and the path to its piece of the wallpaper.
+		"""
+		from PIL import Image
+
+		left = min(m.x for m in monitors)
+		top = min(m.y for m in monitors)
+		width = max(m.x + m.width for m in monitors) - left
+		height = max(m.y + m.height for m in monitors) - top
+
+		layout = ";".join(f"{m.name}:{m.x},{m.y},{m.width}x{m.height}" for m in monitors)
+		key = WallpaperSetter.cache_key(wallpaper, layout)
+		pieces = {m.name: cache_dir / f"{key}-{wallpaper.stem}-{m.name}.png" for m in monitors}
+
+		if all(piece.exists() for piece in pieces.values()):
+			##==> Отмечаем использование, чтобы очистка не удалила показанные обои
+			for piece in pieces.values():
+				piece.touch()
+			return pieces
+
+		cache_dir.mkdir(parents=True, exist_ok=True)
+
+		with Image.open(wallpaper) as image:
+			scale = max(width / image.width, height / image.height)
+			scaled = image.resize((max(width, round(image.width * scale)), max(height, round(image.height * scale))))
+			offset_x = (scaled.width - width) // 2
+			offset_y = (scaled.height - height) // 2
+
+			for monitor in monitors:
+				x = offset_x + monitor.x - left
+				y = offset_y + monitor.y - top
+				scaled.crop((x, y, x + monitor.width, y + monitor.height)).save(pieces[monitor.name])
+
+		WallpaperSetter.prune_cache(cache_dir, WallpaperSetter.SPAN_CACHE_KEYS)
+		return pieces
+
+	@staticmethod
+	def cache_key(wallpaper: Path, variant: str) -> str:
+		"""
+		Cache key of a prepared wallpaper: the resolved path, the modification time and the variant (size or layout).
+		"""
+		return hashlib.md5(f"{wallpaper.resolve()}|{wallpaper.stat().st_mtime}|{variant}".encode()).hexdigest()[:WallpaperSetter.KEY_LENGTH]
+
+	@staticmethod
+	def prune_cache(cache_dir: Path, keys: int) -> None:
+		"""
+		Leaves only the files of the most recently used cache keys (the key is the beginning of the file name).
+		"""
+		files = []
+		for file in cache_dir.glob("*.png"):
+			try:
+				files.append((file.stat().st_mtime, file))
+			except OSError:
+				continue
+
+		recent = []
+		for _, file in sorted(files, reverse=True):
+			key = file.name[:WallpaperSetter.KEY_LENGTH]
+			if key not in recent and len(recent) < keys:
+				recent.append(key)
+			if key not in recent:
+				file.unlink(missing_ok=True)
+
+	@staticmethod
+	def _run_all(commands: List[List[str]]) -> bool:
+		processes = []
+
+		for command in commands:
+			try:
+				processes.append((command, subprocess.Popen(command)))
+			except Exception:
+				logging.error(f"Unknown error when installing wallpaper ({command[0]}): {traceback.format_exc()}")
+
+		success = len(processes) == len(commands)
+
+		for command, process in processes:
+			if process.wait() != 0:
+				logging.error(f"Unknown error when installing wallpaper ({command[0]}): exit code {process.returncode}")
+				success = False
+
+		return success
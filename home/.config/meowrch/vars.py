@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import Optional
 from os.path import expandvars
@@ -16,6 +17,14 @@ ROFI_SELECTING_THEME: Path = Path.home() / ".config" / "rofi" / "selecting.rasi"
 
 WALLPAPERS_CACHE_DIR: Path = HOME / ".cache" / "meowrch" / "wallpaper_thumbnails"
 THEMES_CACHE_DIR: Path = HOME / ".cache" / "meowrch" / "themes_thumbnails"
+WALLPAPERS_SPAN_CACHE_DIR: Path = HOME / ".cache" / "meowrch" / "wallpaper_span"
+WALLPAPERS_PRELOAD_CACHE_DIR: Path = HOME / ".cache" / "meowrch" / "wallpaper_preload"
+WALLPAPER_BAG: Path = HOME / ".cache" / "meowrch" / "wallpaper_bag.json"
+WALLPAPER_INDEX: Path = HOME / ".cache" / "meowrch" / "wallpaper_index.json"
+RUNTIME_DIR: Path = (lambda d: Path(d) if d != "$XDG_RUNTIME_DIR" else Path("/tmp"))(expandvars("$XDG_RUNTIME_DIR"))
+ROTATION_LOCK: Path = RUNTIME_DIR / f"meowrch-rotation-{os.getuid()}.lock"
+
+WALLPAPER_MODES = ("clone", "per-output", "span")
 
 OOMOX_COLORS: Path = lambda theme_name: MEOWRCH_THEMES / theme_name / "oomox-colors"  # noqa: E731
 
@@ -1,12 +1,23 @@
 import os
+import re
 import json
+import math
+import mmap
+import time
+import fcntl
+import heapq
+import struct
 import psutil
-import GPUtil
+import sys
+import socket
 import argparse
-import pyamdgpuinfo
+import subprocess
+import selectors
 import configparser
+from abc import ABC, abstractmethod
 from os.path import expandvars
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
 
 
 # ┏━━━┳━━┳━┓┏━┳━━━┳┓╋╋┏━━┳━┓┏━┓
@@ -25,6 +36,7 @@ class ValIcons:
 	percent_critical: bool
 	temp_icon: str
 	temp_critical: bool
+	warning: bool = False # Значение в полосе перед критической - постоянный режим опрашивает чаще
 
 
 def get_icon(percent_val: int, temp_val: int) -> ValIcons:
@@ -51,29 +63,673 @@ def get_icon(percent_val: int, temp_val: int) -> ValIcons:
 		temp_critical = True
 		temp_icon = " "
 
-	return ValIcons(percent_icon, percent_critical, temp_icon, temp_critical)
+	warning = percent_val >= 70 or temp_val >= 70
+	return ValIcons(percent_icon, percent_critical, temp_icon, temp_critical, warning)
 
 
-def get_cpu_info(label_mode: str):
+def read_sysfs(path: str) -> Optional[str]:
+	try:
+		with open(path, "r") as f:
+			return f.read().strip()
+	except OSError:
+		return None
+
+
+def read_sysfs_int(path: str) -> Optional[int]:
+	value = read_sysfs(path)
+	try:
+		return int(value) if value is not None else None
+	except ValueError:
+		return None
+
+
+# ╻ ╻╻┏━┓╺┳╸┏━┓┏━┓╻ ╻
+# ┣━┫┃┗━┓ ┃ ┃ ┃┣┳┛┗┳┛
+# ╹ ╹╹┗━┛ ╹ ┗━┛╹┗╸ ╹
+# Кольцевые буферы фиксированного размера: память и время не растут вместе с историей.
+# В постоянном режиме буфер в памяти, в разовом - небольшой mmap-файл, общий для всех вызовов.
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class MetricHistory:
+	"""
+	Ring buffers of float samples, one slot per metric name.
+	Slot layout: name (16 bytes), write position, sample count, time of the last sample, then the samples.
+	"""
+	SLOT_HEADER = struct.Struct("16sIId")
+
+	def __init__(self, size: int, max_metrics: int, path: Optional[str] = None, min_step: float = 0) -> None:
+		self.size = size
+		self.max_metrics = max_metrics
+		self.min_step = min_step # Замеры чаще min_step секунд (несколько баров) не записываются
+		self.values = struct.Struct(f"{size}f")
+		self.slot_size = self.SLOT_HEADER.size + self.values.size
+		self.file = None
+		self.slots: Dict[str, int] = {}
+		length = self.slot_size * max_metrics
+
+		if path is None:
+			self.buffer = bytearray(length)
+			return
+
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.file = open(path, "a+b")
+		fcntl.flock(self.file, fcntl.LOCK_EX)
+		try:
+			if os.fstat(self.file.fileno()).st_size != length:
+				# Другой размер истории - начинаем заново
+				self.file.truncate(0)
+				self.file.truncate(length)
+		finally:
+			fcntl.flock(self.file, fcntl.LOCK_UN)
+
+		self.buffer = mmap.mmap(self.file.fileno(), length)
+
+	def _slot(self, name: str) -> Optional[int]:
+		if name in self.slots:
+			return self.slots[name]
+
+		key = name.encode()[:16]
+		for index in range(self.max_metrics):
+			offset = index * self.slot_size
+			slot_name = self.SLOT_HEADER.unpack_from(self.buffer, offset)[0].rstrip(b"\0")
+
+			if slot_name == key or slot_name == b"":
+				if slot_name == b"":
+					self.SLOT_HEADER.pack_into(self.buffer, offset, key, 0, 0, 0)
+				self.slots[name] = offset
+				return offset
+
+		return None
+
+	def push(self, values: Dict[str, Optional[float]]) -> None:
+		now = time.time()
+
+		if self.file is not None:
+			fcntl.flock(self.file, fcntl.LOCK_EX)
+
+		try:
+			for name, value in values.items():
+				offset = self._slot(name)
+				if value is None or offset is None:
+					continue
+
+				key, pos, count, last = self.SLOT_HEADER.unpack_from(self.buffer, offset)
+				if now - last < self.min_step:
+					continue
+
+				struct.pack_into("f", self.buffer, offset + self.SLOT_HEADER.size + pos * 4, value)
+				self.SLOT_HEADER.pack_into(self.buffer, offset, key, (pos + 1) % self.size, min(count + 1, self.size), now)
+		finally:
+			if self.file is not None:
+				fcntl.flock(self.file, fcntl.LOCK_UN)
+
+	def get(self, name: str) -> List[float]:
+		"""
+		Returns the samples of the metric from the oldest to the newest.
+		"""
+		offset = self._slot(name)
+		if offset is None:
+			return []
+
+		_, pos, count, _ = self.SLOT_HEADER.unpack_from(self.buffer, offset)
+		values = self.values.unpack_from(self.buffer, offset + self.SLOT_HEADER.size)
+
+		if count < self.size:
+			return list(values[:count])
+
+		return list(values[pos:] + values[:pos])
+
+
+def sparkline(values: List[float], width: int = 30, low: Optional[float] = None, high: Optional[float] = None) -> str:
+	"""
+	Draws the last values as a line of block characters. Older values are averaged down to the width.
+	"""
+	if len(values) < 1:
+		return ""
+
+	if len(values) > width:
+		step = len(values) / width
+		values = [
+			sum(values[int(i * step):int((i + 1) * step)]) / len(values[int(i * step):int((i + 1) * step)])
+			for i in range(width)
+		]
+
+	low = min(values) if low is None else low
+	high = max(values) if high is None else high
+	scale = (len(SPARK_CHARS) - 1) / (high - low) if high > low else 0
+
+	return "".join(SPARK_CHARS[int(max(0, min(high, v) - low) * scale)] for v in values)
+
+
+def format_history(
+	history: Optional[MetricHistory], name: str, title: str, unit: str,
+	percent: bool = True, fmt: Optional[Callable[[float], str]] = None
+) -> List[str]:
+	if history is None:
+		return []
+
+	values = history.get(name)
+	if len(values) < 2:
+		return []
+
+	if fmt is None:
+		fmt = lambda value: f"{value:.0f}{unit}"
+
+	low, high = (0, 100) if percent else (None, None)
+	return [
+		f"{title}: {sparkline(values, low=low, high=high)}",
+		f"    min {fmt(min(values))}  avg {fmt(sum(values) / len(values))}  max {fmt(max(values))}"
+	]
+
+
+@dataclass
+class CounterSampler(ABC):
+	"""
+	Keeps the previous sample of growing kernel counters (/proc/stat, /proc/diskstats, /proc/net/dev).
+	In the resident mode the previous sample is kept in memory, in the one-shot mode - in state_file.
+	"""
+	state_file: Optional[str] = None
+	max_age: float = 60
+	previous: Optional[Dict[str, List[int]]] = None
+	timestamp: float = 0
+
+	@abstractmethod
+	def read_counters(self) -> Dict[str, List[int]]: ...
+
+	def _load_state(self) -> None:
+		if self.previous is not None or self.state_file is None:
+			return
+
+		try:
+			with open(self.state_file, "r") as f:
+				state = json.load(f)
+			self.previous, self.timestamp = state["counters"], float(state["timestamp"])
+		except (OSError, ValueError, KeyError, TypeError):
+			self.previous = None
+
+	def _save_state(self) -> None:
+		if self.state_file is None:
+			return
+
+		try:
+			os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+			with open(self.state_file + ".tmp", "w") as f:
+				json.dump({"timestamp": self.timestamp, "counters": self.previous}, f)
+			os.replace(self.state_file + ".tmp", self.state_file)
+		except OSError:
+			pass
+
+	def deltas(self) -> Tuple[Dict[str, List[int]], float]:
+		"""
+		Returns the growth of every counter since the previous sample and the seconds that passed.
+		Without a usable previous sample (first run, stale state, devices changed) it measures a short 100 ms window.
+		"""
+		self._load_state()
+		current = self.read_counters()
+		now = time.time()
+
+		if self.previous is None or now - self.timestamp > self.max_age or self.previous.keys() != current.keys():
+			self.previous, self.timestamp = current, now
+			time.sleep(0.1)
+			current = self.read_counters()
+			now = time.time()
+
+		deltas = {
+			name: [max(value - prev, 0) for value, prev in zip(values, self.previous.get(name, values))]
+			for name, values in current.items()
+		}
+		elapsed = max(now - self.timestamp, 0.001)
+
+		self.previous, self.timestamp = current, now
+		self._save_state()
+		return deltas, elapsed
+
+
+@dataclass
+class CpuSampler(CounterSampler):
+	"""
+	Считает загрузку процессора по разнице счётчиков /proc/stat между двумя замерами.
+	"""
+	stat_file: str = "/proc/stat"
+
+	def read_counters(self) -> Dict[str, List[int]]:
+		"""
+		Returns the busy and total jiffies of the whole CPU ("cpu") and of every core ("cpu0", "cpu1", ...).
+		"""
+		counters = {}
+
+		with open(self.stat_file, "r") as f:
+			for line in f:
+				if not line.startswith("cpu"):
+					break
+
+				name, *values = line.split()
+				values = [int(v) for v in values[:8]]
+				idle = values[3] + values[4] # idle + iowait
+				total = sum(values)
+				counters[name] = [total - idle, total]
+
+		return counters
+
+	def sample(self) -> Dict[str, float]:
+		"""
+		Returns the utilization in percent since the previous sample: "cpu" for the whole CPU and "cpuN" per core.
+		"""
+		deltas, _ = self.deltas()
+		return {
+			name: 0.0 if total <= 0 else max(0.0, min(100.0, busy * 100 / total))
+			for name, (busy, total) in deltas.items()
+		}
+
+
+@dataclass
+class DiskSampler(CounterSampler):
+	"""
+	Read and write throughput of the physical disks from /proc/diskstats.
+	"""
+	stat_file: str = "/proc/diskstats"
+	sysfs_root: str = "/sys"
+	SECTOR_SIZE = 512 # /proc/diskstats всегда считает в секторах по 512 байт
+
+	def read_counters(self) -> Dict[str, List[int]]:
+		counters = {}
+
+		with open(self.stat_file, "r") as f:
+			for line in f:
+				fields = line.split()
+				if len(fields) < 10:
+					continue
+
+				# Только целые физические диски: у разделов, loop, zram и dm нет /sys/block/<name>/device
+				name = fields[2]
+				if not os.path.exists(os.path.join(self.sysfs_root, "block", name, "device")):
+					continue
+
+				counters[name] = [int(fields[5]) * self.SECTOR_SIZE, int(fields[9]) * self.SECTOR_SIZE]
+
+		return counters
+
+	def sample(self) -> Dict[str, Tuple[float, float]]:
+		"""
+		Returns the read and write rates in bytes per second of every disk.
+		"""
+		deltas, elapsed = self.deltas()
+		return {name: (read / elapsed, write / elapsed) for name, (read, write) in deltas.items()}
+
+
+@dataclass
+class NetSampler(CounterSampler):
+	"""
+	Receive and transmit rates of the network interfaces from /proc/net/dev.
+	"""
+	stat_file: str = "/proc/net/dev"
+
+	def read_counters(self) -> Dict[str, List[int]]:
+		counters = {}
+
+		with open(self.stat_file, "r") as f:
+			for line in f:
+				name, sep, values = line.partition(":")
+				name = name.strip()
+				if not sep or name == "lo":
+					continue
+
+				values = values.split()
+				counters[name] = [int(values[0]), int(values[8])]
+
+		return counters
+
+	def sample(self) -> Dict[str, Tuple[float, float]]:
+		"""
+		Returns the receive and transmit rates in bytes per second of every interface.
+		"""
+		deltas, elapsed = self.deltas()
+		return {name: (rx / elapsed, tx / elapsed) for name, (rx, tx) in deltas.items()}
+
+
+def format_rate(rate: float) -> str:
+	for unit in ("B", "KB", "MB"):
+		if rate < 1024:
+			return f"{rate:.0f} {unit}/s" if unit == "B" else f"{rate:.1f} {unit}/s"
+		rate /= 1024
+
+	return f"{rate:.1f} GB/s"
+
+
+# ┏━┓┏━┓┏━┓┏━╸┏━╸┏━┓┏━┓┏━╸┏━┓
+# ┣━┛┣┳┛┃ ┃┃  ┣╸ ┗━┓┗━┓┣╸ ┗━┓
+# ╹  ╹┗╸┗━┛┗━╸┗━╸┗━┛┗━┛┗━╸┗━┛
+# Кто нагружает систему. Один read() /proc/<pid>/stat на процесс за замер,
+# клиенты DRM (видеокарты) ищутся по /proc/<pid>/fd редко, между поисками читается только их fdinfo.
+
+TOP_PROCESSES = 5
+
+
+@dataclass
+class ProcessUsage:
+	pid: int
+	name: str
+	cpu: float = 0 # Процентов одного ядра, как в top
+	rss: int = 0 # Байты
+	gpu: Dict[str, float] = field(default_factory=dict) # PCI-адрес видеокарты -> проценты
+
+
+@dataclass
+class ProcessSampler:
+	"""
+	Per-process CPU, memory and GPU usage from /proc/<pid>/stat and the DRM fdinfo.
+	The previous CPU ticks and GPU engine times are kept per PID, so every sample is a single pass over /proc.
+	Samples newer than min_interval seconds are reused, so the CPU, RAM and GPU modules share one pass.
+	"""
+	proc_root: str = "/proc"
+	min_interval: float = 0
+	drm_rescan: float = 30 # 0 - не искать клиентов DRM вовсе
+	ticks: Dict[int, Tuple[int, int]] = field(default_factory=dict) # pid -> (starttime, utime + stime)
+	gpu_time: Dict[Tuple[int, str, str], Tuple[int, Optional[int]]] = field(default_factory=dict) # (pid, client id, engine) -> (ns или циклы, всего циклов)
+	drm_fds: Dict[int, List[str]] = field(default_factory=dict) # pid -> файлы fdinfo
+	drm_scanned_at: float = -math.inf
+	timestamp: float = 0
+	usage: List[ProcessUsage] = field(default_factory=list)
+
+	CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+	PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+	def sample(self) -> List[ProcessUsage]:
+		now = time.monotonic()
+		if self.timestamp > 0 and now - self.timestamp < self.min_interval:
+			return self.usage
+
+		# Первый замер только запоминает счётчики: загрузка CPU и GPU в нём нулевая
+		self.usage = self._read_all(now)
+		return self.usage
+
+	def _read_all(self, now: float) -> List[ProcessUsage]:
+		elapsed = now - self.timestamp if self.timestamp > 0 else 0
+		ticks = {}
+		usage = []
+
+		with os.scandir(self.proc_root) as entries:
+			for entry in entries:
+				if not entry.name.isdigit():
+					continue
+
+				try:
+					with open(os.path.join(entry.path, "stat"), "rb") as f:
+						data = f.read()
+				except OSError:
+					continue # Процесс уже завершился
+
+				##==> Имя может содержать пробелы и скобки, поэтому поля считаются от последней ")"
+				###########################################
+				head, _, rest = data.rpartition(b")")
+				fields = rest.split()
+				pid = int(entry.name)
+				total = int(fields[11]) + int(fields[12]) # utime + stime
+				start = int(fields[19])
+
+				cpu = 0.0
+				previous = self.ticks.get(pid)
+				if previous is not None and previous[0] == start and elapsed > 0:
+					cpu = (total - previous[1]) * 100 / self.CLOCK_TICKS / elapsed
+
+				ticks[pid] = (start, total)
+				usage.append(ProcessUsage(
+					pid=pid,
+					name=head.partition(b"(")[2].decode(errors="replace"),
+					cpu=cpu,
+					rss=int(fields[21]) * self.PAGE_SIZE
+				))
+
+		self.ticks = ticks
+		if self.drm_rescan > 0:
+			self._read_gpu(usage, now, elapsed)
+
+		self.timestamp = now
+		return usage
+
+	def _find_drm_clients(self, usage: List[ProcessUsage]) -> None:
+		drm_fds = {}
+
+		for process in usage:
+			if process.rss == 0:
+				continue # Потоки ядра
+
+			fd_dir = os.path.join(self.proc_root, str(process.pid), "fd")
+			try:
+				with os.scandir(fd_dir) as fds:
+					found = [
+						os.path.join(self.proc_root, str(process.pid), "fdinfo", fd.name)
+						for fd in fds if os.readlink(fd.path).startswith("/dev/dri/")
+					]
+			except OSError:
+				continue # Чужой процесс или уже завершился
+
+			if len(found) > 0:
+				drm_fds[process.pid] = found
+
+		self.drm_fds = drm_fds
+
+	def _read_gpu(self, usage: List[ProcessUsage], now: float, elapsed: float) -> None:
+		if now - self.drm_scanned_at >= self.drm_rescan:
+			self._find_drm_clients(usage)
+			self.drm_scanned_at = now
+
+		processes = {process.pid: process for process in usage}
+		gpu_time = {}
+
+		for pid, paths in self.drm_fds.items():
+			process = processes.get(pid)
+			if process is None:
+				continue
+
+			for path in paths:
+				try:
+					with open(path, "r") as f:
+						lines = f.read().splitlines()
+				except OSError:
+					continue
+
+				##==> i915 и amdgpu отдают время движка в ns (drm-engine-*),
+				##==> xe - занятые циклы (drm-cycles-*) и все циклы GPU за то же время (drm-total-cycles-*)
+				###########################################
+				client, pdev, engines, cycles, total_cycles = None, None, {}, {}, {}
+				for line in lines:
+					key, _, value = line.partition(":")
+					value = value.strip()
+
+					if key == "drm-client-id":
+						client = value
+					elif key == "drm-pdev":
+						pdev = value
+					elif key.startswith("drm-engine-") and value.endswith(" ns"):
+						engines[key[11:]] = (int(value[:-3]), None)
+					elif key.startswith("drm-cycles-"):
+						cycles[key[11:]] = int(value)
+					elif key.startswith("drm-total-cycles-"):
+						total_cycles[key[17:]] = int(value)
+
+				for engine, count in cycles.items():
+					if engine in total_cycles:
+						engines[engine] = (count, total_cycles[engine])
+
+				# Несколько fd одного клиента дают одинаковый fdinfo - считаем клиента один раз
+				if client is None or any((pid, client, engine) in gpu_time for engine in engines):
+					continue
+
+				busy = 0.0
+				for engine, (spent, total) in engines.items():
+					gpu_time[(pid, client, engine)] = (spent, total)
+					previous = self.gpu_time.get((pid, client, engine))
+					if previous is None:
+						continue
+
+					if total is None:
+						if elapsed > 0:
+							busy = max(busy, (spent - previous[0]) / 1e7 / elapsed)
+					elif total > previous[1]:
+						busy = max(busy, (spent - previous[0]) * 100 / (total - previous[1]))
+
+				process.gpu[pdev] = min(process.gpu.get(pdev, 0) + busy, 100)
+
+		self.gpu_time = gpu_time
+
+
+def format_processes(usage: List[ProcessUsage], key: Callable[[ProcessUsage], float], fmt: Callable[[float], str], count: int = TOP_PROCESSES) -> List[str]:
+	return [
+		f"{fmt(key(process)):>9}  {process.name} ({process.pid})"
+		for process in heapq.nlargest(count, usage, key=key) if key(process) > 0
+	]
+
+
+def format_size(size: float) -> str:
+	return f"{size / 1024 ** 3:.1f} GB" if size >= 1024 ** 3 else f"{size / 1024 ** 2:.0f} MB"
+
+
+# ┏━┓┏━╸┏┓╻┏━┓┏━┓┏━┓┏━┓
+# ┗━┓┣╸ ┃┗┫┗━┓┃ ┃┣┳┛┗━┓
+# ┗━┛┗━╸╹ ╹┗━┛┗━┛╹┗╸┗━┛
+# Датчики ищутся один раз, дальше каждый замер - один read() выбранного файла.
+
+# Датчики температуры процессора по убыванию приоритета: (имя hwmon, метки temp*_label)
+CPU_HWMON_SENSORS = (
+	("coretemp", ("Package id 0",)),
+	("k10temp", ("Tdie", "Tctl")),
+	("zenpower", ("Tdie", "Tctl")),
+	("cpu_thermal", ()),
+)
+CPU_THERMAL_ZONES = ("x86_pkg_temp", "acpitz")
+CPU_CORE_LABELS = ("Core ", "Tccd")
+
+
+@dataclass
+class SensorIndex:
+	"""
+	Map of the temperature input files: CPU package, CPU cores (or CCDs) and NVMe drives.
+	sysfs_root can point to a fake sysfs tree.
+	"""
+	sysfs_root: str = "/sys"
+	cpu_package: Optional[str] = None
+	cpu_cores: Dict[str, str] = field(default_factory=dict)
+	nvme: Dict[str, str] = field(default_factory=dict)
+
+	def _hwmon_inputs(self, hwmon: str) -> Dict[str, str]:
+		"""
+		Returns the label (or the input name, if there is no label) and the path of every temperature input.
+		"""
+		inputs = {}
+
+		try:
+			files = sorted(os.listdir(hwmon), key=lambda f: (len(f), f))
+		except OSError:
+			return inputs
+
+		for file in files:
+			if file.startswith("temp") and file.endswith("_input"):
+				label = read_sysfs(os.path.join(hwmon, file.replace("_input", "_label")))
+				inputs[label or file[:-6]] = os.path.join(hwmon, file)
+
+		return inputs
+
+	def discover(self) -> "SensorIndex":
+		hwmons: Dict[str, List[Dict[str, str]]] = {}
+		hwmon_root = os.path.join(self.sysfs_root, "class", "hwmon")
+
+		try:
+			entries = sorted(os.listdir(hwmon_root))
+		except OSError:
+			entries = []
+
+		for entry in entries:
+			path = os.path.join(hwmon_root, entry)
+			name = read_sysfs(os.path.join(path, "name"))
+			inputs = self._hwmon_inputs(path)
+
+			if name == "nvme" and len(inputs) > 0:
+				drive = os.path.basename(os.path.realpath(os.path.join(path, "device")))
+				self.nvme[drive] = inputs.get("Composite", next(iter(inputs.values())))
+			elif name is not None:
+				hwmons.setdefault(name, []).append(inputs)
+
+		##==> Температура процессора
+		###########################################
+		for name, labels in CPU_HWMON_SENSORS:
+			for inputs in hwmons.get(name, []):
+				if len(inputs) < 1:
+					continue
+
+				self.cpu_package = next((inputs[l] for l in labels if l in inputs), next(iter(inputs.values())))
+				self.cpu_cores = {l: p for l, p in inputs.items() if l.startswith(CPU_CORE_LABELS)}
+				break
+
+			if self.cpu_package is not None:
+				break
+
+		if self.cpu_package is None:
+			thermal_root = os.path.join(self.sysfs_root, "class", "thermal")
+			try:
+				zones = sorted(z for z in os.listdir(thermal_root) if z.startswith("thermal_zone"))
+			except OSError:
+				zones = []
+
+			types = {read_sysfs(os.path.join(thermal_root, z, "type")): os.path.join(thermal_root, z, "temp") for z in reversed(zones)}
+			self.cpu_package = next((types[t] for t in CPU_THERMAL_ZONES if t in types), None)
+
+		return self
+
+	@property
+	def paths(self) -> List[str]:
+		return [p for p in [self.cpu_package, *self.cpu_cores.values(), *self.nvme.values()] if p is not None]
+
+	@staticmethod
+	def read(path: Optional[str]) -> Optional[float]:
+		value = read_sysfs_int(path) if path is not None else None
+		return None if value is None else value / 1000
+
+	def cpu_temp(self) -> Optional[float]:
+		return self.read(self.cpu_package)
+
+	def core_temps(self) -> Dict[str, Optional[float]]:
+		return {label: self.read(path) for label, path in self.cpu_cores.items()}
+
+	def nvme_temps(self) -> Dict[str, Optional[float]]:
+		return {drive: self.read(path) for drive, path in self.nvme.items()}
+
+
+def format_temps(temps: Dict[str, Optional[float]], per_line: int = 4) -> str:
+	items = [f"{label}: {'N/A' if temp is None else int(temp)}°C" for label, temp in temps.items()]
+	return "\n".join("  ".join(items[start:start + per_line]) for start in range(0, len(items), per_line))
+
+
+def format_cores(usage: Dict[str, float], per_line: int = 8) -> str:
+	cores = sorted((int(name[3:]), value) for name, value in usage.items() if name != "cpu")
+	lines = []
+
+	for start in range(0, len(cores), per_line):
+		lines.append("  ".join(f"{num:>2}: {int(value):>3}%" for num, value in cores[start:start + per_line]))
+
+	return "\n".join(lines)
+
+
+def get_cpu_info(
+	label_mode: str, sampler: CpuSampler, facts: "HardwareFacts",
+	history: Optional[MetricHistory] = None, processes: Optional[List[ProcessUsage]] = None
+):
 	"""
 	label_mode: str = utilization - Вывод загруженности в процентах
 	label_mode: str = temp - Вывод температуры в градусах Цельсия
+	sampler: CpuSampler - Источник загрузки процессора (хранит прошлый замер)
+	facts: HardwareFacts - Сведения о железе, включая найденные датчики температуры
+	history: Optional[MetricHistory] - История замеров для графиков в подсказке
 	"""
+	sensors = facts.sensors
 
-	with open("/proc/cpuinfo", "r") as cpu_info:
-		lines = cpu_info.readlines()
-	
-	for line in lines:
-		if "name" in line:
-			cpu_name = line.split(":")[1].strip()
-			break
-
-	cpu_percent = int(psutil.cpu_percent(interval=1))
+	usage = sampler.sample()
+	cpu_percent = int(usage["cpu"])
 
-	try:
-		cpu_temp = int(psutil.sensors_temperatures()['coretemp'][0].current)
-	except:
-		cpu_temp = "N/A"
+	cpu_temp = sensors.cpu_temp()
+	cpu_temp = "N/A" if cpu_temp is None else int(cpu_temp)
 
 	icons = get_icon(cpu_percent, 0 if cpu_temp == "N/A" else cpu_temp)
 	percent_icon = icons.percent_icon
@@ -81,15 +737,48 @@ def get_cpu_info(label_mode: str):
 	temp_icon = icons.temp_icon
 	temp_critical = icons.temp_critical
 
+	tooltip = [
+		f"󰍛 Name: {facts.cpu_name}",
+		f"󰘚 Cores: {facts.cpu_cores}, Threads: {facts.cpu_threads}",
+		f"{percent_icon}Utilization: {str(cpu_percent)}%",
+		f"{temp_icon}Temp: {str(cpu_temp)}°C",
+		format_cores(usage)
+	]
+
+	if len(sensors.cpu_cores) > 0:
+		tooltip.extend(["", format_temps(sensors.core_temps())])
+
+	if len(sensors.nvme) > 0:
+		tooltip.extend(["", "󰋊 NVMe", format_temps(sensors.nvme_temps())])
+
+	if history is not None:
+		history.push({**usage, "cpu-temp": None if cpu_temp == "N/A" else float(cpu_temp)})
+		lines = [
+			*format_history(history, "cpu", "Utilization", "%"),
+			*format_history(history, "cpu-temp", "Temp", "°C", percent=False)
+		]
+		if len(lines) > 0:
+			tooltip.extend(["", *lines])
+
+		cores = [f"{int(name[3:]):>2} {sparkline(history.get(name), width=16, low=0, high=100)}" for name in sorted(usage, key=lambda n: (len(n), n)) if name != "cpu"]
+		if len(cores) > 1:
+			tooltip.extend("   ".join(cores[start:start + 2]) for start in range(0, len(cores), 2))
+
+	if processes is not None:
+		lines = format_processes(processes, key=lambda p: p.cpu, fmt=lambda v: f"{v:.1f}%")
+		if len(lines) > 0:
+			tooltip.extend(["", "󰓅 Top processes", *lines])
+
 	return {
 		'text': f"󰍛 {str(cpu_temp)}°C" if label_mode == 'temp' else f"󰍛 {str(cpu_percent)}%",
-		'tooltip': f"󰍛 Name: {cpu_name}\n{percent_icon}Utilization: {str(cpu_percent)}%\n{temp_icon}Temp: {str(cpu_temp)}°C",
-		'critical': temp_critical if label_mode == "temp" else percent_critical
+		'tooltip': "\n".join(tooltip),
+		'critical': temp_critical if label_mode == "temp" else percent_critical,
+		'warning': icons.warning
 	}
 
-def get_ram_info():
+def get_ram_info(facts: "HardwareFacts", history: Optional[MetricHistory] = None, processes: Optional[List[ProcessUsage]] = None):
 	svmem = psutil.virtual_memory()
-	total = str(round(svmem.total / (1024.0 ** 3), 2))
+	total = str(round((facts.ram_total or svmem.total) / (1024.0 ** 3), 2))
 	used = round(svmem.used / (1000 ** 2) / 1000, 2)
 	critical = False
 
@@ -103,171 +792,1628 @@ def get_ram_info():
 		critical = True
 		icon = " "
 
+	tooltip = [f"{icon}Percent Utilization: {svmem.percent}%", f"  Utilization: {str(used)}/{total} GB"]
+
+	if history is not None:
+		history.push({"ram": float(svmem.percent)})
+		lines = format_history(history, "ram", "Utilization", "%")
+		if len(lines) > 0:
+			tooltip.extend(["", *lines])
+
+	if processes is not None:
+		lines = format_processes(processes, key=lambda p: p.rss, fmt=format_size)
+		if len(lines) > 0:
+			tooltip.extend(["", "󰓅 Top processes", *lines])
+
 	return {
 		'text': f"{icon} {str(used)} GB",
-		'tooltip': f"{icon}Percent Utilization: {svmem.percent}%\n  Utilization: {str(used)}/{total} GB",
-		'critical': critical
+		'tooltip': "\n".join(tooltip),
+		'critical': critical,
+		'warning': svmem.percent >= 70
 	}
 
-def get_gpu_info(label_mode: str):
-	percent_critical = False
-	temp_critical = False
+DISK_RATE_LIMIT = 500 * 1024 ** 2 # Около предела SATA SSD, выше - критическая нагрузка
+NET_RATE_LIMIT = 125 * 1024 ** 2 # Гигабитный Ethernet
 
-	try:
-		gpu = GPUtil.getGPUs()[0]
-		gpu_name = gpu.name
-		gpu_percent: float = round(gpu.load * 100, 2)
-		gpu_temp: float = round(gpu.temperature, 2)
-
-		icons = get_icon(gpu_percent, gpu_temp)
-		percent_icon = icons.percent_icon
-		percent_critical = icons.percent_critical
-		temp_icon = icons.temp_icon
-		temp_critical = icons.temp_critical
-	except:
-		try:
-			first_gpu = pyamdgpuinfo.get_gpu(0)
-			gpu_name = "N/A"
-			gpu_percent = int(first_gpu.query_load())
-			gpu_temp = first_gpu.query_temperature()
-			icons = get_icon(gpu_percent, gpu_temp)
-			percent_icon = icons.percent_icon
-			percent_critical = icons.percent_critical
-			temp_icon = icons.temp_icon
-			temp_critical = icons.temp_critical
-		except:
-			gpu_name = 'N/A'
-			gpu_percent = 'N/A'
-			gpu_temp = 'N/A'
-			percent_icon = "󰾆 "
-			temp_icon = " "
+
+def format_throughput(rates: Dict[str, Tuple[float, float]], labels: Tuple[str, str]) -> List[str]:
+	return [
+		f"{name}: {labels[0]} {format_rate(first)}, {labels[1]} {format_rate(second)}"
+		for name, (first, second) in sorted(rates.items())
+	]
+
+
+def get_disk_info(sampler: DiskSampler, history: Optional[MetricHistory] = None):
+	rates = sampler.sample()
+	read = sum(r for r, _ in rates.values())
+	write = sum(w for _, w in rates.values())
+	icons = get_icon(int((read + write) * 100 / DISK_RATE_LIMIT), 0)
+
+	tooltip = [f"{icons.percent_icon}Disk Throughput: {format_rate(read + write)}"]
+	tooltip.extend(format_throughput(rates, ("read", "write")))
+
+	if history is not None:
+		history.push({"disk-read": read, "disk-write": write})
+		for name, title in (("disk-read", "Read"), ("disk-write", "Write")):
+			lines = format_history(history, name, title, "B/s", percent=False, fmt=format_rate)
+			if len(lines) > 0:
+				tooltip.extend(["", *lines])
 
 	return {
-		'text': f"󰢮 {str(gpu_temp)}°C" if label_mode == 'temp' else f"󰢮 {str(gpu_percent)}%",
-		'tooltip': f"󰢮 Name: {gpu_name}\n{percent_icon}Utilization: {str(gpu_percent)}%\n{temp_icon}Temp: {str(gpu_temp)}°C",
-		'critical': temp_critical if label_mode == "temp" else percent_critical
+		'text': f"󰋊 R {format_rate(read)} W {format_rate(write)}",
+		'tooltip': "\n".join(tooltip),
+		'critical': icons.percent_critical,
+		'warning': icons.warning
 	}
 
-def get_system_info_config(config_path: str):
-	os.makedirs(os.path.dirname(config_path), exist_ok=True)
-	config = configparser.ConfigParser()
 
-	if not os.path.isfile(config_path):
-		config['DEFAULT'] = {
-			'cpu-label-mode': 'utilization',
-			'gpu-label-mode': 'utilization'
-		}
+def get_bandwidth_info(sampler: NetSampler, history: Optional[MetricHistory] = None):
+	rates = sampler.sample()
+	rx = sum(r for r, _ in rates.values())
+	tx = sum(t for _, t in rates.values())
+	icons = get_icon(int(max(rx, tx) * 100 / NET_RATE_LIMIT), 0)
 
-		with open(config_path, 'w') as configfile:
-			config.write(configfile)
+	tooltip = [f"{icons.percent_icon}Network Throughput: {format_rate(rx + tx)}"]
+	tooltip.extend(format_throughput(rates, ("down", "up")))
 
-		return 'utilization', 'utilization'
+	if history is not None:
+		history.push({"net-rx": rx, "net-tx": tx})
+		for name, title in (("net-rx", "Download"), ("net-tx", "Upload")):
+			lines = format_history(history, name, title, "B/s", percent=False, fmt=format_rate)
+			if len(lines) > 0:
+				tooltip.extend(["", *lines])
 
+	return {
+		'text': f"󰇚 {format_rate(rx)} 󰕒 {format_rate(tx)}",
+		'tooltip': "\n".join(tooltip),
+		'critical': icons.percent_critical,
+		'warning': icons.warning
+	}
 
-	config.read(config_path)
+# ┏━╸┏━┓╻ ╻
+# ┃╺┓┣━┛┃ ┃
+# ┗━┛╹  ┗━┛
+# Видеокарты определяются один раз по /sys/class/drm, дальше каждый замер - чтение пары файлов.
+# NVIDIA опрашивается через NVML внутри процесса, GPUtil (nvidia-smi) - только если NVML нет.
 
-	cpu_label_mode = config.get('DEFAULT', 'cpu-label-mode', fallback='utilization')
-	gpu_label_mode = config.get('DEFAULT', 'gpu-label-mode', fallback='utilization')
+PCI_VENDORS = {"0x10de": "nvidia", "0x1002": "amd", "0x8086": "intel"}
+PCI_IDS_PATHS = ("/usr/share/hwdata/pci.ids", "/usr/share/misc/pci.ids")
 
-	if cpu_label_mode not in ['utilization', 'temp']:
-		cpu_label_mode = 'utilization'
-	
-	if gpu_label_mode not in ['utilization', 'temp']:
-		gpu_label_mode = 'utilization'
 
-	return cpu_label_mode, gpu_label_mode
+@dataclass
+class GpuDevice:
+	vendor: str
+	card: str # Путь к /sys/class/drm/cardN
+	pci_slot: str
+	name: str = "N/A"
 
-def set_system_info_config(config_path: str, cpu_mode: str, gpu_mode: str):
-	os.makedirs(os.path.dirname(config_path), exist_ok=True)
-	config = configparser.ConfigParser()
 
-	if not os.path.isfile(config_path):
-		config['DEFAULT'] = {
-			'cpu-label-mode': 'utilization',
-			'gpu-label-mode': 'utilization'
-		}
-	else:
-		config.read(config_path)
+@dataclass
+class GpuStats:
+	device: GpuDevice
+	load: Optional[float] = None
+	temp: Optional[float] = None
+	freq: Optional[int] = None # МГц
+	mem_used: Optional[int] = None # МиБ
+	mem_total: Optional[int] = None # МиБ
 
 
-	if cpu_mode in ['utilization', 'temp']:
-		config['DEFAULT']['cpu-label-mode'] = cpu_mode
-	else:
-		config['DEFAULT']['cpu-label-mode'] = 'utilization'
+def lookup_pci_name(vendor_id: str, device_id: str) -> Optional[str]:
+	vendor_id, device_id = vendor_id[2:].lower(), device_id[2:].lower()
 
-	if gpu_mode in ['utilization', 'temp']:
-		config['DEFAULT']['gpu-label-mode'] = gpu_mode
-	else:
-		config['DEFAULT']['gpu-label-mode'] = 'utilization'
+	for path in PCI_IDS_PATHS:
+		try:
+			with open(path, "r", encoding="utf-8", errors="ignore") as f:
+				in_vendor = False
+				for line in f:
+					if line.startswith(vendor_id + "  "):
+						in_vendor = True
+					elif in_vendor and line.startswith("\t" + device_id + "  "):
+						return line.strip()[len(device_id):].strip()
+					elif in_vendor and not line.startswith(("\t", "#")):
+						return None
+		except OSError:
+			continue
 
-	with open(config_path, 'w') as configfile:
-		config.write(configfile)
+	return None
 
-if __name__ == "__main__":
-	config_path = os.path.expanduser("~/.cache/meowrch/system-info.ini")
-	SESSION_TYPE = (lambda s: s if s != "$XDG_SESSION_TYPE" else None)(expandvars("$XDG_SESSION_TYPE"))
-	cpu_label_mode, gpu_label_mode = get_system_info_config(config_path)
 
-	parser = argparse.ArgumentParser()
-	parser.add_argument("--cpu",  action="store_true")
-	parser.add_argument("--ram",  action="store_true")
-	parser.add_argument("--gpu",  action="store_true")
-	parser.add_argument("--click",  action="store_true")
-	parser.add_argument("--normal-color", default="#a6e3a1")
-	parser.add_argument("--critical-color", default="#f38ba8")
+@dataclass
+class GpuBackend:
+	"""
+	Reads the load and temperature of all graphics cards.
+	sysfs_root can point to a fake sysfs tree.
+	"""
+	sysfs_root: str = "/sys"
+	devices: Optional[List[GpuDevice]] = None
+	rc6: Dict[str, Tuple[int, float]] = field(default_factory=dict) # Прошлый замер RC6 Intel: (rc6_ms, time)
+	nvml: Optional[object] = None
 
-	args = parser.parse_args()
+	def detect(self) -> List[GpuDevice]:
+		if self.devices is not None:
+			return self.devices
 
-	if args.cpu:
-		if args.click:
-			set_system_info_config(
-				config_path=config_path, 
-				cpu_mode='temp' if cpu_label_mode == 'utilization' else 'utilization',
-				gpu_mode=gpu_label_mode
-			)
-		else:
-			cpu = get_cpu_info(label_mode=cpu_label_mode)
-			color = args.critical_color if cpu['critical'] else args.normal_color
-			del cpu['critical']
-			
-			if SESSION_TYPE == "x11":
-				print("%{F" + color + "}" + cpu['text'] + "%{F-}")
-			elif SESSION_TYPE == "wayland":
-				cpu["text"] = f"<span color=\"{color}\">{cpu['text']}</span>"
-				print(json.dumps(cpu))
-			else:
-				print("N/A")
-	elif args.ram:
-		ram = get_ram_info()
-		color = args.critical_color if ram['critical'] else args.normal_color
-		del ram['critical']
-
-		if SESSION_TYPE == "x11":
-			print("%{F" + color + "}" + ram['text'] + "%{F-}")
-		elif SESSION_TYPE == "wayland":
-			ram["text"] = f"<span color=\"{color}\">{ram['text']}</span>"
-			print(json.dumps(ram))
-		else:
-			print("N/A")
-
-	elif args.gpu:
-		if args.click:
-			set_system_info_config(
-				config_path=config_path, 
-				cpu_mode=cpu_label_mode,
-				gpu_mode='temp' if gpu_label_mode == 'utilization' else 'utilization'
+		devices = []
+		drm = os.path.join(self.sysfs_root, "class", "drm")
+
+		try:
+			cards = sorted(c for c in os.listdir(drm) if c.startswith("card") and c[4:].isdigit())
+		except OSError:
+			cards = []
+
+		for card in cards:
+			path = os.path.join(drm, card)
+			vendor = PCI_VENDORS.get(read_sysfs(os.path.join(path, "device", "vendor")) or "")
+			if vendor is None:
+				continue
+
+			pci_slot = os.path.basename(os.path.realpath(os.path.join(path, "device")))
+			device = GpuDevice(vendor=vendor, card=path, pci_slot=pci_slot)
+			device.name = lookup_pci_name(
+				read_sysfs(os.path.join(path, "device", "vendor")) or "0x",
+				read_sysfs(os.path.join(path, "device", "device")) or "0x"
+			) or f"{vendor.upper() if vendor == 'amd' else vendor.capitalize()} GPU"
+			devices.append(device)
+
+		# Дискретные видеокарты первыми: по первой строится текст модуля
+		order = {"nvidia": 0, "amd": 1, "intel": 2}
+		self.devices = sorted(devices, key=lambda d: order[d.vendor])
+		return self.devices
+
+	def _hwmon_temp(self, card: str) -> Optional[float]:
+		hwmon = os.path.join(card, "device", "hwmon")
+
+		try:
+			names = sorted(os.listdir(hwmon))
+		except OSError:
+			return None
+
+		for name in names:
+			temp = read_sysfs_int(os.path.join(hwmon, name, "temp1_input"))
+			if temp is not None:
+				return temp / 1000
+
+		return None
+
+	def _sample_amd(self, device: GpuDevice) -> GpuStats:
+		mem_used = read_sysfs_int(os.path.join(device.card, "device", "mem_info_vram_used"))
+		mem_total = read_sysfs_int(os.path.join(device.card, "device", "mem_info_vram_total"))
+
+		return GpuStats(
+			device=device,
+			load=read_sysfs_int(os.path.join(device.card, "device", "gpu_busy_percent")),
+			temp=self._hwmon_temp(device.card),
+			mem_used=None if mem_used is None else mem_used // 2**20,
+			mem_total=None if mem_total is None else mem_total // 2**20
+		)
+
+	def _sample_intel(self, device: GpuDevice) -> GpuStats:
+		card = device.card
+		freq = read_sysfs_int(os.path.join(card, "gt_cur_freq_mhz"))
+		if freq is None:
+			freq = read_sysfs_int(os.path.join(card, "gt", "gt0", "rps_cur_freq_mhz"))
+
+		rc6 = read_sysfs_int(os.path.join(card, "gt", "gt0", "rc6_residency_ms"))
+		if rc6 is None:
+			rc6 = read_sysfs_int(os.path.join(card, "power", "rc6_residency_ms"))
+
+		load = None
+		now = time.monotonic()
+
+		if rc6 is not None:
+			# Доля времени вне RC6 (сна) между замерами - это загрузка
+			prev = self.rc6.get(card)
+			self.rc6[card] = (rc6, now)
+			if prev is not None and now - prev[1] > 0:
+				idle = (rc6 - prev[0]) / ((now - prev[1]) * 1000)
+				load = round(max(0.0, min(1.0, 1 - idle)) * 100, 2)
+
+		if load is None and freq is not None:
+			# Первый замер: оцениваем по частоте
+			max_freq = read_sysfs_int(os.path.join(card, "gt_max_freq_mhz"))
+			min_freq = read_sysfs_int(os.path.join(card, "gt_min_freq_mhz")) or 0
+			if max_freq:
+				load = round(max(0, freq - min_freq) * 100 / max(max_freq - min_freq, 1), 2)
+
+		return GpuStats(device=device, load=load, temp=self._hwmon_temp(card), freq=freq)
+
+	def _sample_nvidia(self, device: GpuDevice, index: int) -> GpuStats:
+		if self.nvml is None:
+			try:
+				import pynvml
+				pynvml.nvmlInit()
+				self.nvml = pynvml
+			except Exception:
+				self.nvml = False
+
+		if self.nvml:
+			try:
+				nvml = self.nvml
+				handle = nvml.nvmlDeviceGetHandleByPciBusId(device.pci_slot.encode())
+				name = nvml.nvmlDeviceGetName(handle)
+				device.name = name.decode() if isinstance(name, bytes) else name
+				memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+				return GpuStats(
+					device=device,
+					load=float(nvml.nvmlDeviceGetUtilizationRates(handle).gpu),
+					temp=float(nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)),
+					freq=nvml.nvmlDeviceGetClockInfo(handle, nvml.NVML_CLOCK_GRAPHICS),
+					mem_used=memory.used // 2**20,
+					mem_total=memory.total // 2**20
+				)
+			except Exception:
+				pass
+
+		try:
+			import GPUtil
+			gpu = GPUtil.getGPUs()[index]
+			device.name = gpu.name
+			return GpuStats(
+				device=device,
+				load=round(gpu.load * 100, 2),
+				temp=round(gpu.temperature, 2),
+				mem_used=int(gpu.memoryUsed),
+				mem_total=int(gpu.memoryTotal)
 			)
-		else:
-			gpu = get_gpu_info(label_mode=gpu_label_mode)
-			color = args.critical_color if gpu['critical'] else args.normal_color
-			del gpu['critical']
-
-			if SESSION_TYPE == "x11":
-				print("%{F" + color + "}" + gpu['text'] + "%{F-}")
-			elif SESSION_TYPE == "wayland":
-				gpu["text"] = f"<span color=\"{color}\">{gpu['text']}</span>"
-				print(json.dumps(gpu))
+		except Exception:
+			return GpuStats(device=device)
+
+	def sample(self) -> List[GpuStats]:
+		stats = []
+		nvidia_index = 0
+
+		for device in self.detect():
+			if device.vendor == "amd":
+				stats.append(self._sample_amd(device))
+			elif device.vendor == "intel":
+				stats.append(self._sample_intel(device))
 			else:
-				print("N/A")
+				stats.append(self._sample_nvidia(device, nvidia_index))
+				nvidia_index += 1
+
+		return stats
+
+
+def get_gpu_info(
+	label_mode: str, backend: GpuBackend,
+	history: Optional[MetricHistory] = None, processes: Optional[List[ProcessUsage]] = None
+):
+	stats = backend.sample()
+	percent_critical = False
+	temp_critical = False
+	warning = False
+	tooltip = []
+
+	for index, gpu in enumerate(stats):
+		gpu_percent = "N/A" if gpu.load is None else round(gpu.load, 2)
+		gpu_temp = "N/A" if gpu.temp is None else round(gpu.temp, 2)
+		icons = get_icon(0 if gpu.load is None else gpu.load, 0 if gpu.temp is None else gpu.temp)
+
+		if len(tooltip) > 0:
+			tooltip.append("")
+
+		tooltip.extend([
+			f"󰢮 Name: {gpu.device.name}",
+			f"{icons.percent_icon}Utilization: {str(gpu_percent)}%",
+			f"{icons.temp_icon}Temp: {str(gpu_temp)}°C"
+		])
+		if gpu.freq is not None:
+			tooltip.append(f"󰓅 Frequency: {gpu.freq} MHz")
+		if gpu.mem_used is not None and gpu.mem_total:
+			tooltip.append(f"󰍛 Memory: {gpu.mem_used} / {gpu.mem_total} MiB")
+
+		if history is not None:
+			name = f"gpu{index}"
+			history.push({f"{name}-load": gpu.load, f"{name}-temp": gpu.temp})
+			tooltip.extend([
+				*format_history(history, f"{name}-load", "Utilization", "%"),
+				*format_history(history, f"{name}-temp", "Temp", "°C", percent=False)
+			])
+
+		if processes is not None:
+			slot = gpu.device.pci_slot
+			tooltip.extend(format_processes(processes, key=lambda p: p.gpu.get(slot, 0), fmt=lambda v: f"{v:.1f}%"))
+
+		if index == 0:
+			text = f"󰢮 {str(gpu_temp)}°C" if label_mode == 'temp' else f"󰢮 {str(gpu_percent)}%"
+			percent_critical = icons.percent_critical
+			temp_critical = icons.temp_critical
+			warning = icons.warning
+
+	if len(stats) < 1:
+		text = "󰢮 N/A°C" if label_mode == 'temp' else "󰢮 N/A%"
+		tooltip = ["󰢮 Name: N/A", "󰾆 Utilization: N/A%", " Temp: N/A°C"]
+
+	return {
+		'text': text,
+		'tooltip': "\n".join(tooltip),
+		'critical': temp_critical if label_mode == "temp" else percent_critical,
+		'warning': warning
+	}
+
+
+# ╻ ╻┏━┓┏━┓╺┳┓╻ ╻┏━┓┏━┓┏━╸
+# ┣━┫┣━┫┣┳┛ ┃┃┃╻┃┣━┫┣┳┛┣╸
+# ╹ ╹╹ ╹╹┗╸╺┻┛┗┻┛╹ ╹╹┗╸┗━╸
+# Неизменные до перезагрузки сведения о железе кэшируются по boot_id.
+
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+
+@dataclass
+class HardwareFacts:
+	boot_id: str
+	cpu_name: str = "N/A"
+	cpu_cores: int = 0
+	cpu_threads: int = 0
+	ram_total: int = 0 # Байты
+	gpus: List[GpuDevice] = field(default_factory=list)
+	sensors: SensorIndex = field(default_factory=SensorIndex)
+
+	@classmethod
+	def collect(cls, boot_id: str, sysfs_root: str = "/sys", proc_root: str = "/proc") -> "HardwareFacts":
+		facts = cls(boot_id=boot_id)
+		cores = set()
+
+		try:
+			with open(os.path.join(proc_root, "cpuinfo"), "r") as f:
+				physical_id = "0"
+				for line in f:
+					key, _, value = line.partition(":")
+					key, value = key.strip(), value.strip()
+
+					if key == "processor":
+						facts.cpu_threads += 1
+					elif key == "model name" and facts.cpu_name == "N/A":
+						facts.cpu_name = value
+					elif key == "physical id":
+						physical_id = value
+					elif key == "core id":
+						cores.add((physical_id, value))
+		except OSError:
+			pass
+
+		facts.cpu_cores = len(cores) or facts.cpu_threads
+
+		try:
+			with open(os.path.join(proc_root, "meminfo"), "r") as f:
+				for line in f:
+					if line.startswith("MemTotal:"):
+						facts.ram_total = int(line.split()[1]) * 1024
+						break
+		except (OSError, ValueError, IndexError):
+			pass
+
+		facts.gpus = GpuBackend(sysfs_root=sysfs_root).detect()
+		facts.sensors = SensorIndex(sysfs_root=sysfs_root).discover()
+		return facts
+
+	def save(self, path: str) -> None:
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with open(path + ".tmp", "w") as f:
+				data = asdict(self)
+				del data["sensors"]["sysfs_root"]
+				json.dump(data, f)
+			os.replace(path + ".tmp", path)
+		except OSError:
+			pass
+
+	@classmethod
+	def load(cls, path: str, sysfs_root: str = "/sys", proc_root: str = "/proc") -> "HardwareFacts":
+		"""
+		Returns the cached facts if they were collected during the current boot, otherwise collects and caches them.
+		"""
+		boot_id = read_sysfs(os.path.join(proc_root, BOOT_ID_PATH[len("/proc/"):])) or ""
+
+		try:
+			with open(path, "r") as f:
+				data = json.load(f)
+
+			facts = cls(
+				**{k: v for k, v in data.items() if k not in ("gpus", "sensors")},
+				gpus=[GpuDevice(**gpu) for gpu in data["gpus"]],
+				sensors=SensorIndex(sysfs_root=sysfs_root, **data["sensors"])
+			)
+
+			if boot_id != "" and facts.boot_id == boot_id and all(os.path.exists(p) for p in facts.sensors.paths):
+				return facts
+		except (OSError, ValueError, TypeError, KeyError):
+			pass
+
+		facts = cls.collect(boot_id, sysfs_root=sysfs_root, proc_root=proc_root)
+		facts.save(path)
+		return facts
+
+
+def make_history(facts: HardwareFacts, seconds: int, interval: float, path: Optional[str] = None) -> Optional[MetricHistory]:
+	if seconds <= 0:
+		return None
+
+	try:
+		return MetricHistory(
+			size=max(int(seconds / interval), 2),
+			max_metrics=12 + facts.cpu_threads + 2 * len(facts.gpus),
+			path=path,
+			min_step=interval / 2 if path is not None else 0
+		)
+	except OSError:
+		return None
+
+
+def get_system_info_config(config_path: str):
+	os.makedirs(os.path.dirname(config_path), exist_ok=True)
+	config = configparser.ConfigParser()
+
+	if not os.path.isfile(config_path):
+		config['DEFAULT'] = {
+			'cpu-label-mode': 'utilization',
+			'gpu-label-mode': 'utilization'
+		}
+
+		with open(config_path, 'w') as configfile:
+			config.write(configfile)
+
+		return 'utilization', 'utilization'
+
+
+	config.read(config_path)
+
+	cpu_label_mode = config.get('DEFAULT', 'cpu-label-mode', fallback='utilization')
+	gpu_label_mode = config.get('DEFAULT', 'gpu-label-mode', fallback='utilization')
+
+	if cpu_label_mode not in ['utilization', 'temp']:
+		cpu_label_mode = 'utilization'
+	
+	if gpu_label_mode not in ['utilization', 'temp']:
+		gpu_label_mode = 'utilization'
+
+	return cpu_label_mode, gpu_label_mode
+
+def set_system_info_config(config_path: str, cpu_mode: str, gpu_mode: str):
+	os.makedirs(os.path.dirname(config_path), exist_ok=True)
+	config = configparser.ConfigParser()
+
+	if not os.path.isfile(config_path):
+		config['DEFAULT'] = {
+			'cpu-label-mode': 'utilization',
+			'gpu-label-mode': 'utilization'
+		}
+	else:
+		config.read(config_path)
+
+
+	if cpu_mode in ['utilization', 'temp']:
+		config['DEFAULT']['cpu-label-mode'] = cpu_mode
+	else:
+		config['DEFAULT']['cpu-label-mode'] = 'utilization'
+
+	if gpu_mode in ['utilization', 'temp']:
+		config['DEFAULT']['gpu-label-mode'] = gpu_mode
+	else:
+		config['DEFAULT']['gpu-label-mode'] = 'utilization'
+
+	with open(config_path, 'w') as configfile:
+		config.write(configfile)
+
+def format_output(info: Optional[dict], session_type: Optional[str], normal_color: str, critical_color: str) -> str:
+	if info is None:
+		# Модуль недоступен (нет батареи, подсветки...) - пустая строка скрывает его на баре
+		return json.dumps({'text': ''}) if session_type == "wayland" else ""
+
+	color = critical_color if info['critical'] else normal_color
+
+	if session_type == "x11":
+		return "%{F" + color + "}" + info['text'] + "%{F-}"
+	elif session_type == "wayland":
+		return json.dumps({
+			'text': f"<span color=\"{color}\">{info['text']}</span>",
+			'tooltip': info['tooltip']
+		})
+
+	return "N/A"
+
+
+# ┏┳┓┏━┓╺┳┓╻ ╻╻  ┏━╸┏━┓
+# ┃┃┃┃ ┃ ┃┃┃ ┃┃  ┣╸ ┗━┓
+# ╹ ╹┗━┛╺┻┛┗━┛┗━╸┗━╸┗━┛
+# Модули бара. Модуль отдаёт словарь ('text', 'tooltip', 'critical', необязательно 'warning') или None, чтобы скрыться.
+# Модули с источником событий перерисовываются по событию, остальные опрашиваются на тиках.
+
+@dataclass
+class ModuleContext:
+	"""
+	State shared by the modules. In the resident mode it lives as long as the server,
+	so the CPU sample and the history stay in memory instead of the state files.
+	"""
+	config_path: str
+	facts_path: str
+	state_dir: Optional[str] = None
+	history_path: Optional[str] = None
+	interval: float = 2
+	history_seconds: int = 300
+	sysfs_root: str = "/sys"
+
+	def __post_init__(self) -> None:
+		self.cpu_label_mode, self.gpu_label_mode = get_system_info_config(self.config_path)
+		self._facts: Optional[HardwareFacts] = None
+		self._history: Optional[MetricHistory] = None
+		self._history_ready = False
+		self._processes: Optional[ProcessSampler] = None
+
+	@property
+	def facts(self) -> HardwareFacts:
+		if self._facts is None:
+			self._facts = HardwareFacts.load(self.facts_path, sysfs_root=self.sysfs_root)
+		return self._facts
+
+	@property
+	def history(self) -> Optional[MetricHistory]:
+		if not self._history_ready:
+			self._history = make_history(self.facts, self.history_seconds, self.interval, path=self.history_path)
+			self._history_ready = True
+		return self._history
+
+	def top_processes(self) -> Optional[List[ProcessUsage]]:
+		"""
+		Usage of every process for the tooltips. None if /proc can't be read.
+		Only available in the resident mode: a one-shot call has no previous sample to compute the load from.
+		"""
+		if self.state_dir is not None:
+			return None
+
+		if self._processes is None:
+			self._processes = ProcessSampler(
+				min_interval=self.interval / 2,
+				drm_rescan=30 if any(gpu.vendor != "nvidia" for gpu in self.facts.gpus) else 0
+			)
+
+		try:
+			return self._processes.sample()
+		except (OSError, ValueError, IndexError):
+			return None
+
+	def state_file(self, name: str) -> Optional[str]:
+		"""
+		File of the previous counter sample of a sampler. None in the resident mode - the sample stays in memory.
+		"""
+		return None if self.state_dir is None else os.path.join(self.state_dir, f"system-info-{name}.json")
+
+	def toggle_label_mode(self, module: str) -> None:
+		if module == "cpu":
+			self.cpu_label_mode = 'temp' if self.cpu_label_mode == 'utilization' else 'utilization'
+		elif module == "gpu":
+			self.gpu_label_mode = 'temp' if self.gpu_label_mode == 'utilization' else 'utilization'
+
+		set_system_info_config(self.config_path, cpu_mode=self.cpu_label_mode, gpu_mode=self.gpu_label_mode)
+
+
+class UeventMonitor:
+	"""
+	Kernel uevents of the given subsystems (the ones udev receives) over a netlink socket.
+	"""
+	NETLINK_KOBJECT_UEVENT = 15
+
+	def __init__(self, subsystems: Tuple[str, ...]) -> None:
+		self.subsystems = tuple(f"SUBSYSTEM={s}".encode() for s in subsystems)
+		self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_KOBJECT_UEVENT)
+		self.sock.bind((0, 1))
+		self.sock.setblocking(False)
+		self.alive = True
+
+	def fileno(self) -> int:
+		return self.sock.fileno()
+
+	def read(self) -> bool:
+		changed = False
+
+		while True:
+			try:
+				message = self.sock.recv(65536)
+			except (BlockingIOError, InterruptedError):
+				break
+			except OSError:
+				self.alive = False
+				break
+
+			changed = changed or any(s in message.split(b"\0") for s in self.subsystems)
+
+		return changed
+
+	def close(self) -> None:
+		self.sock.close()
+
+
+class CommandMonitor:
+	"""
+	Output of a long-running command that prints a line per change (pactl subscribe, nmcli monitor, dbus-monitor).
+	"""
+
+	def __init__(self, command: List[str], pattern: Optional[bytes] = None) -> None:
+		self.pattern = re.compile(pattern) if pattern is not None else None
+		self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+		os.set_blocking(self.process.stdout.fileno(), False)
+		self.buffer = b""
+		self.alive = True
+
+	def fileno(self) -> int:
+		return self.process.stdout.fileno()
+
+	def read(self) -> bool:
+		while True:
+			try:
+				chunk = os.read(self.fileno(), 65536)
+			except (BlockingIOError, InterruptedError):
+				break
+
+			if not chunk:
+				self.alive = False
+				break
+
+			self.buffer += chunk
+
+		*lines, self.buffer = self.buffer.split(b"\n")
+		return any(self.pattern is None or self.pattern.search(line) for line in lines)
+
+	def close(self) -> None:
+		self.process.terminate()
+		self.process.stdout.close()
+		try:
+			self.process.wait(timeout=1)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+
+
+class InotifyMonitor:
+	"""
+	Writes to the given files through inotify (libc via ctypes). Works for sysfs attributes written by tools like brightnessctl.
+	"""
+	IN_MODIFY = 0x2
+	IN_NONBLOCK = os.O_NONBLOCK
+	IN_CLOEXEC = os.O_CLOEXEC
+
+	def __init__(self, paths: List[str]) -> None:
+		import ctypes
+
+		libc = ctypes.CDLL(None, use_errno=True)
+		self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+		for path in paths:
+			if libc.inotify_add_watch(self.fd, path.encode(), self.IN_MODIFY) < 0:
+				os.close(self.fd)
+				raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+		self.alive = True
+
+	def fileno(self) -> int:
+		return self.fd
+
+	def read(self) -> bool:
+		changed = False
+
+		while True:
+			try:
+				changed = len(os.read(self.fd, 4096)) > 0 or changed
+			except (BlockingIOError, InterruptedError):
+				break
+
+		return changed
+
+	def close(self) -> None:
+		os.close(self.fd)
+
+
+class StatusModule(ABC):
+	"""
+	Base of the bar modules.
+	poll_interval - seconds between re-renders while the event source works (0 - every tick),
+	fallback_interval - the same when there is no event source.
+	"""
+	name = ""
+	poll_interval: float = 0
+	fallback_interval: float = 0
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		self.ctx = ctx
+		self.monitor = None
+
+	@abstractmethod
+	def render(self) -> Optional[dict]: ...
+
+	def start_events(self) -> None:
+		"""
+		Starts the event source. Called only in the resident mode.
+		"""
+
+	def events(self):
+		return self.monitor if self.monitor is not None and self.monitor.alive else None
+
+	def handle_events(self) -> bool:
+		return self.monitor.read()
+
+	def current_interval(self) -> float:
+		return self.poll_interval if self.events() is not None else self.fallback_interval
+
+	def click(self) -> None:
+		pass
+
+	def close(self) -> None:
+		if self.monitor is not None:
+			self.monitor.close()
+			self.monitor = None
+
+	@staticmethod
+	def notify(*args: str) -> None:
+		try:
+			subprocess.Popen(["notify-send", *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		except OSError:
+			pass
+
+	@staticmethod
+	def run(command: List[str]) -> Optional[str]:
+		try:
+			return subprocess.run(command, capture_output=True, text=True, timeout=2).stdout.strip()
+		except (OSError, subprocess.SubprocessError):
+			return None
+
+
+class CpuModule(StatusModule):
+	name = "cpu"
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		self.sampler = CpuSampler(state_file=ctx.state_file("cpu"))
+
+	def render(self) -> Optional[dict]:
+		return get_cpu_info(
+			label_mode=self.ctx.cpu_label_mode,
+			sampler=self.sampler,
+			facts=self.ctx.facts,
+			history=self.ctx.history,
+			processes=self.ctx.top_processes()
+		)
+
+	def click(self) -> None:
+		self.ctx.toggle_label_mode(self.name)
+
+
+class RamModule(StatusModule):
+	name = "ram"
+
+	def render(self) -> Optional[dict]:
+		return get_ram_info(facts=self.ctx.facts, history=self.ctx.history, processes=self.ctx.top_processes())
+
+
+class GpuModule(StatusModule):
+	name = "gpu"
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		self.backend = GpuBackend(sysfs_root=ctx.sysfs_root, devices=ctx.facts.gpus)
+
+	def render(self) -> Optional[dict]:
+		return get_gpu_info(
+			label_mode=self.ctx.gpu_label_mode,
+			backend=self.backend,
+			history=self.ctx.history,
+			processes=self.ctx.top_processes()
+		)
+
+	def click(self) -> None:
+		self.ctx.toggle_label_mode(self.name)
+
+
+class DiskModule(StatusModule):
+	name = "disk"
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		self.sampler = DiskSampler(state_file=ctx.state_file(self.name), sysfs_root=ctx.sysfs_root)
+
+	def render(self) -> Optional[dict]:
+		return get_disk_info(sampler=self.sampler, history=self.ctx.history)
+
+
+class BandwidthModule(StatusModule):
+	name = "bandwidth"
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		self.sampler = NetSampler(state_file=ctx.state_file(self.name))
+
+	def render(self) -> Optional[dict]:
+		return get_bandwidth_info(sampler=self.sampler, history=self.ctx.history)
+
+
+class BatteryModule(StatusModule):
+	"""
+	Reads /sys/class/power_supply directly. Charger and status changes arrive as uevents,
+	the charge itself is re-read every 30 seconds (not every battery sends uevents for it).
+	"""
+	name = "battery"
+	poll_interval = 30
+	fallback_interval = 30
+	LOW_THRESHOLD = 15
+	FLAG_FILE = "/tmp/battery_low.flag"
+	ICONS = ((90, "󰁹 "), (80, "󰂂 "), (70, "󰂁 "), (60, "󰂀 "), (50, "󰁿 "),
+		(40, "󰁾 "), (30, "󰁽 "), (20, "󰁼 "), (15, "󰁺 "), (0, "󰂎 "))
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		root = os.path.join(ctx.sysfs_root, "class", "power_supply")
+		self.path = None
+
+		try:
+			supplies = sorted(os.listdir(root))
+		except OSError:
+			supplies = []
+
+		for supply in supplies:
+			path = os.path.join(root, supply)
+			if read_sysfs(os.path.join(path, "type")) == "Battery" and read_sysfs(os.path.join(path, "scope")) != "Device":
+				self.path = path
+				break
+
+	def start_events(self) -> None:
+		if self.path is None:
+			return
+
+		try:
+			self.monitor = UeventMonitor(("power_supply",))
+		except OSError:
+			self.monitor = None
+
+	def read(self, name: str) -> Optional[int]:
+		return read_sysfs_int(os.path.join(self.path, name))
+
+	def remaining(self, status: str) -> Optional[str]:
+		"""
+		Time to empty or to full from the energy (µWh/µW) or charge (µAh/µA) counters.
+		"""
+		for now_name, full_name, rate_name in (("energy_now", "energy_full", "power_now"), ("charge_now", "charge_full", "current_now")):
+			now, full, rate = self.read(now_name), self.read(full_name), self.read(rate_name)
+			if now is None or full is None or not rate:
+				continue
+
+			hours = (full - now) / abs(rate) if status == "Charging" else now / abs(rate)
+			return f"{int(hours)}h {int(hours * 60) % 60:02d}m"
+
+		return None
+
+	def notify_low(self, charge: int, status: str) -> None:
+		if status == "Charging" or charge > self.LOW_THRESHOLD:
+			if os.path.exists(self.FLAG_FILE):
+				os.remove(self.FLAG_FILE)
+			return
+
+		if not os.path.exists(self.FLAG_FILE):
+			self.notify("Low battery charge", f"The battery charge level is {charge}%, connect the charger.", "-u", "critical")
+			open(self.FLAG_FILE, "w").close()
+
+	def render(self) -> Optional[dict]:
+		if self.path is None:
+			return None
+
+		charge = self.read("capacity")
+		status = read_sysfs(os.path.join(self.path, "status")) or "Unknown"
+		if charge is None:
+			return None
+
+		critical = False
+		if status == "Charging":
+			icon = "󰂋 "
+		elif status == "Full":
+			icon = "󰁹 "
+		else:
+			critical = charge <= self.LOW_THRESHOLD
+			icon = next(icon for threshold, icon in self.ICONS if charge >= threshold)
+
+		self.notify_low(charge, status)
+		tooltip = [f"{icon}Charge: {charge}%", f"Status: {status}"]
+		remaining = self.remaining(status) if status in ("Charging", "Discharging") else None
+		if remaining is not None:
+			tooltip.append(f"Time to {'full' if status == 'Charging' else 'empty'}: {remaining}")
+
+		return {'text': f"{icon}{charge}%", 'tooltip': "\n".join(tooltip), 'critical': critical}
+
+	def click(self) -> None:
+		status = read_sysfs(os.path.join(self.path, "status")) if self.path is not None else None
+		remaining = self.remaining(status) if status is not None else None
+		self.notify("Battery Status", f"Remaining time: {remaining or 'data is being calculated or unavailable.'}")
+
+
+class BrightnessModule(StatusModule):
+	"""
+	Reads /sys/class/backlight directly. Writes to the brightness file (brightnessctl) arrive through inotify,
+	changes made by the firmware are caught by a cheap re-read every few seconds.
+	"""
+	name = "brightness"
+	poll_interval = 10
+	ICONS = ((100, ""), (90, ""), (80, ""), (70, ""), (60, ""), (51, ""),
+		(50, ""), (40, ""), (30, ""), (10, ""), (1, ""), (0, ""))
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		root = os.path.join(ctx.sysfs_root, "class", "backlight")
+		self.path = None
+
+		try:
+			devices = sorted(os.listdir(root))
+		except OSError:
+			devices = []
+
+		if len(devices) > 0 and read_sysfs(os.path.join(root, devices[0], "device", "enabled")) != "disabled":
+			self.path = os.path.join(root, devices[0])
+
+	def start_events(self) -> None:
+		if self.path is None:
+			return
+
+		try:
+			self.monitor = InotifyMonitor([os.path.join(self.path, "brightness")])
+		except OSError:
+			self.monitor = None
+
+	def render(self) -> Optional[dict]:
+		if self.path is None:
+			return None
+
+		brightness = read_sysfs_int(os.path.join(self.path, "brightness"))
+		maximum = read_sysfs_int(os.path.join(self.path, "max_brightness"))
+		if brightness is None or not maximum:
+			return None
+
+		value = round(brightness * 100 / maximum)
+		icon = next(icon for threshold, icon in self.ICONS if value >= threshold)
+		return {'text': f"{icon} {value}%", 'tooltip': f"{icon} Brightness: {value}%", 'critical': False}
+
+
+class VolumeModule(StatusModule):
+	"""
+	Volume of the default sink. pactl is only called when "pactl subscribe" reports a change.
+	"""
+	name = "volume"
+	poll_interval = 300
+	target = "sink"
+	EVENTS = rb"on '?(sink|server)'? #"
+
+	def start_events(self) -> None:
+		try:
+			self.monitor = CommandMonitor(["pactl", "subscribe"], self.EVENTS)
+		except OSError:
+			self.monitor = None
+
+	def get_volume(self) -> Optional[Tuple[int, bool]]:
+		default = f"@DEFAULT_{self.target.upper()}@"
+		volume = self.run(["pactl", f"get-{self.target}-volume", default])
+		mute = self.run(["pactl", f"get-{self.target}-mute", default])
+
+		match = re.search(r"(\d+)%", volume or "")
+		if match is None:
+			return None
+
+		return int(match.group(1)), (mute or "").endswith("yes")
+
+	def icon(self, volume: int, muted: bool) -> str:
+		if muted:
+			return "  "
+		elif volume <= 30:
+			return " "
+		elif volume <= 60:
+			return " "
+		return "  "
+
+	def render(self) -> Optional[dict]:
+		state = self.get_volume()
+		if state is None:
+			return None
+
+		volume, muted = state
+		icon = self.icon(volume, muted)
+		return {
+			'text': f"{icon}{volume}%",
+			'tooltip': f"{icon}{'Muted' if muted else 'Volume'}: {volume}%",
+			'critical': muted
+		}
+
+
+class MicrophoneModule(VolumeModule):
+	name = "microphone"
+	target = "source"
+	EVENTS = rb"on '?(source|server)'? #"
+
+	def icon(self, volume: int, muted: bool) -> str:
+		return "  " if muted else " "
+
+
+class NetworkModule(StatusModule):
+	"""
+	Link state and Wi-Fi signal come from /sys/class/net and /proc/net/wireless on every tick.
+	nmcli is only asked for the SSID and security when "nmcli monitor" reports a change.
+	"""
+	name = "network"
+	DETAILS_INTERVAL = 30
+	SIGNAL_ICONS = ("󰤟 ", "󰤢 ", "󰤥 ", "󰤨 ")
+	SECURED_SIGNAL_ICONS = ("󰤡 ", "󰤤 ", "󰤧 ", "󰤪 ")
+
+	def __init__(self, ctx: ModuleContext) -> None:
+		super().__init__(ctx)
+		self.details: Optional[Tuple[str, bool]] = None # (SSID, защищённая сеть)
+		self.details_time = 0.0
+
+	def start_events(self) -> None:
+		try:
+			self.monitor = CommandMonitor(["nmcli", "monitor"])
+		except OSError:
+			self.monitor = None
+
+	def handle_events(self) -> bool:
+		changed = super().handle_events()
+		if changed:
+			self.details_time = 0
+		return changed
+
+	def interfaces(self) -> List[Tuple[str, bool]]:
+		"""
+		Returns the connected physical interfaces and whether they are wireless.
+		"""
+		root = os.path.join(self.ctx.sysfs_root, "class", "net")
+		result = []
+
+		try:
+			names = sorted(os.listdir(root))
+		except OSError:
+			return result
+
+		for name in names:
+			path = os.path.join(root, name)
+			if not os.path.exists(os.path.join(path, "device")) or read_sysfs(os.path.join(path, "operstate")) != "up":
+				continue
+
+			result.append((name, os.path.exists(os.path.join(path, "wireless")) or os.path.exists(os.path.join(path, "phy80211"))))
+
+		return result
+
+	@staticmethod
+	def signal(interface: str) -> Optional[int]:
+		try:
+			with open("/proc/net/wireless", "r") as f:
+				for line in f:
+					name, _, values = line.partition(":")
+					if name.strip() == interface:
+						return min(int(float(values.split()[1]) * 100 / 70), 100)
+		except (OSError, ValueError, IndexError):
+			pass
+
+		return None
+
+	def get_details(self) -> Optional[Tuple[str, bool]]:
+		if time.monotonic() - self.details_time < self.DETAILS_INTERVAL:
+			return self.details
+
+		self.details_time = time.monotonic()
+		self.details = None
+		output = self.run(["nmcli", "--terse", "--fields", "IN-USE,SIGNAL,SECURITY,SSID", "device", "wifi", "list", "--rescan", "no"])
+
+		for line in (output or "").splitlines():
+			if line.startswith("*"):
+				_, _, security, ssid = line.split(":", 3)
+				self.details = (ssid, "WPA" in security or "WEP" in security)
+				break
+
+		return self.details
+
+	def render(self) -> Optional[dict]:
+		interfaces = self.interfaces()
+		ethernet = next((name for name, wireless in interfaces if not wireless), None)
+		wifi = next((name for name, wireless in interfaces if wireless), None)
+
+		if ethernet is not None:
+			return {'text': "󰈀", 'tooltip': f"󰈀 Ethernet: {ethernet}", 'critical': False}
+
+		if wifi is not None:
+			signal = self.signal(wifi)
+			details = self.get_details()
+			level = min((signal or 100) // 25, 3)
+			icon = (self.SECURED_SIGNAL_ICONS if details is not None and details[1] else self.SIGNAL_ICONS)[level]
+			ssid = details[0] if details is not None else wifi
+			return {
+				'text': icon,
+				'tooltip': f"{icon}Wi-Fi: {ssid}\nSignal: {'N/A' if signal is None else signal}%",
+				'critical': False
+			}
+
+		return {'text': " ", 'tooltip': " Disconnected", 'critical': True}
+
+
+class VpnModule(StatusModule):
+	"""
+	Checks the pid files of the rofi VPN menu, so no process is started.
+	"""
+	name = "vpn"
+	PID_DIR = os.path.expanduser("~/.cache/rofivpnmenu/pids")
+
+	def connected(self) -> List[str]:
+		result = []
+
+		try:
+			files = sorted(f for f in os.listdir(self.PID_DIR) if f.endswith(".pid"))
+		except OSError:
+			return result
+
+		for file in files:
+			pid = read_sysfs_int(os.path.join(self.PID_DIR, file))
+			try:
+				if pid is not None:
+					os.kill(pid, 0)
+					result.append(file[:-4])
+			except ProcessLookupError:
+				continue
+			except PermissionError:
+				result.append(file[:-4])
+
+		return result
+
+	def render(self) -> Optional[dict]:
+		connected = self.connected()
+		return {
+			'text': "󰯄 ",
+			'tooltip': f"󰯄 VPN: {', '.join(connected) if len(connected) > 0 else 'Disconnected'}",
+			'critical': len(connected) < 1
+		}
+
+
+class DndModule(StatusModule):
+	"""
+	Do not disturb state of dunst. It is re-read when dunst announces a property change on D-Bus.
+	"""
+	name = "dnd"
+	poll_interval = 60
+	fallback_interval = 10
+
+	def start_events(self) -> None:
+		try:
+			self.monitor = CommandMonitor([
+				"dbus-monitor", "--session",
+				"type='signal',interface='org.freedesktop.DBus.Properties',member='PropertiesChanged',path='/org/freedesktop/Notifications'"
+			], rb"paused")
+		except OSError:
+			self.monitor = None
+
+	def render(self) -> Optional[dict]:
+		paused = self.run(["dunstctl", "is-paused"])
+		if paused is None:
+			return None
+
+		if paused == "true":
+			return {'text': "󱏧 ", 'tooltip': "Notifications are paused", 'critical': True}
+		return {'text': "󱅫 ", 'tooltip': "Notifications are enabled", 'critical': False}
+
+
+MODULES: Dict[str, type] = {
+	module.name: module
+	for module in (
+		CpuModule, RamModule, GpuModule, DiskModule, BandwidthModule, BatteryModule, BrightnessModule,
+		VolumeModule, MicrophoneModule, NetworkModule, VpnModule, DndModule
+	)
+}
+
+
+# ┏━┓╺┳╸┏━┓┏━╸┏━┓┏┳┓
+# ┗━┓ ┃ ┣┳┛┣╸ ┣━┫┃┃┃
+# ┗━┛ ╹ ╹┗╸┗━╸╹ ╹╹ ╹
+# Постоянный режим: один процесс на все модули всех баров.
+# Первый запущенный "--stream" становится сервером на абстрактном unix-сокете,
+# остальные подключаются к нему и только печатают готовые строки.
+# Новая строка печатается только когда отрисованный текст модуля изменился.
+
+SOCKET_ADDRESS = f"\0meowrch-system-info-{os.getuid()}"
+
+
+@dataclass
+class Subscriber:
+	module: str
+	session_type: Optional[str]
+	normal_color: str
+	critical_color: str
+	conn: Optional[socket.socket] = None # None - stdout самого сервера
+	last_line: Optional[str] = None
+	last_text: Optional[tuple] = None
+	sent_at: float = 0
+
+
+##==> /proc/<pid>/comm обрезается ядром до 15 символов (TASK_COMM_LEN - 1)
+COMM_LENGTH = 15
+SCREEN_LOCKERS = {name[:COMM_LENGTH] for name in ("swaylock", "hyprlock", "i3lock", "betterlockscreen")}
+
+
+@dataclass
+class PowerState:
+	"""
+	Power source and screen lock, which decide how often the resident mode wakes up.
+	Both are re-read no more than once per check_interval seconds.
+	"""
+	sysfs_root: str = "/sys"
+	proc_root: str = "/proc"
+	check_interval: float = 10
+	on_battery: bool = False
+	locked: bool = False
+	checked_at: float = -math.inf
+
+	def update(self) -> None:
+		now = time.monotonic()
+		if now - self.checked_at < self.check_interval:
+			return
+
+		self.checked_at = now
+		self.on_battery = self._on_battery()
+		self.locked = self._locked()
+
+	def _on_battery(self) -> bool:
+		root = os.path.join(self.sysfs_root, "class", "power_supply")
+
+		try:
+			supplies = os.listdir(root)
+		except OSError:
+			return False
+
+		discharging = False
+		for supply in supplies:
+			kind = read_sysfs(os.path.join(root, supply, "type"))
+			if kind in ("Mains", "USB") and read_sysfs(os.path.join(root, supply, "online")) == "1":
+				return False
+			if kind == "Battery" and read_sysfs(os.path.join(root, supply, "status")) == "Discharging":
+				discharging = True
+
+		return discharging
+
+	def _locked(self) -> bool:
+		try:
+			with os.scandir(self.proc_root) as entries:
+				for entry in entries:
+					if entry.name.isdigit() and read_sysfs(os.path.join(entry.path, "comm")) in SCREEN_LOCKERS:
+						return True
+		except OSError:
+			pass
+
+		return False
+
+
+@dataclass
+class SystemInfoStream:
+	ctx: ModuleContext
+	subscribers: List[Subscriber] = field(default_factory=list)
+	modules: Dict[str, StatusModule] = field(default_factory=dict)
+	cache: Dict[str, Optional[dict]] = field(default_factory=dict)
+	next_render: Dict[str, float] = field(default_factory=dict)
+	stable: Dict[str, int] = field(default_factory=dict)
+	selector: selectors.BaseSelector = field(default_factory=selectors.DefaultSelector)
+	power: Optional[PowerState] = None
+
+	BATTERY_FACTOR = 2 # От батареи опрашиваем вдвое реже
+	LOCKED_FACTOR = 5 # Экран заблокирован - бар никто не видит
+	STABLE_RENDERS = 3 # После стольких одинаковых отрисовок подряд интервал начинает расти
+	MAX_STABLE_FACTOR = 4
+	URGENT_FACTOR = 0.5 # Значение близко к критическому или критическое
+	TOOLTIP_REFRESH = 10 # Изменение только подсказки отправляется не чаще раза в столько секунд
+
+	def __post_init__(self) -> None:
+		if self.power is None:
+			self.power = PowerState(sysfs_root=self.ctx.sysfs_root)
+
+	def interval(self, name: str) -> float:
+		"""
+		Seconds until the next render of the module, adapted to the power source, the screen lock,
+		how long the text has not changed and how close the value is to critical.
+		"""
+		module = self.modules[name]
+		info = self.cache.get(name) or {}
+		base = module.current_interval() or self.ctx.interval
+
+		if info.get('critical') or info.get('warning'):
+			factor = self.URGENT_FACTOR
+		else:
+			stable = self.stable.get(name, 0)
+			factor = min(2 ** max(stable - self.STABLE_RENDERS + 1, 0), self.MAX_STABLE_FACTOR)
+			if self.power.on_battery:
+				factor *= self.BATTERY_FACTOR
+
+		if self.power.locked:
+			factor = max(factor, 1) * self.LOCKED_FACTOR
+
+		return base * factor
+
+	def render(self, name: str) -> None:
+		module = self.modules[name]
+		previous = self.cache.get(name)
+
+		try:
+			self.cache[name] = module.render()
+		except Exception:
+			self.cache[name] = None
+
+		text = lambda info: None if info is None else (info['text'], info['critical'])
+		if name in self.stable and text(previous) == text(self.cache[name]):
+			self.stable[name] += 1
+		else:
+			self.stable[name] = 0
+
+		self.next_render[name] = time.monotonic() + self.interval(name)
+
+		for sub in list(self.subscribers):
+			if sub.module == name:
+				self.send(sub)
+
+	def next_wakeup(self) -> float:
+		return min(self.next_render.values(), default=time.monotonic() + self.ctx.interval)
+
+	def tick(self) -> None:
+		"""
+		Renders every module that is due and sends the changed lines to its subscribers.
+		"""
+		self.power.update()
+
+		# Небольшой запас, чтобы близкие по времени модули отрисовывались за одно пробуждение
+		now = time.monotonic() + min(self.ctx.interval / 4, 0.5)
+
+		for name in list(self.modules):
+			if self.next_render.get(name, 0) <= now:
+				self.render(name)
+
+	def send(self, sub: Subscriber) -> None:
+		info = self.cache.get(sub.module)
+		line = format_output(info, sub.session_type, sub.normal_color, sub.critical_color)
+		text = None if info is None else (info['text'], info['critical'])
+		now = time.monotonic()
+
+		##==> Бар перерисовывается только когда строка изменилась
+		###########################################
+		if line == sub.last_line:
+			return
+		if sub.last_line is not None and text == sub.last_text and now - sub.sent_at < self.TOOLTIP_REFRESH:
+			return
+
+		sub.last_line, sub.last_text, sub.sent_at = line, text, now
+
+		if sub.conn is None:
+			if not print_line(line):
+				self.unsubscribe(sub)
+			return
+
+		try:
+			sub.conn.sendall((line + "\n").encode())
+		except OSError:
+			self.unsubscribe(sub)
+
+	def subscribe(self, sub: Subscriber) -> None:
+		self.subscribers.append(sub)
+
+		if sub.module not in self.modules:
+			module = MODULES[sub.module](self.ctx)
+			module.start_events()
+			self.modules[sub.module] = module
+
+			if module.events() is not None:
+				self.selector.register(module.events(), selectors.EVENT_READ, sub.module)
+
+			self.render(sub.module)
+		else:
+			self.send(sub)
+
+	def unsubscribe(self, sub: Subscriber) -> None:
+		self.subscribers.remove(sub)
+		if sub.conn is not None:
+			sub.conn.close()
+
+		if any(s.module == sub.module for s in self.subscribers):
+			return
+
+		##==> Модуль больше никому не нужен - останавливаем его источник событий
+		###########################################
+		module = self.modules.pop(sub.module)
+		if module.events() is not None:
+			self.selector.unregister(module.events())
+		module.close()
+		self.cache.pop(sub.module, None)
+		self.next_render.pop(sub.module, None)
+		self.stable.pop(sub.module, None)
+
+	def handle_events(self, name: str) -> None:
+		module = self.modules.get(name)
+		if module is None:
+			return
+
+		monitor = module.events()
+		changed = module.handle_events()
+
+		if module.events() is None:
+			# Источник событий умер - модуль переходит на опрос
+			self.selector.unregister(monitor)
+			module.close()
+			changed = True
+
+		if changed:
+			self.render(name)
+
+	def click(self, name: str) -> None:
+		module = self.modules.get(name)
+		if module is None:
+			return
+
+		module.click()
+		self.render(name)
+
+	def handle_request(self, conn: socket.socket) -> None:
+		try:
+			conn.settimeout(1)
+			request = json.loads(conn.makefile("r").readline())
+			conn.settimeout(None)
+		except (OSError, ValueError):
+			conn.close()
+			return
+
+		if request.get("click") in MODULES:
+			conn.close()
+			self.click(request["click"])
+			return
+
+		if request.get("module") not in MODULES:
+			conn.close()
+			return
+
+		self.subscribe(Subscriber(
+			module=request["module"],
+			session_type=request.get("session_type"),
+			normal_color=request.get("normal_color", "#a6e3a1"),
+			critical_color=request.get("critical_color", "#f38ba8"),
+			conn=conn
+		))
+
+	def serve(self, server: socket.socket, own: Subscriber) -> None:
+		server.listen()
+		self.selector.register(server, selectors.EVENT_READ, None)
+		self.power.update()
+		self.subscribe(own)
+
+		while len(self.subscribers) > 0:
+			# Просыпаемся только к ближайшей отрисовке, а не на каждый фиксированный тик
+			timeout = self.next_wakeup() - time.monotonic()
+			if timeout <= 0:
+				self.tick()
+				continue
+
+			for key, _ in self.selector.select(timeout):
+				if key.data is None:
+					conn, _ = key.fileobj.accept()
+					self.handle_request(conn)
+				else:
+					self.handle_events(key.data)
+
+		for module in self.modules.values():
+			module.close()
+
+
+def print_line(line: str) -> bool:
+	"""
+	Prints a line for the bar. Returns False if nobody reads the output anymore.
+	"""
+	try:
+		print(line, flush=True)
+		return True
+	except OSError:
+		# Бар закрыл вывод: остальное уходит в /dev/null, чтобы и выход не падал на сбросе буфера
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+		return False
+
+
+def send_request(request: dict) -> Optional[socket.socket]:
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+	try:
+		sock.connect(SOCKET_ADDRESS)
+		sock.sendall((json.dumps(request) + "\n").encode())
+		return sock
+	except OSError:
+		sock.close()
+		return None
+
+
+def run_stream(stream: SystemInfoStream, own: Subscriber) -> None:
+	request = {
+		"module": own.module,
+		"session_type": own.session_type,
+		"normal_color": own.normal_color,
+		"critical_color": own.critical_color
+	}
+
+	while True:
+		conn = send_request(request)
+
+		if conn is not None:
+			##==> Клиент: печатаем строки сервера, пока он жив
+			###########################################
+			with conn, conn.makefile("r") as lines:
+				while True:
+					try:
+						line = lines.readline()
+					except ConnectionError:
+						break
+					if not line:
+						break
+
+					# Ошибка записи в stdout - читатель ушёл, переподключаться незачем
+					if not print_line(line.rstrip("\n")):
+						return
+			continue
+
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			server.bind(SOCKET_ADDRESS)
+		except OSError:
+			# Другой процесс только что стал сервером
+			server.close()
+			time.sleep(0.05)
+			continue
+
+		with server:
+			stream.serve(server, own)
+		return
+
+
+if __name__ == "__main__":
+	config_path = os.path.expanduser("~/.cache/meowrch/system-info.ini")
+	state_dir = os.path.expanduser("~/.cache/meowrch")
+	facts_path = os.path.expanduser("~/.cache/meowrch/system-info-hardware.json")
+	history_path = os.path.expanduser("~/.cache/meowrch/system-info-history.bin")
+	SESSION_TYPE = (lambda s: s if s != "$XDG_SESSION_TYPE" else None)(expandvars("$XDG_SESSION_TYPE"))
+
+	parser = argparse.ArgumentParser()
+	for name in MODULES:
+		parser.add_argument(f"--{name}", action="store_true")
+	parser.add_argument("--click",  action="store_true")
+	parser.add_argument("--stream", action="store_true", help="Keep running and print a new line only when the rendered text changes")
+	parser.add_argument("--interval", type=float, default=2, help="Default seconds between re-renders of a module in the --stream mode")
+	parser.add_argument("--history", type=int, default=300, help="Seconds of history shown in the tooltip, 0 to disable")
+	parser.add_argument("--normal-color", default="#a6e3a1")
+	parser.add_argument("--critical-color", default="#f38ba8")
+
+	args = parser.parse_args()
+	module = next((m for m in MODULES if getattr(args, m)), None)
+
+	if module is None:
+		print("Enter one of the arguments:\n" + "\n".join(f"--{name}" for name in MODULES))
+	elif args.click:
+		# Если постоянный процесс запущен, он сам выполнит нажатие и сразу перерисует модуль
+		conn = send_request({"click": module})
+		if conn is not None:
+			conn.close()
+		else:
+			MODULES[module](ModuleContext(config_path=config_path, facts_path=facts_path)).click()
+	elif args.stream:
+		own = Subscriber(
+			module=module,
+			session_type=SESSION_TYPE,
+			normal_color=args.normal_color,
+			critical_color=args.critical_color
+		)
+		try:
+			run_stream(SystemInfoStream(ModuleContext(
+				config_path=config_path,
+				facts_path=facts_path,
+				interval=args.interval,
+				history_seconds=args.history
+			)), own)
+		except KeyboardInterrupt:
+			pass
 	else:
-		print("Enter one of the arguments:\n--cpu to get information about the processor\n--ram to get information about RAM\n--gpu to get information about the graphics card")
+		ctx = ModuleContext(
+			config_path=config_path,
+			facts_path=facts_path,
+			state_dir=state_dir,
+			history_path=history_path,
+			interval=args.interval,
+			history_seconds=args.history
+		)
+		print(format_output(MODULES[module](ctx).render(), SESSION_TYPE, args.normal_color, args.critical_color))
@@ -23,7 +23,7 @@ echo "Starting pre-install..." && sleep 2
 dependencies=(python python-pip)
 for package in "${dependencies[@]}"; do
     if ! pacman -Q $package &> /dev/null; then
-        sudo pacman -S --needed $package
+        sudo pacman -S --needed --noconfirm $package
     fi
 done
 #######################################################
@@ -36,10 +36,11 @@ declare -a packages=(
 	"loguru"
 	"psutil"
 	"gputil"
-	"pyamdgpuinfo"
+	"nvidia-ml-py"
 	"pyyaml"
 	"pillow"
 	"colorama"
+	"numpy"
 )
 
 for package in "${packages[@]}"; do
@@ -51,4 +52,4 @@ done
 
 ##==> Building the system
 #######################################################
-python Builder/install.py
+python Builder/install.py "$@"
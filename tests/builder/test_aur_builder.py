@@ -0,0 +1,52 @@
+from managers.aur_builder import AurBuilder
+from managers.package_manager import PackageManager
+from utils.schemes import AurHelper, AurPackage
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.installed = {}
+
+    def is_installed(self, package: str) -> bool:
+        return package in self.installed
+
+
+def test_requested_packages_are_not_installed_as_deps(monkeypatch, tmp_path):
+    database = FakeDatabase()
+    transactions = []
+    repo_transactions = []
+
+    def install_package_files(files, as_deps=False):
+        if len(files) < 1:
+            return True
+
+        transactions.append((sorted(AurBuilder.package_name(f) for f in files), as_deps))
+        database.installed.update((AurBuilder.package_name(f), as_deps) for f in files)
+        return True
+
+    monkeypatch.setattr(PackageManager, "database", database)
+    monkeypatch.setattr(
+        PackageManager, "install_packages",
+        staticmethod(lambda packages, aur=None, as_deps=False: repo_transactions.append((packages, as_deps)) or []),
+    )
+    monkeypatch.setattr(PackageManager, "install_package_files", staticmethod(install_package_files))
+
+    # app -> lib-explicit (запрошен явно) -> lib-dep
+    aur = {
+        "app": AurPackage(name="app", base="app", version="1-1", depends=["lib-explicit"]),
+        "lib-explicit": AurPackage(name="lib-explicit", base="lib-explicit", version="1-1", depends=["lib-dep"]),
+        "lib-dep": AurPackage(name="lib-dep", base="lib-dep", version="1-1"),
+    }
+    builder = AurBuilder(AurHelper.YAY, jobs=2, build_dir=str(tmp_path))
+    # makedepends тоже попадают в зависимости из репозиториев
+    monkeypatch.setattr(builder, "resolve", lambda packages: (aur, ["cmake", "qt6-base"]))
+    monkeypatch.setattr(builder, "build", lambda base: [str(tmp_path / f"{base}-1-1-x86_64.pkg.tar.zst")])
+
+    assert builder.install(["app", "lib-explicit"]) == []
+    assert repo_transactions == [(["cmake", "qt6-base"], True)]
+    assert transactions == [
+        (["lib-dep"], True),
+        (["lib-explicit"], False),
+        (["app"], False),
+    ]
+    assert database.installed == {"lib-dep": True, "lib-explicit": False, "app": False}
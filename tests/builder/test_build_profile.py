@@ -0,0 +1,100 @@
+import json
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.build_profile import BuildProfile
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    commands = []
+    monkeypatch.setattr(subprocess, "run", lambda command, **kwargs: commands.append(command))
+    return commands
+
+
+@pytest.fixture
+def profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(BuildProfile, "available_memory", staticmethod(lambda: 16 * 1024 ** 3))
+
+    profile = BuildProfile(
+        enabled=True,
+        config_path=str(tmp_path / "makepkg.conf"),
+        build_dir=str(tmp_path / "build"),
+        times_path=str(tmp_path / "cache" / "build-times.json"),
+    )
+    profile.jobs = 4
+    return profile
+
+
+def test_apply_and_revert(profile, commands, monkeypatch):
+    monkeypatch.setattr(shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(BuildProfile, "is_tmpfs", staticmethod(lambda path: False))
+
+    with profile:
+        with open(profile.config_path) as file:
+            assert file.read() == (
+                "source /etc/makepkg.conf\n"
+                'MAKEFLAGS="-j4 -l4"\n'
+                "PKGEXT='.pkg.tar'\n"
+                'BUILDENV=("${BUILDENV[@]/\\!ccache/ccache}")\n'
+                f'BUILDDIR="{profile.build_dir}"\n'
+            )
+        assert profile.makepkg_args() == ["--config", profile.config_path]
+        assert profile.helper_args() == ["--mflags", f"--config {profile.config_path}"]
+        assert profile.env()["MAKEFLAGS"] == "-j4 -l4"
+        assert commands == [
+            ["sudo", "mount", "-t", "tmpfs", "-o", "size=8G,mode=1777", "tmpfs", profile.build_dir],
+        ]
+
+    assert commands[-1] == ["sudo", "umount", profile.build_dir]
+    assert not profile.mounted and not profile.applied
+    assert profile.makepkg_args() == []
+    with pytest.raises(FileNotFoundError):
+        open(profile.config_path)
+
+
+def test_apply_without_ccache_and_ram(profile, commands, monkeypatch):
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    monkeypatch.setattr(BuildProfile, "available_memory", staticmethod(lambda: 4 * 1024 ** 3))
+
+    profile.apply()
+
+    with open(profile.config_path) as file:
+        assert file.read() == "source /etc/makepkg.conf\nMAKEFLAGS=\"-j4 -l4\"\nPKGEXT='.pkg.tar'\n"
+    assert commands == []
+
+    profile.revert()
+    assert commands == []
+
+
+def test_disabled_profile_changes_nothing(profile):
+    profile.enabled = False
+    profile.apply()
+
+    assert not profile.applied
+    assert profile.makepkg_args() == [] and profile.helper_args() == []
+
+
+def test_measure_keeps_every_parallel_build(profile):
+    packages = [f"package-{i}" for i in range(32)]
+
+    def build(package):
+        with profile.measure(package):
+            pass
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(build, packages))
+
+    with open(profile.times_path) as file:
+        times = json.load(file)
+    assert sorted(times) == sorted(packages)
+    assert all(list(times[p]) == ["default"] for p in packages)
+
+    profile.applied = True
+    build("package-0")
+
+    with open(profile.times_path) as file:
+        assert sorted(json.load(file)["package-0"]) == ["default", "profile"]
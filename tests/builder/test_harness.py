@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+HARNESS = Path(__file__).resolve().parents[2] / "Builder" / "harness.py"
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="the harness refuses to run as root")
+def test_stubbed_installation(tmp_path):
+    # Установщик запускается в дочернем процессе, и ему нужны все его зависимости
+    pytest.importorskip("inquirer")
+    pytest.importorskip("colorama")
+    results = tmp_path / "results.json"
+
+    process = subprocess.run(
+        [sys.executable, str(HARNESS), "--json", str(results)],
+        cwd=HARNESS.parents[1], capture_output=True, text=True, timeout=300,
+    )
+
+    assert process.returncode == 0, process.stderr
+    [result] = json.loads(results.read_text())
+    assert result["returncode"] == 0
+    assert result["failed_packages"] == []
+    assert result["stages"] and all(info["result"] in ("done", "skipped") for info in result["stages"].values())
+    assert any(info["seconds"] is not None for info in result["stages"].values())
+    assert result["subprocesses"] == sum(result["subprocesses_per_stage"].values()) > 0
+    assert set(result["subprocesses_per_stage"]) - {"main"} <= set(result["stages"])
+
+    output = process.stderr
+    assert "Stage                    Result        Time  Processes" in output
+    for name, info in result["stages"].items():
+        seconds = f"{info['seconds']:.2f}s" if info["seconds"] is not None else "-"
+        processes = result["subprocesses_per_stage"].get(name, 0)
+        assert f"{name:<24} {info['result']:<8} {seconds:>9} {processes:>10}" in output
+    assert f"Subprocesses: {result['subprocesses']}, outside of stages:" in output
+    assert not os.path.exists(result["directory"])
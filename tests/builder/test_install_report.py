@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from utils.install_report import InstallReport
+from utils.schemes import PackageAttempt
+
+
+MIB = 1024 ** 2
+
+# "pacman -S" с VerbosePkgLists: новый пакет, обновление (с колонкой Old Version) и пакет из кэша
+VERBOSE_OUTPUT = """resolving dependencies...
+looking for conflicting packages...
+
+Package (4)            Old Version  New Version  Net Change  Download Size
+
+extra/firefox                       131.0.3-1    242.37 MiB      71.32 MiB
+extra/kitty            0.36.3-1     0.36.4-1      -0.12 MiB       8.92 MiB
+extra/libc++                        19.1.1-1       5.10 MiB     512.00 KiB
+core/bash              5.2.032-1    5.2.037-1      0.01 MiB
+
+Total Download Size:    80.74 MiB
+Total Installed Size:  300.48 MiB
+Net Upgrade Size:      247.36 MiB
+
+:: Proceed with installation? [Y/n]
+"""
+
+
+def test_parse_downloads():
+    total, packages = InstallReport.parse_downloads(VERBOSE_OUTPUT)
+
+    assert total == int(80.74 * MIB)
+    assert packages == {"firefox": int(71.32 * MIB), "kitty": int(8.92 * MIB), "libc++": 512 * 1024}
+
+
+def test_parse_downloads_without_verbose_lists():
+    output = "Packages (2) firefox-131.0.3-1  kitty-0.36.4-1\n\nTotal Download Size:   80.24 MiB\n"
+
+    assert InstallReport.parse_downloads(output) == (int(80.24 * MIB), {})
+    assert InstallReport.parse_downloads("warning: bash-5.2.037-1 is up to date -- skipping\n") == (0, {})
+
+
+def test_attempt_records_failures_and_drops_the_output():
+    report = InstallReport()
+
+    with report.attempt(["firefox", "kitty"], "pacman") as attempt:
+        attempt.output = VERBOSE_OUTPUT
+        attempt.success = True
+
+    with pytest.raises(RuntimeError):
+        with report.attempt(["hyprland-git"], "yay"):
+            raise RuntimeError("build failed")
+
+    first, second = report.attempts
+    assert first.success and first.download_bytes == int(80.74 * MIB) and first.output == ""
+    assert first.package_bytes["firefox"] == int(71.32 * MIB)
+    assert not second.success and second.end >= second.start
+
+
+def test_packages_share_the_transaction_time():
+    report = InstallReport()
+    report.attempts = [
+        PackageAttempt(packages=["firefox", "kitty", "bash", "fish"], method="pacman", start=0, end=8,
+                       package_bytes={"firefox": 100}),
+        PackageAttempt(packages=["kitty"], method="pacman", start=10, end=11, success=True),
+        PackageAttempt(packages=["hyprland-git"], method="yay", start=11, end=71),
+    ]
+    report.outcome(["kitty"], "installed")
+    report.outcome(["ttf-missing"], "not found")
+
+    packages = report.packages()
+
+    assert packages["firefox"] == {
+        "attempts": 1, "seconds": 2.0, "download_bytes": 100, "methods": ["pacman"], "outcome": "failed",
+    }
+    assert packages["kitty"]["attempts"] == 2 and packages["kitty"]["seconds"] == 3.0
+    assert packages["kitty"]["outcome"] == "installed"
+    assert packages["hyprland-git"]["seconds"] == 60.0 and packages["hyprland-git"]["methods"] == ["yay"]
+    assert packages["ttf-missing"] == {
+        "attempts": 0, "seconds": 0.0, "download_bytes": 0, "methods": [], "outcome": "not found",
+    }
+
+
+def test_write(monkeypatch, tmp_path):
+    monkeypatch.setattr(InstallReport, "release", staticmethod(lambda: "v3.1.0-4-gabcdef0"))
+    report = InstallReport()
+    report.stage("pacman", "done", 100.0, 130.5)
+    report.stage("grub", "skipped", None, None)
+
+    with report.attempt(["firefox", "kitty"], "pacman") as attempt:
+        attempt.output = VERBOSE_OUTPUT
+        attempt.success = True
+
+    path = str(tmp_path / "install-report.json")
+    written = report.write(path, options={"aur_helper": "yay"})
+
+    with open(path) as file:
+        saved = json.load(file)
+
+    assert saved == json.loads(json.dumps(written))
+    assert saved["release"] == "v3.1.0-4-gabcdef0" and saved["options"] == {"aur_helper": "yay"}
+    assert saved["stages"]["pacman"]["seconds"] == 30.5 and saved["stages"]["grub"]["seconds"] is None
+    assert saved["download_bytes"] == int(80.74 * MIB)
+    assert "output" not in saved["transactions"][0]
+    assert sorted(saved["packages"]) == ["firefox", "kitty"]
+    assert not (tmp_path / "install-report.json.tmp").exists()
@@ -0,0 +1,158 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from utils.journal import InstallJournal
+from utils.schemes import AurHelper, BuildOptions, Stage
+
+
+OPTIONS = BuildOptions(
+    make_backup=False,
+    install_bspwm=False,
+    install_hyprland=True,
+    aur_helper=AurHelper.YAY,
+    enable_multilib=True,
+    update_arch_database=True,
+    auto_update_packages=False,
+    install_drivers=False,
+    intel_driver=False,
+    nvidia_driver=False,
+    amd_driver=False,
+    ff_darkreader=True,
+    ff_ublock=True,
+    ff_twp=False,
+    ff_unpaywall=False,
+    ff_tampermonkey=False,
+)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "install-journal.json")
+
+
+def test_round_trip(path):
+    journal = InstallJournal(path)
+    assert not journal.unfinished() and journal.saved_options() is None
+
+    journal.start(OPTIONS, ["obs-studio", "discord"])
+    journal.record_stage("pacman", "done")
+    journal.record_stage("aur", "failed")
+    journal.record_packages("pacman", ["kitty", "fish"], ["hyprland-git"])
+
+    loaded = InstallJournal(path)
+    assert loaded.unfinished()
+    assert loaded.saved_options() == OPTIONS
+    assert loaded.saved_custom() == ["discord", "obs-studio"]
+    assert loaded.completed() == ["pacman"]
+    assert loaded.packages("pacman", "installed") == ["kitty", "fish"]
+    assert loaded.packages("pacman", "failed") == ["hyprland-git"]
+
+
+def test_same_answers_continue(path):
+    InstallJournal(path).start(OPTIONS, ["discord"])
+    journal = InstallJournal(path)
+    journal.record_stage("pacman", "done")
+
+    journal = InstallJournal(path)
+    journal.start(OPTIONS, ["discord"])
+    assert journal.completed() == ["pacman"]
+
+
+@pytest.mark.parametrize("options, custom", [
+    (replace(OPTIONS, aur_helper=AurHelper.PARU), ["discord"]),
+    (replace(OPTIONS, fast_builds=True), ["discord"]),
+    (OPTIONS, ["discord", "obs-studio"]),
+])
+def test_other_answers_reset(path, options, custom):
+    assert InstallJournal.options_key(options, custom) != InstallJournal.options_key(OPTIONS, ["discord"])
+
+    journal = InstallJournal(path)
+    journal.start(OPTIONS, ["discord"])
+    journal.record_stage("pacman", "done")
+    journal.record_packages("aur", [], ["yay"])
+
+    journal = InstallJournal(path)
+    journal.start(options, custom)
+    assert journal.completed() == []
+    assert journal.packages("aur", "failed") == []
+    assert InstallJournal(path).saved_options() == options
+
+
+def test_finished_installation_starts_again(path):
+    journal = InstallJournal(path)
+    journal.start(OPTIONS, [])
+    journal.record_stage("pacman", "done")
+    journal.finish()
+
+    journal = InstallJournal(path)
+    assert not journal.unfinished() and journal.saved_options() is None
+
+    journal.start(OPTIONS, [])
+    assert journal.completed() == []
+
+
+def test_forget_stages(path):
+    journal = InstallJournal(path)
+    journal.start(OPTIONS, [])
+    for name in ("pacman", "aur", "dotfiles"):
+        journal.record_stage(name, "done")
+
+    journal.forget_stages(["aur", "dotfiles", "never-recorded"])
+
+    assert InstallJournal(path).completed() == ["pacman"]
+
+
+def test_broken_journal_is_ignored(path, tmp_path):
+    (tmp_path / "cache").mkdir()
+    with open(path, "w") as file:
+        file.write('{"key": ')
+
+    assert InstallJournal(path).data == {}
+
+    with open(path, "w") as file:
+        json.dump(["not", "a", "journal"], file)
+
+    assert InstallJournal(path).data == {}
+
+
+@pytest.fixture
+def make_builder(path):
+    pytest.importorskip("inquirer")
+    from install import Builder
+
+    def make(from_stage):
+        builder = Builder(from_stage=from_stage)
+        builder.journal = InstallJournal(path)
+        builder.journal.start(OPTIONS, [])
+        return builder
+
+    return make
+
+
+STAGES = [
+    Stage(name="pacman", action=lambda: None),
+    Stage(name="packages", action=lambda: None, requires=["pacman"]),
+    Stage(name="apps", action=lambda: None, requires=["packages"]),
+    Stage(name="dotfiles", action=lambda: None, requires=["pacman"]),
+    Stage(name="grub", action=lambda: None),
+]
+
+
+def test_from_stage_runs_the_stage_and_its_dependents_again(make_builder, path):
+    builder = make_builder("packages")
+    for name in ("pacman", "packages", "apps", "grub"):
+        builder.journal.record_stage(name, "done")
+
+    assert builder.completed_stages(STAGES) == {"pacman", "grub"}
+    assert sorted(InstallJournal(path).completed()) == ["grub", "pacman"]
+
+
+def test_from_stage_takes_its_requirements_as_completed(make_builder):
+    assert make_builder("apps").completed_stages(STAGES) == {"pacman", "packages"}
+
+
+def test_from_unknown_stage(make_builder):
+    with pytest.raises(SystemExit):
+        make_builder("bootloader").completed_stages(STAGES)
@@ -0,0 +1,111 @@
+import os
+import subprocess
+
+import pytest
+
+from utils.local_repo import LocalRepository
+
+
+@pytest.mark.parametrize("file, expected", [
+    ("bash-5.2.026-1-x86_64.pkg.tar.zst", ("bash", "5.2.026-1")),
+    ("python-pip-24.0-1-any.pkg.tar.zst", ("python-pip", "24.0-1")),
+    ("/var/cache/pacman/pkg/xorg-server-21.1.13-1-x86_64.pkg.tar.xz", ("xorg-server", "21.1.13-1")),
+    ("pipewire-jack-1:1.0.5-1-x86_64.pkg.tar.zst", ("pipewire-jack", "1:1.0.5-1")),
+    ("visual-studio-code-bin-1.90.0-1-x86_64.pkg.tar", ("visual-studio-code-bin", "1.90.0-1")),
+    ("bash-5.2.026-1-x86_64.pkg.tar.zst.sig", None),
+    ("meowrch-local.db.tar.gz", None),
+    ("broken-x86_64.pkg.tar.zst", None),
+])
+def test_parse_file_name(file, expected):
+    assert LocalRepository.parse_file_name(file) == expected
+
+
+@pytest.fixture
+def repo_add(monkeypatch):
+    """Replaces repo-add: records the calls and writes an empty database"""
+    calls = []
+    run = subprocess.run
+
+    def fake_run(command, *args, **kwargs):
+        if command[0] != "repo-add":
+            return run(command, *args, **kwargs)
+
+        calls.append(command)
+        open(command[2], "w").close()
+        os.symlink(os.path.basename(command[2]), command[2][:-len(".tar.gz")])
+        return subprocess.CompletedProcess(command, 0)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    return calls
+
+
+def test_prepare_writes_offline_config(tmp_path, repo_add):
+    system_config = tmp_path / "pacman.conf"
+    system_config.write_text(
+        "[options]\nHoldPkg = pacman glibc\nArchitecture = auto\nParallelDownloads = 5\n\n"
+        "[core]\nInclude = /etc/pacman.d/mirrorlist\n"
+    )
+    path = tmp_path / "repo"
+    path.mkdir()
+    (path / "bash-5.2.026-1-x86_64.pkg.tar.zst").touch()
+    repo = LocalRepository(str(path), config_path=str(tmp_path / "offline.conf"), system_config_path=str(system_config))
+
+    assert repo.prepare()
+
+    assert repo_add == [[
+        "repo-add", "--quiet", f"{path}/meowrch-local.db.tar.gz", f"{path}/bash-5.2.026-1-x86_64.pkg.tar.zst",
+    ]]
+    config = (tmp_path / "offline.conf").read_text().splitlines()
+    assert config[:4] == ["[options]", "HoldPkg = pacman glibc", "Architecture = auto", "ParallelDownloads = 5"]
+    assert "[core]" not in config
+    assert config[-3:] == ["[meowrch-local]", "SigLevel = Optional TrustAll", f"Server = file://{path}"]
+
+    # Базу второй раз не пересоздаём
+    assert repo.prepare()
+    assert len(repo_add) == 1
+
+
+def test_prepare_without_packages(tmp_path, repo_add):
+    repo = LocalRepository(str(tmp_path / "empty"), config_path=str(tmp_path / "offline.conf"))
+
+    assert not repo.exists
+    assert not repo.prepare()
+    assert repo_add == []
+
+
+def test_export(tmp_path, repo_add):
+    cache = tmp_path / "cache"
+    aur = tmp_path / "aur" / "yay-bin" / "packages"
+    for directory, names in [
+        (cache, ["bash-5.2.026-1-x86_64.pkg.tar.zst", "bash-5.2.021-1-x86_64.pkg.tar.zst",
+                 "bash-5.2.026-1-x86_64.pkg.tar.zst.sig", "pipewire-jack-1:1.0.5-1-x86_64.pkg.tar.zst"]),
+        (aur, ["yay-bin-12.3.5-1-x86_64.pkg.tar"]),
+    ]:
+        directory.mkdir(parents=True)
+        for name in names:
+            (directory / name).write_text(name)
+
+    installed = {"bash": "5.2.026-1", "pipewire-jack": "1:1.0.5-1", "yay-bin": "12.3.5-1", "linux": "6.9.1.arch1-1"}
+    repo = LocalRepository(str(tmp_path / "export"))
+
+    assert repo.export(installed, cache_dirs=[str(cache), str(tmp_path / "aur" / "*" / "packages")])
+
+    exported = sorted(os.listdir(tmp_path / "export"))
+    assert exported == [
+        "bash-5.2.026-1-x86_64.pkg.tar.zst", "meowrch-local.db", "meowrch-local.db.tar.gz",
+        "pipewire-jack-1:1.0.5-1-x86_64.pkg.tar.zst", "yay-bin-12.3.5-1-x86_64.pkg.tar",
+    ]
+    # Файлы связаны жёсткими ссылками, а не скопированы
+    assert os.path.samefile(tmp_path / "export" / "bash-5.2.026-1-x86_64.pkg.tar.zst", cache / "bash-5.2.026-1-x86_64.pkg.tar.zst")
+    assert sorted(os.path.basename(f) for f in repo_add[0][3:]) == [
+        "bash-5.2.026-1-x86_64.pkg.tar.zst", "pipewire-jack-1:1.0.5-1-x86_64.pkg.tar.zst", "yay-bin-12.3.5-1-x86_64.pkg.tar",
+    ]
+    assert repo.exists
+
+
+def test_export_without_packages(tmp_path, repo_add):
+    repo = LocalRepository(str(tmp_path / "export"))
+
+    assert not repo.export({"bash": "5.2.026-1"}, cache_dirs=[str(tmp_path / "cache")])
+    assert repo_add == []
+    assert not os.path.exists(tmp_path / "export")
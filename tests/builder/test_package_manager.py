@@ -0,0 +1,151 @@
+import subprocess
+
+import pytest
+
+from managers.package_manager import PackageManager
+from utils.install_report import InstallReport
+from utils.pacman_db import PacmanDatabase
+
+
+class FakeProcess:
+    def __init__(self, command, **kwargs) -> None:
+        self.command = command
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self) -> None:
+        self.returncode = -15
+
+    def wait(self) -> int:
+        return self.returncode
+
+
+def test_prefetch_uses_its_own_cache(monkeypatch, tmp_path):
+    config = tmp_path / "pacman.conf"
+    config.write_text("[options]\nCacheDir = /var/cache/pacman/pkg/ /mnt/cache/\n[core]\n")
+    (tmp_path / "db" / "local").mkdir(parents=True)
+    cache_dir = tmp_path / "prefetch"
+    processes, commands = [], []
+
+    def popen(command, **kwargs):
+        processes.append(FakeProcess(command))
+        return processes[-1]
+
+    monkeypatch.setattr(PackageManager, "database", PacmanDatabase(str(tmp_path / "db"), str(config)))
+    monkeypatch.setattr(PackageManager, "pacman_args", [])
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    monkeypatch.setattr(subprocess, "run", lambda command, **kwargs: commands.append(command))
+    assert PackageManager.cache_args() == []
+
+    PackageManager.prefetch_packages(
+        ["bash", "git"], db_dir=str(tmp_path / "prefetch-db"), cache_dir=str(cache_dir), log_path=str(tmp_path / "log")
+    )
+
+    command = processes[0].command
+    assert command[command.index("--cachedir") + 1] == str(cache_dir)
+    # Загрузка и транзакции не пишут в один каталог, но транзакции берут из него готовые пакеты
+    assert PackageManager.cache_args() == [
+        "--cachedir", "/var/cache/pacman/pkg/", "--cachedir", "/mnt/cache/", "--cachedir", str(cache_dir),
+    ]
+
+    cache_dir.mkdir()
+    for name in ["bash-5.2.026-1-x86_64.pkg.tar.zst", "bash-5.2.026-1-x86_64.pkg.tar.zst.sig", "git-2.45.1-1-x86_64.pkg.tar.zst.part"]:
+        (cache_dir / name).touch()
+
+    PackageManager.finish_prefetch()
+
+    assert processes[0].returncode == -15
+    assert PackageManager.cache_args() == []
+    assert commands == [
+        [
+            "sudo", "mv", "-n", "-t", "/var/cache/pacman/pkg/",
+            str(cache_dir / "bash-5.2.026-1-x86_64.pkg.tar.zst"), str(cache_dir / "bash-5.2.026-1-x86_64.pkg.tar.zst.sig"),
+        ],
+        ["sudo", "rm", "-rf", str(cache_dir)],
+    ]
+
+
+PREPARE = "resolving dependencies...\nlooking for conflicting packages...\n"
+
+
+@pytest.fixture
+def transactions(monkeypatch):
+    """Replaces pacman with a function that gets the packages of the transaction and returns (exit code, stdout, stderr)"""
+    handler = {}
+    commands = []
+
+    def run_tee(command):
+        commands.append(command[command.index("--needed") + 1:])
+        return handler["run"](commands[-1])
+
+    monkeypatch.setattr(PackageManager, "pacman_args", [])
+    monkeypatch.setattr(PackageManager, "prefetch_cache_dir", None)
+    monkeypatch.setattr(PackageManager, "report", InstallReport())
+    monkeypatch.setattr(PackageManager, "_run_tee", staticmethod(run_tee))
+
+    def set_handler(run):
+        handler["run"] = run
+        return commands
+
+    return set_handler
+
+
+@pytest.mark.parametrize("stdout, stderr, offending", [
+    (
+        "",
+        "error: target not found: hyprland-git\n",
+        ["hyprland-git"],
+    ),
+    (
+        PREPARE + ":: pipewire-pulse-1:1.2.7-1 and pulseaudio-17.0+r43+g3e2bb8a1e-1 are in conflict\n",
+        "error: unresolvable package conflicts detected\nerror: failed to prepare transaction (conflicting dependencies)\n",
+        ["pulseaudio"],
+    ),
+    (
+        PREPARE + ":: python-pyqt5-5.15.11-1 and python-pyqt5-sip-12.15.0-1 are in conflict (python-pyqt5-sip<12.16)\n",
+        "error: failed to prepare transaction (conflicting dependencies)\n",
+        ["python-pyqt5-sip"],
+    ),
+    (
+        "resolving dependencies...\n:: installing python (3.12.7-1) breaks dependency 'python<3.12' required by python-pywal16\n",
+        "error: failed to prepare transaction (could not satisfy dependencies)\n",
+        ["python"],
+    ),
+    (
+        "resolving dependencies...\n:: unable to satisfy dependency 'libicuuc.so=74-64' required by mewline\n",
+        "error: failed to prepare transaction (could not satisfy dependencies)\n",
+        ["mewline"],
+    ),
+])
+def test_batch_excludes_packages_named_by_pacman(transactions, stdout, stderr, offending):
+    packages = ["python", "pipewire-pulse", "pulseaudio", "python-pyqt5", "python-pyqt5-sip", "hyprland-git", "mewline"]
+    commands = transactions(lambda command: (1, stdout, stderr) if any(p in command for p in offending) else (0, "", ""))
+
+    assert PackageManager.install_packages_batch(packages) == offending
+    assert commands == [packages, [p for p in packages if p not in offending]]
+
+
+def test_batch_bisects_unknown_errors(transactions):
+    commands = transactions(lambda command: (
+        (1, "(4/4) checking package integrity...\n", "error: kitty: signature from \"Unknown\" is invalid\n"
+            "error: failed to commit transaction (invalid or corrupted package (PGP signature))\n")
+        if "kitty" in command else (0, "", "")
+    ))
+
+    assert PackageManager.install_packages_batch(["fish", "git", "kitty", "mpv", "fish"], error_retries=2) == ["kitty"]
+    assert commands == [
+        ["fish", "git", "kitty", "mpv"],
+        ["fish", "git"],
+        ["kitty", "mpv"],
+        ["kitty"], ["kitty"],
+        ["mpv"],
+    ]
+
+
+def test_batch_installs_dependencies_as_deps(transactions):
+    commands = transactions(lambda command: (1, "", "error: target not found: nope\n") if "nope" in command else (0, "", ""))
+
+    assert PackageManager.install_packages_batch(["cmake", "nope", "ninja"], as_deps=True) == ["nope"]
+    assert commands == [["--asdeps", "cmake", "nope", "ninja"], ["--asdeps", "cmake", "ninja"]]
@@ -0,0 +1,125 @@
+import io
+import tarfile
+
+import pytest
+
+from utils.pacman_db import PacmanDatabase
+
+
+def desc(**fields) -> str:
+    lines = []
+    for key, values in fields.items():
+        lines.append(f"%{key}%")
+        lines.extend(values if isinstance(values, list) else [values])
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_sync_db(path, packages) -> None:
+    """Writes a sync database the way repo-add does: a tar with a "<name>-<version>/desc" entry per package"""
+    with tarfile.open(path, "w:gz") as archive:
+        for package in packages:
+            data = desc(**package).encode()
+            info = tarfile.TarInfo(f"{package['NAME']}-{package['VERSION']}/desc")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    root = tmp_path / "db"
+    for entry in ["bash-5.2.026-1", "xorg-server-21.1.13-1", "python-pip-1:24.0-1"]:
+        (root / "local" / entry).mkdir(parents=True)
+    (root / "local" / "ALPM_DB_VERSION").write_text("9\n")
+
+    (root / "sync").mkdir()
+    write_sync_db(root / "sync" / "core.db", [
+        {"NAME": "bash", "VERSION": "5.2.026-1", "PROVIDES": ["sh"]},
+        {"NAME": "linux", "VERSION": "6.9.1.arch1-1", "GROUPS": ["base-kernels"]},
+    ])
+    write_sync_db(root / "sync" / "extra.db", [
+        {"NAME": "bash", "VERSION": "9.9-1"},
+        {"NAME": "xorg-server", "VERSION": "21.1.13-1", "GROUPS": ["xorg"]},
+        {"NAME": "pipewire-jack", "VERSION": "1:1.0.5-1", "PROVIDES": ["jack=1.9.22", "libjack.so=0-64"]},
+    ])
+    write_sync_db(root / "sync" / "testing.db", [{"NAME": "linux", "VERSION": "6.10.0-1"}])
+    return root
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "pacman.conf"
+    path.write_text("[options]\nArchitecture = auto\n\n[core]\nInclude = /etc/pacman.d/mirrorlist\n\n[extra]\n")
+    return path
+
+
+def test_local_versions(db_path, config):
+    db = PacmanDatabase(str(db_path), str(config))
+
+    assert db.local == {"bash": "5.2.026-1", "xorg-server": "21.1.13-1", "python-pip": "1:24.0-1"}
+    assert db.is_installed("xorg-server")
+    assert db.installed_version("python-pip") == "1:24.0-1"
+
+    (db_path / "local" / "git-2.45.1-1").mkdir()
+    assert db.installed_version("git") == "2.45.1-1"
+
+
+def test_sync_groups_and_provides(db_path, config):
+    db = PacmanDatabase(str(db_path), str(config))
+
+    # testing не включён в конфиге, а core важнее extra
+    assert db.repositories() == ["core", "extra"]
+    assert db.sync["bash"].version == "5.2.026-1"
+    assert db.sync["bash"].repository == "core"
+    assert db.sync["linux"].version == "6.9.1.arch1-1"
+
+    assert db.repository("xorg") == "extra"
+    assert db.repository("base-kernels") == "core"
+    assert db.repository("sh") == "core"
+    assert db.repository("jack") == "extra"
+    assert db.repository("libjack.so") == "extra"
+    assert not db.exists("jack=1.9.22")
+    assert not db.exists("missing")
+
+
+def test_check(db_path, config):
+    status = PacmanDatabase(str(db_path), str(config)).check(["bash", "xorg", "linux", "missing", "bash"])
+
+    assert status.installed == ["bash"]
+    assert status.available == ["xorg", "linux"]
+    assert status.unknown == ["missing"]
+
+
+def test_repositories_from_include_files(db_path, tmp_path):
+    conf_d = tmp_path / "pacman.d"
+    conf_d.mkdir()
+    (conf_d / "mirrorlist").write_text("Server = https://example.org/$repo/os/$arch\n")
+    (conf_d / "10-testing.conf").write_text(f"[testing]\nInclude = {conf_d}/mirrorlist\n")
+    config = tmp_path / "pacman.conf"
+    config.write_text(
+        "[options]\n"
+        f"Include = {config}\n"
+        f"Include = {conf_d}/*.conf\n"
+        f"Include = {conf_d}/missing.conf\n"
+        f"[core]\nInclude = {conf_d}/mirrorlist\n"
+    )
+
+    db = PacmanDatabase(str(db_path), str(config))
+
+    assert db.repositories() == ["testing", "core"]
+    assert db.sync["linux"].repository == "testing"
+    assert db.repository("xorg") is None
+
+
+def test_without_config(db_path, tmp_path):
+    db = PacmanDatabase(str(db_path), str(tmp_path / "missing.conf"))
+
+    assert db.repositories() == ["core", "extra", "testing"]
+
+
+def test_without_databases(tmp_path):
+    db = PacmanDatabase(str(tmp_path), str(tmp_path / "pacman.conf"))
+
+    assert db.local == {}
+    assert db.repositories() == []
+    assert db.check(["bash"]).available == ["bash"]
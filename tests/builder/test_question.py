@@ -0,0 +1,100 @@
+import pytest
+
+pytest.importorskip("inquirer")
+pytest.importorskip("colorama")
+
+from managers.drivers_manager import DriversManager
+from packages import CUSTOM
+from question import Question
+from utils.schemes import AurHelper
+
+
+@pytest.fixture
+def custom():
+    """Restores the selection of packages.py after the test"""
+    selected = {name: info.selected for category in CUSTOM.values() for name, info in category.items()}
+    yield
+    for category in CUSTOM.values():
+        for name, info in category.items():
+            info.selected = selected[name]
+
+
+def test_defaults():
+    answers = Question.validate_answers({})
+
+    assert answers["install_wm"] == ["hyprland"]
+    assert answers["aur_helper"] == "yay"
+    assert answers["install_drivers"] is None and answers["custom_packages"] is None
+    assert answers["aur_jobs"] == 0 and answers["ff_plugins"] == []
+
+
+def test_choices_ignore_case():
+    answers = Question.validate_answers({
+        "aur_helper": "Paru",
+        "install_wm": "BSPWM",
+        "install_drivers": ["nvidia", "amd", "Nvidia"],
+        "ff_plugins": ["ublock origin"],
+    })
+
+    assert answers["aur_helper"] == "paru"
+    assert answers["install_wm"] == ["bspwm"]
+    assert answers["install_drivers"] == ["Nvidia", "AMD"]
+    assert answers["ff_plugins"] == ["uBlock Origin"]
+
+
+@pytest.mark.parametrize("answers, error", [
+    ({"install_hyprland": True}, 'unknown answer "install_hyprland"'),
+    ({"make_backup": "yes"}, '"make_backup" must be true or false'),
+    ({"make_backup": 1}, '"make_backup" must be true or false'),
+    ({"aur_jobs": True}, '"aur_jobs" must be a non-negative number'),
+    ({"aur_jobs": "4"}, '"aur_jobs" must be a non-negative number'),
+    ({"aur_jobs": -1}, '"aur_jobs" must be a non-negative number'),
+    ({"aur_helper": "pikaur"}, '"aur_helper" must be one of: yay, paru'),
+    ({"install_drivers": ["Matrox"]}, '"install_drivers" has unknown values: Matrox'),
+    ({"install_wm": {"hyprland": True}}, '"install_wm" must be a list'),
+    ({"install_wm": []}, '"install_wm" must contain at least one window manager'),
+    ({"custom_packages": ["discord", "not-a-package"]}, '"custom_packages" has unknown values: not-a-package'),
+])
+def test_invalid_answers(answers, error):
+    with pytest.raises(ValueError) as e:
+        Question.validate_answers(answers)
+
+    assert error in str(e.value)
+
+
+def test_all_errors_are_reported():
+    with pytest.raises(ValueError) as e:
+        Question.validate_answers({"reboot": "no", "aur_helper": "pikaur", "typo": 1})
+
+    assert len(str(e.value).split("; ")) == 3
+
+
+def test_unattended_answers(monkeypatch, custom):
+    monkeypatch.setattr(DriversManager, "auto_detection", staticmethod(lambda: ["Intel"]))
+    answers = Question.validate_answers({
+        "install_wm": ["hyprland", "bspwm"],
+        "aur_helper": "paru",
+        "aur_jobs": 4,
+        "ff_plugins": ["Dark Reader"],
+        "custom_packages": ["obsidian", "spotify"],
+    })
+
+    options = Question.get_unattended_answers(answers)
+
+    assert options.install_hyprland and options.install_bspwm
+    assert options.aur_helper == AurHelper.PARU and options.aur_jobs == 4
+    assert options.install_drivers and options.intel_driver and not options.nvidia_driver
+    assert options.ff_darkreader and not options.ff_ublock
+    assert [
+        name for category in CUSTOM.values() for name, info in category.items() if info.selected
+    ] == ["obsidian", "spotify"]
+
+
+def test_unattended_answers_keep_the_default_selection(monkeypatch, custom):
+    monkeypatch.setattr(DriversManager, "auto_detection", staticmethod(lambda: pytest.fail("drivers were chosen")))
+    selected = [name for category in CUSTOM.values() for name, info in category.items() if info.selected]
+
+    options = Question.get_unattended_answers(Question.validate_answers({"install_drivers": []}))
+
+    assert not options.install_drivers
+    assert [name for category in CUSTOM.values() for name, info in category.items() if info.selected] == selected
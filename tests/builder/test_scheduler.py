@@ -0,0 +1,100 @@
+import time
+import threading
+
+import pytest
+
+from utils.scheduler import StageScheduler
+from utils.schemes import Stage
+
+
+def test_stages_run_after_their_requirements():
+    order = []
+    stages = [
+        Stage(name="apps", action=lambda: order.append("apps"), requires=["packages"]),
+        Stage(name="packages", action=lambda: order.append("packages"), requires=["pacman"]),
+        Stage(name="pacman", action=lambda: order.append("pacman")),
+    ]
+    scheduler = StageScheduler(stages)
+
+    assert scheduler.run() == {"pacman": "done", "packages": "done", "apps": "done"}
+    assert order == ["pacman", "packages", "apps"]
+    assert scheduler.timings["pacman"][1] <= scheduler.timings["packages"][0] <= scheduler.timings["apps"][0]
+
+
+def test_stages_with_a_shared_lock_never_overlap():
+    active, most = [0], [0]
+    guard = threading.Lock()
+    # Стадия без блокировки должна идти одновременно с той, что держит "pacman"
+    barrier = threading.Barrier(2, timeout=5)
+
+    def locked(wait=False):
+        def run():
+            with guard:
+                active[0] += 1
+                most[0] = max(most[0], active[0])
+            if wait:
+                barrier.wait()
+            time.sleep(0.02)
+            with guard:
+                active[0] -= 1
+        return run
+
+    stages = [
+        Stage(name="drivers", action=locked(wait=True), locks=["pacman"]),
+        Stage(name="aur", action=locked(), locks=["pacman"]),
+        Stage(name="fonts", action=locked(), locks=["pacman"]),
+        Stage(name="dotfiles", action=barrier.wait),
+    ]
+
+    assert set(StageScheduler(stages, jobs=4).run().values()) == {"done"}
+    assert most[0] == 1
+
+
+def test_failed_stage_skips_its_dependents():
+    ran = []
+
+    def fail():
+        raise RuntimeError("pacman is broken")
+
+    stages = [
+        Stage(name="pacman", action=fail),
+        Stage(name="packages", action=lambda: ran.append("packages"), requires=["pacman"]),
+        Stage(name="apps", action=lambda: ran.append("apps"), requires=["packages"]),
+        Stage(name="dotfiles", action=lambda: ran.append("dotfiles")),
+    ]
+
+    assert StageScheduler(stages).run() == {
+        "pacman": "failed", "packages": "skipped", "apps": "skipped", "dotfiles": "done",
+    }
+    assert ran == ["dotfiles"]
+
+
+@pytest.mark.parametrize("error", [RuntimeError("boom"), SystemExit(1)])
+def test_exception_or_exit_marks_the_stage_failed(error):
+    finished = []
+
+    def action():
+        raise error
+
+    scheduler = StageScheduler([Stage(name="aur", action=action)], on_finish=lambda name, result: finished.append((name, result)))
+
+    assert scheduler.run() == {"aur": "failed"}
+    assert finished == [("aur", "failed")]
+    assert "aur" in scheduler.timings
+
+
+def test_completed_stages_are_verified_before_skipping():
+    ran = []
+    stages = [
+        Stage(name="yay", action=lambda: ran.append("yay"), verify=lambda: True),
+        Stage(name="grub", action=lambda: ran.append("grub"), verify=lambda: False),
+        Stage(name="sddm", action=lambda: ran.append("sddm"), resumable=False),
+    ]
+
+    assert set(StageScheduler(stages, completed=["yay", "grub", "sddm"]).run().values()) == {"done"}
+    assert sorted(ran) == ["grub", "sddm"]
+
+
+def test_unknown_requirement():
+    with pytest.raises(ValueError):
+        StageScheduler([Stage(name="apps", action=lambda: None, requires=["missing"])])
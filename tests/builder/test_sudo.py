@@ -0,0 +1,42 @@
+import time
+import threading
+import subprocess
+
+from utils.sudo import SudoKeepAlive
+
+
+def test_keepalive_refreshes_without_prompt(monkeypatch):
+    commands = []
+    refreshed = threading.Event()
+
+    def run(command, **kwargs):
+        commands.append(command)
+        if len(commands) > 2:
+            refreshed.set()
+        return subprocess.CompletedProcess(command, 0)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    keepalive = SudoKeepAlive(interval=0.01)
+
+    assert keepalive.start()
+    assert refreshed.wait(5)
+    keepalive.stop()
+
+    assert commands[0] == ["sudo", "-v"]
+    assert all(command == ["sudo", "-n", "-v"] for command in commands[1:])
+
+    # После stop() поток больше не трогает sudo
+    count = len(commands)
+    time.sleep(0.05)
+    assert len(commands) == count
+
+
+def test_wrong_password(monkeypatch):
+    def run(command, **kwargs):
+        raise subprocess.CalledProcessError(1, command)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    keepalive = SudoKeepAlive()
+
+    assert not keepalive.start()
+    keepalive.stop()
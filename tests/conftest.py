@@ -0,0 +1,45 @@
+import sys
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# Каталог тестов -> дерево исходников, которое он импортирует
+SOURCE_TREES = {
+	"builder": ROOT / "Builder",
+	"meowrch": ROOT / "home" / ".config" / "meowrch",
+}
+current_tree = None
+
+
+def pytest_collectstart(collector) -> None:
+	"""
+	Builder and meowrch both have a top-level "utils" package,
+	so the one of the other tree is dropped right before a test module of a directory is imported.
+	"""
+	global current_tree
+
+	if not isinstance(collector, pytest.Module):
+		return
+
+	tree = SOURCE_TREES.get(collector.path.parent.name)
+	if tree is None or tree == current_tree:
+		return
+
+	for name in list(sys.modules):
+		if name == "utils" or name.startswith("utils."):
+			del sys.modules[name]
+
+	sys.path.insert(0, str(tree))
+	current_tree = tree
+
+
+@pytest.fixture(scope="session")
+def system_info():
+	"""home/bin/system-info.py has a dash in its name, so it is loaded by path."""
+	spec = importlib.util.spec_from_file_location("system_info", ROOT / "home" / "bin" / "system-info.py")
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[spec.name] = module
+	spec.loader.exec_module(module)
+	return module
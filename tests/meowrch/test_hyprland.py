@@ -0,0 +1,119 @@
+import json
+import time
+import socket
+import threading
+
+import pytest
+
+from utils.hyprland import HyprlandIPC
+
+
+MONITORS = [
+	{"name": "DP-1", "refreshRate": 143.98, "x": 0, "y": 0, "width": 2560, "height": 1440, "focused": True},
+	{"name": "HDMI-A-1", "refreshRate": 60.0, "x": 2560, "y": 0, "width": 1920, "height": 1080, "focused": False},
+]
+
+
+class FakeHyprland:
+	"""Serves .socket.sock requests and keeps .socket2.sock subscribers to push events."""
+
+	def __init__(self, socket_dir) -> None:
+		self.monitors = list(MONITORS)
+		self.requests = []
+		self.subscribers = []
+
+		self.commands = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.commands.bind(str(socket_dir / ".socket.sock"))
+		self.commands.listen()
+		self.events = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.events.bind(str(socket_dir / ".socket2.sock"))
+		self.events.listen()
+
+		threading.Thread(target=self._serve_commands, daemon=True).start()
+		threading.Thread(target=self._serve_events, daemon=True).start()
+
+	def _serve_commands(self) -> None:
+		while True:
+			try:
+				conn, _ = self.commands.accept()
+			except OSError:
+				return
+			with conn:
+				command = conn.recv(8192).decode()
+				self.requests.append(command)
+				if command == "j/monitors":
+					conn.sendall(json.dumps(self.monitors).encode())
+
+	def _serve_events(self) -> None:
+		while True:
+			try:
+				conn, _ = self.events.accept()
+			except OSError:
+				return
+			self.subscribers.append(conn)
+
+	def emit(self, event: str) -> None:
+		for conn in self.subscribers:
+			conn.sendall(f"{event}\n".encode())
+
+	def close(self) -> None:
+		for conn in self.subscribers:
+			conn.close()
+		self.commands.close()
+		self.events.close()
+
+
+@pytest.fixture
+def hyprland(tmp_path, monkeypatch):
+	signature = "test_signature"
+	socket_dir = tmp_path / "hypr" / signature
+	socket_dir.mkdir(parents=True)
+	monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+	monkeypatch.setenv("HYPRLAND_INSTANCE_SIGNATURE", signature)
+
+	server = FakeHyprland(socket_dir)
+	yield server
+	server.close()
+
+
+def wait_for(condition, timeout: float = 1.0) -> None:
+	deadline = time.monotonic() + timeout
+	while not condition() and time.monotonic() < deadline:
+		time.sleep(0.01)
+	assert condition()
+
+
+def test_monitors_are_parsed(hyprland):
+	ipc = HyprlandIPC()
+	assert ipc.available
+
+	monitors = ipc.get_monitors()
+
+	assert [m.name for m in monitors] == ["DP-1", "HDMI-A-1"]
+	assert monitors[0].refresh_rate == pytest.approx(143.98)
+	assert (monitors[1].x, monitors[1].width, monitors[1].height) == (2560, 1920, 1080)
+	assert monitors[0].focused and not monitors[1].focused
+	assert ipc.get_refresh_rate() == 144
+	ipc.close()
+
+
+def test_cache_is_invalidated_on_monitoradded(hyprland):
+	ipc = HyprlandIPC()
+	assert len(ipc.get_monitors()) == 2
+	wait_for(lambda: len(hyprland.subscribers) == 1)
+
+	##==> Без событий монитора ответ берётся из кеша
+	hyprland.emit("workspace>>2")
+	assert len(ipc.get_monitors()) == 2
+	assert hyprland.requests.count("j/monitors") == 1
+
+	hyprland.monitors.append(
+		{"name": "DP-2", "refreshRate": 75.0, "x": 4480, "y": 0, "width": 1920, "height": 1080}
+	)
+	hyprland.emit("monitoradded>>DP-2")
+	wait_for(lambda: len(ipc.get_monitors()) == 3)
+
+	assert hyprland.requests.count("j/monitors") == 2
+	##==> Подписка на события создаётся один раз на процесс
+	assert len(hyprland.subscribers) == 1
+	ipc.close()
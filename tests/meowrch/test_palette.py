@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import palette
+from utils.palette import PaletteAnalyzer, batch_kmeans, srgb_to_lab
+
+
+def make_image(path, colors, size=(32, 32)):
+	"""An image of vertical stripes of equal width, one per color"""
+	image = Image.new("RGB", size)
+	stripe = size[0] // len(colors)
+	for i, color in enumerate(colors):
+		image.paste(color, (i * stripe, 0, (i + 1) * stripe, size[1]))
+	image.save(path)
+	return path
+
+
+@pytest.fixture
+def theme(tmp_path, monkeypatch):
+	"""A theme whose oomox palette is red, dark red and white"""
+	monkeypatch.setattr(palette, "OOMOX_COLORS", lambda name: tmp_path / "themes" / name / "oomox-colors")
+	(tmp_path / "themes" / "red").mkdir(parents=True)
+	(tmp_path / "themes" / "red" / "oomox-colors").write_text(
+		"NAME=red\nBG=ff0000\nFG=\"FFFFFF\"\nSEL_BG=800000\nHDR_BG=ff0000\nROUNDNESS=4\n"
+	)
+	return "red"
+
+
+def test_srgb_to_lab():
+	lab = srgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]], dtype=np.uint8))
+
+	assert lab[0] == pytest.approx([100, 0, 0], abs=0.1)
+	assert lab[1] == pytest.approx([0, 0, 0], abs=0.1)
+	assert lab[2] == pytest.approx([53.24, 80.09, 67.20], abs=0.1)
+
+
+def test_batch_kmeans_separates_colors():
+	pixels = np.array([[[0, 0, 0]] * 6 + [[100, 0, 0]] * 2, [[50, 10, 10]] * 4 + [[90, -10, 5]] * 4], dtype=np.float32)
+
+	labels = batch_kmeans(pixels, k=2)
+
+	assert len(set(labels[0][:6])) == 1 and len(set(labels[0][6:])) == 1 and labels[0][0] != labels[0][-1]
+	assert len(set(labels[1][:4])) == 1 and len(set(labels[1][4:])) == 1 and labels[1][0] != labels[1][-1]
+
+
+def test_analyze_dominant_colors(tmp_path):
+	wallpaper = make_image(tmp_path / "flag.png", [(255, 0, 0), (0, 0, 255)])
+	analyzer = PaletteAnalyzer(index_file=tmp_path / "index.json", colors=2, size=32)
+
+	assert analyzer.analyze([wallpaper]) == 1
+
+	entry = analyzer.index[str(wallpaper)]
+	assert sorted(entry["colors"]) == ["0000ff", "ff0000"]
+	assert entry["weights"] == pytest.approx([0.5, 0.5], abs=0.05)
+
+	##==> Индекс переживает перезапуск и обновляется только при изменении файла
+	analyzer = PaletteAnalyzer(index_file=tmp_path / "index.json", colors=2, size=32)
+	assert analyzer.analyze([wallpaper]) == 0
+
+	make_image(wallpaper, [(0, 255, 0)])
+	os.utime(wallpaper, (entry["mtime"] + 10,) * 2)
+	assert analyzer.analyze([wallpaper]) == 1
+	assert analyzer.index[str(wallpaper)]["colors"][0] == "00ff00"
+
+
+def test_scores(tmp_path, theme):
+	red = make_image(tmp_path / "red.png", [(255, 0, 0), (128, 0, 0)])
+	mixed = make_image(tmp_path / "mixed.png", [(255, 0, 0), (0, 0, 255)])
+	blue = make_image(tmp_path / "blue.png", [(0, 0, 255)])
+	broken = tmp_path / "broken.png"
+	broken.write_text("not an image")
+	analyzer = PaletteAnalyzer(index_file=tmp_path / "index.json", colors=2, size=32)
+
+	scores = analyzer.scores([red, mixed, blue, broken], theme)
+
+	assert scores[red] == pytest.approx(1.0)
+	assert scores[red] > scores[mixed] > scores[blue] > 0
+	assert scores[broken] == 0.0
+
+
+def test_scores_without_palette(tmp_path, theme):
+	wallpaper = make_image(tmp_path / "blue.png", [(0, 0, 255)])
+	analyzer = PaletteAnalyzer(index_file=tmp_path / "index.json")
+
+	assert analyzer.scores([wallpaper], "missing") == {wallpaper: 1.0}
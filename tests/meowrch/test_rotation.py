@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from utils.config import Config
+from utils.schemes import Monitor, Theme
+from utils.rotation import WallpaperRotator
+
+
+def make_theme(wallpapers) -> Theme:
+	return Theme(name="test", available_wallpapers=wallpapers, icon=Path("icon.png"))
+
+
+def test_bag_does_not_repeat_wallpapers(tmp_path):
+	wallpapers = [tmp_path / f"{i}.png" for i in range(3)]
+	rotator = WallpaperRotator(None, interval=60, times=[], bag_file=tmp_path / "bag.json")
+	theme = make_theme(wallpapers)
+
+	drawn = rotator.draw(theme, 2) + rotator.draw(theme, 1)
+
+	assert sorted(drawn) == sorted(wallpapers)
+
+
+def test_theme_without_wallpapers(tmp_path):
+	rotator = WallpaperRotator(None, interval=60, times=[], bag_file=tmp_path / "bag.json")
+	theme = make_theme([])
+
+	assert rotator.draw(theme, 2) == []
+	assert rotator.peek(theme) == []
+
+
+def test_only_one_rotator_runs(tmp_path):
+	lock_file = tmp_path / "rotation.lock"
+
+	first = WallpaperRotator.acquire_lock(lock_file)
+	assert first is not None
+	assert WallpaperRotator.acquire_lock(lock_file) is None
+
+	first.close()
+	second = WallpaperRotator.acquire_lock(lock_file)
+	assert second is not None
+	second.close()
+
+
+class FakeSetter:
+	def __init__(self, monitors) -> None:
+		self.monitors = monitors
+		self.preloaded = []
+
+	def get_monitors(self):
+		return self.monitors
+
+	def preload(self, wallpapers, span=False):
+		self.preloaded.append(wallpapers)
+
+
+class FakeThemeManager:
+	def __init__(self, theme, monitors) -> None:
+		self.current_theme = theme
+		self.wallpaper_setter = FakeSetter(monitors)
+		self.applied = []
+
+	def set_wallpaper(self, wallpaper):
+		self.applied.append(wallpaper)
+
+	def set_wallpapers(self, wallpapers):
+		self.applied.append(wallpapers)
+
+
+def test_per_output_rotation(tmp_path, monkeypatch):
+	wallpapers = [tmp_path / f"{i}.png" for i in range(4)]
+	theme = make_theme(wallpapers)
+	manager = FakeThemeManager(theme, [Monitor(name="DP-1"), Monitor(name="HDMI-A-1")])
+	monkeypatch.setattr(Config, "get_wallpaper_mode", staticmethod(lambda: "per-output"))
+	monkeypatch.setattr(WallpaperRotator, "_refresh_theme", lambda self: theme)
+	rotator = WallpaperRotator(manager, interval=60, times=[], bag_file=tmp_path / "bag.json")
+
+	rotator.rotate()
+	rotator.rotate()
+
+	first, second = manager.applied
+	assert list(first) == ["DP-1", "HDMI-A-1"] and list(second) == ["DP-1", "HDMI-A-1"]
+	##==> За два шага каждый монитор получил разные обои, и все обои темы показаны по разу
+	assert sorted(list(first.values()) + list(second.values())) == sorted(wallpapers)
+	##==> Следующие обои заранее готовятся на все мониторы
+	assert all(len(batch) == 2 for batch in manager.wallpaper_setter.preloaded)
@@ -0,0 +1,59 @@
+import os
+
+from PIL import Image
+
+from utils.schemes import Monitor
+from utils.wallpaper import WallpaperSetter
+
+
+MONITORS = [Monitor(name="DP-1", width=64, height=32), Monitor(name="DP-2", x=64, width=64, height=32)]
+
+
+def make_image(path, color, size=(256, 128)):
+	path.parent.mkdir(parents=True, exist_ok=True)
+	Image.new("RGB", size, color).save(path)
+	return path
+
+
+def test_preload_keeps_same_named_wallpapers_apart(tmp_path, monkeypatch):
+	monkeypatch.setattr(WallpaperSetter, "get_monitors", lambda self: MONITORS)
+	red = make_image(tmp_path / "theme-a" / "1.png", (255, 0, 0))
+	blue = make_image(tmp_path / "theme-b" / "1.png", (0, 0, 255))
+	setter = WallpaperSetter(None)
+
+	setter.preload([red, blue], cache_dir=tmp_path / "cache")
+
+	assert setter.prepared[red] != setter.prepared[blue]
+	with Image.open(setter.prepared[red]) as image:
+		assert image.getpixel((0, 0)) == (255, 0, 0)
+	with Image.open(setter.prepared[blue]) as image:
+		assert image.getpixel((0, 0)) == (0, 0, 255)
+
+	##==> Заготовка пересоздаётся, когда файл обоев изменился
+	old = setter.prepared[red]
+	make_image(red, (0, 255, 0))
+	os.utime(red, (os.stat(old).st_mtime + 10,) * 2)
+	setter.preload([red], cache_dir=tmp_path / "cache")
+	assert setter.prepared[red] != old
+	assert sorted((tmp_path / "cache").iterdir()) == [setter.prepared[red]]
+
+
+def test_span_cache_is_pruned(tmp_path):
+	cache_dir = tmp_path / "span"
+	wallpapers = [make_image(tmp_path / f"{i}.png", (i * 40, 0, 0)) for i in range(6)]
+
+	for i, wallpaper in enumerate(wallpapers):
+		pieces = WallpaperSetter.split_wallpaper(wallpaper, MONITORS, cache_dir=cache_dir)
+		for piece in pieces.values():
+			os.utime(piece, (1000 + i,) * 2)
+
+	WallpaperSetter.prune_cache(cache_dir, WallpaperSetter.SPAN_CACHE_KEYS)
+
+	files = sorted(f.name for f in cache_dir.iterdir())
+	assert len(files) == WallpaperSetter.SPAN_CACHE_KEYS * len(MONITORS)
+	assert {f.split("-", 1)[1].rsplit("-", 2)[0] for f in files} == {"2", "3", "4", "5"}
+
+	##==> Использованные заново куски не удаляются
+	pieces = WallpaperSetter.split_wallpaper(wallpapers[2], MONITORS, cache_dir=cache_dir)
+	WallpaperSetter.split_wallpaper(wallpapers[0], MONITORS, cache_dir=cache_dir)
+	assert all(piece.exists() for piece in pieces.values())
@@ -0,0 +1,186 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+
+def write(path, value: str) -> None:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_text(value + "\n")
+
+
+def make_amdgpu(root):
+	"""A sysfs tree with one amdgpu card: /sys/class/drm/card0/device -> /sys/devices/.../0000:03:00.0"""
+	device = root / "devices" / "pci0000:00" / "0000:03:00.0"
+	write(device / "vendor", "0x1002")
+	write(device / "device", "0x73bf")
+	write(device / "gpu_busy_percent", "37")
+	write(device / "mem_info_vram_used", str(1536 * 2**20))
+	write(device / "mem_info_vram_total", str(16368 * 2**20))
+	write(device / "hwmon" / "hwmon3" / "temp1_input", "54000")
+
+	card = root / "class" / "drm" / "card0"
+	card.mkdir(parents=True)
+	os.symlink(device, card / "device")
+	##==> Коннекторы тоже лежат в class/drm и не должны считаться картами
+	(root / "class" / "drm" / "card0-DP-1").mkdir()
+	return card
+
+
+def test_amdgpu_sysfs(system_info, tmp_path, monkeypatch):
+	pci_ids = tmp_path / "pci.ids"
+	pci_ids.write_text("1002  Advanced Micro Devices, Inc. [AMD/ATI]\n\t73bf  Navi 21 [Radeon RX 6800/6800 XT / 6900 XT]\n")
+	monkeypatch.setattr(system_info, "PCI_IDS_PATHS", (str(pci_ids),))
+	card = make_amdgpu(tmp_path)
+
+	backend = system_info.GpuBackend(sysfs_root=str(tmp_path))
+	stats = backend.sample()
+
+	assert len(stats) == 1
+	gpu = stats[0]
+	assert gpu.device.vendor == "amd"
+	assert gpu.device.card == str(card)
+	assert gpu.device.pci_slot == "0000:03:00.0"
+	assert gpu.device.name == "Navi 21 [Radeon RX 6800/6800 XT / 6900 XT]"
+	assert gpu.load == 37
+	assert gpu.temp == 54.0
+	assert (gpu.mem_used, gpu.mem_total) == (1536, 16368)
+
+	info = system_info.get_gpu_info("utilization", backend)
+	assert info["text"] == "󰢮 37%"
+	assert "Memory: 1536 / 16368 MiB" in info["tooltip"]
+
+
+def test_identical_gpus_keep_their_own_history(system_info):
+	device = system_info.GpuDevice(vendor="amd", card="/sys/class/drm/card0", pci_slot="0000:03:00.0", name="AMD GPU")
+	stats = [system_info.GpuStats(device=device, load=50, temp=60), system_info.GpuStats(device=device, load=50, temp=60)]
+	assert stats[0] == stats[1]
+	backend = system_info.GpuBackend(devices=[device, device])
+	backend.sample = lambda: stats
+	history = system_info.MetricHistory(size=8, max_metrics=8)
+
+	system_info.get_gpu_info("utilization", backend, history=history)
+
+	assert history.get("gpu0-load") == [50] and history.get("gpu1-load") == [50]
+
+
+def test_no_gpu(system_info, tmp_path):
+	backend = system_info.GpuBackend(sysfs_root=str(tmp_path))
+
+	assert backend.sample() == []
+	assert system_info.get_gpu_info("temp", backend)["text"] == "󰢮 N/A°C"
+
+
+def write_stat(proc, pid: int, name: str, ticks: int, rss_pages: int) -> None:
+	##==> После ")": state, ppid, ..., utime (11), stime (12), ..., starttime (19), vsize, rss (21)
+	fields = ["S", "1"] + ["0"] * 9 + [str(ticks), "0"] + ["0"] * 6 + ["4242", "0", str(rss_pages)]
+	write(proc / str(pid) / "stat", f"{pid} ({name}) " + " ".join(fields))
+
+
+def test_screen_locker_with_truncated_comm(system_info, tmp_path):
+	proc = tmp_path / "proc"
+	write(proc / "1" / "comm", "systemd\n")
+	state = system_info.PowerState(sysfs_root=str(tmp_path / "sys"), proc_root=str(proc))
+	assert not state._locked()
+
+	write(proc / "4242" / "comm", "betterlockscree\n")
+	assert state._locked()
+
+
+def test_process_sampler_single_pass(system_info, tmp_path, monkeypatch):
+	proc = tmp_path / "proc"
+	write_stat(proc, 100, "fish (shell)", ticks=0, rss_pages=10)
+	sampler = system_info.ProcessSampler(proc_root=str(proc), drm_rescan=0)
+	monkeypatch.setattr(system_info.time, "sleep", lambda _: pytest.fail("the sampler must not sleep"))
+
+	first = sampler.sample()
+	assert [(p.pid, p.name, p.cpu) for p in first] == [(100, "fish (shell)", 0)]
+	assert first[0].rss == 10 * sampler.PAGE_SIZE
+
+	write_stat(proc, 100, "fish (shell)", ticks=sampler.CLOCK_TICKS, rss_pages=10)
+	sampler.timestamp -= 2
+	assert sampler.sample()[0].cpu == pytest.approx(50, rel=0.05)
+
+
+@pytest.mark.parametrize("driver, before, after", [
+	("i915", "drm-engine-render:\t0 ns\n", "drm-engine-render:\t500000000 ns\n"),
+	(
+		"xe",
+		"drm-cycles-rcs:\t0\ndrm-total-cycles-rcs:\t1000\n",
+		"drm-cycles-rcs:\t250\ndrm-total-cycles-rcs:\t2000\n",
+	),
+])
+def test_process_sampler_gpu_busy(system_info, tmp_path, driver, before, after):
+	proc = tmp_path / "proc"
+	write_stat(proc, 100, "mpv", ticks=0, rss_pages=10)
+	(proc / "100" / "fd").mkdir()
+	(proc / "100" / "fd" / "3").symlink_to("/dev/dri/renderD128")
+	header = f"drm-driver:\t{driver}\ndrm-pdev:\t0000:00:02.0\ndrm-client-id:\t7\n"
+	write(proc / "100" / "fdinfo" / "3", header + before)
+
+	sampler = system_info.ProcessSampler(proc_root=str(proc))
+	assert sampler.sample()[0].gpu == {"0000:00:02.0": 0}
+
+	write(proc / "100" / "fdinfo" / "3", header + after)
+	sampler.timestamp -= 2
+	assert sampler.sample()[0].gpu["0000:00:02.0"] == pytest.approx(25, rel=0.05)
+
+
+STREAM_CLIENT = r"""
+import sys
+import time
+import socket
+import threading
+import importlib.util
+
+spec = importlib.util.spec_from_file_location("system_info", sys.argv[1])
+system_info = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(system_info)
+system_info.SOCKET_ADDRESS = "\0" + sys.argv[2]
+
+server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+server.bind(system_info.SOCKET_ADDRESS)
+server.listen()
+connections = []
+
+
+def serve():
+    while True:
+        conn, _ = server.accept()
+        connections.append(conn)
+        conn.makefile("r").readline()
+        try:
+            while True:
+                conn.sendall(b'{"text": "42%"}\n')
+                time.sleep(0.01)
+        except OSError:
+            pass
+
+
+threading.Thread(target=serve, daemon=True).start()
+system_info.run_stream(None, system_info.Subscriber(module="cpu", session_type=None, normal_color="", critical_color=""))
+sys.stderr.write(f"connections={len(connections)}\n")
+"""
+
+
+def test_stream_client_exits_when_the_reader_goes_away(system_info, tmp_path):
+	script = tmp_path / "client.py"
+	script.write_text(STREAM_CLIENT)
+	process = subprocess.Popen(
+		[sys.executable, str(script), system_info.__file__, f"meowrch-system-info-test-{os.getpid()}"],
+		stdout=subprocess.PIPE, stderr=subprocess.PIPE
+	)
+
+	assert process.stdout.readline() == b'{"text": "42%"}\n'
+	process.stdout.close()
+
+	try:
+		_, errors = process.communicate(timeout=10)
+	except subprocess.TimeoutExpired:
+		process.kill()
+		pytest.fail("the stream client keeps running without a reader")
+
+	assert process.returncode == 0
+	##==> Клиент не переподключается и не падает на сбросе stdout при выходе
+	assert errors.decode().strip() == "connections=1"